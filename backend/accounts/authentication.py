@@ -0,0 +1,121 @@
+"""
+JWT authentication without a user query per request.
+
+StatelessJWTAuthentication authenticates a request from the access
+token's claims alone (see accounts.tokens): request.user is a ClaimsUser
+carrying id, email and is_staff, and the full User is only loaded by
+views that need it, through get_full_user(). Decoded tokens are kept in
+a small in-process LRU for AUTH_TOKEN_CACHE_SECONDS, so repeated requests
+with the same token skip signature verification too.
+
+Access tokens minted from a blacklisted refresh token (logout, rotation)
+are rejected through the cached revocation set (accounts.revocation).
+Tokens issued before the claims were added fall back to loading the user.
+
+Claims are as fresh as the token: a change to is_staff applies from the
+next refresh, and deactivating a user takes effect when the access token
+expires.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from . import revocation
+from .tokens import REFRESH_JTI_CLAIM, USER_CLAIMS
+
+TOKEN_CACHE_SIZE = 10000
+
+
+class ClaimsUser(TokenUser):
+    """
+    request.user built from access token claims. Attributes other than
+    id/pk, email and is_staff need the full User: see get_full_user().
+    """
+
+    def __str__(self):
+        return self.email
+
+    @cached_property
+    def user(self):
+        User = get_user_model()
+        try:
+            return User._default_manager.get(**{api_settings.USER_ID_FIELD: self.id})
+        except User.DoesNotExist as e:
+            raise AuthenticationFailed(_("User not found"), code='user_not_found') from e
+
+
+def get_full_user(user):
+    """The User model instance behind request.user, loading it if needed."""
+    return user.user if isinstance(user, ClaimsUser) else user
+
+
+class TokenCache:
+    """Thread-safe LRU of raw token -> (validated token, expiry)."""
+
+    def __init__(self, size=TOKEN_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, raw_token):
+        with self.lock:
+            entry = self.entries.get(raw_token)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self.entries[raw_token]
+                return None
+            self.entries.move_to_end(raw_token)
+            return entry[0]
+
+    def set(self, raw_token, validated_token, timeout):
+        # Never outlive the token itself.
+        expires = min(time.time() + timeout, validated_token['exp'])
+        with self.lock:
+            self.entries[raw_token] = (validated_token, expires)
+            self.entries.move_to_end(raw_token)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = TokenCache()
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = token_cache.get(raw_token)
+        if validated_token is None:
+            validated_token = self.get_validated_token(raw_token)
+            timeout = settings.AUTH_TOKEN_CACHE_SECONDS
+            if timeout:
+                token_cache.set(raw_token, validated_token, timeout)
+
+        if revocation.is_revoked(validated_token.get(REFRESH_JTI_CLAIM)):
+            raise AuthenticationFailed(_("Token has been revoked"), code='token_revoked')
+        return self.get_user(validated_token), validated_token
+
+    def get_user(self, validated_token):
+        if any(claim not in validated_token for claim in (api_settings.USER_ID_CLAIM, *USER_CLAIMS)):
+            # Issued before the claims were added.
+            return super().get_user(validated_token)
+        return ClaimsUser(validated_token)
@@ -0,0 +1,158 @@
+"""
+Password hashers with tunable cost, run on a bounded thread pool.
+
+PASSWORD_HASHER (settings) picks the algorithm for new hashes: scrypt,
+argon2 (needs argon2-cffi) or pbkdf2. Their cost parameters are read from
+settings as well. Hashes made with another algorithm, or with older
+parameters, keep verifying and are upgraded after the next login.
+
+Hashing is CPU-bound, and these algorithms release the GIL while they
+run. So every hash and verification runs on a pool of
+PASSWORD_HASHING_WORKERS threads: a login spike occupies at most that
+many cores and leaves the rest to other requests. Up to
+PASSWORD_HASHING_QUEUE further requests wait for a free worker. Requests
+beyond that are refused with 503 and Retry-After rather than piling up.
+
+Django upgrades an outdated hash inside the login request. Here
+User.check_password() submits the upgrade to the pool without waiting
+for it (see rehash_later()).
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model, hashers
+from django.db import connection
+from rest_framework.exceptions import APIException
+
+logger = logging.getLogger(__name__)
+
+
+class HashingBusy(APIException):
+    status_code = 503
+    default_detail = 'Too many sign-in attempts right now, please retry shortly.'
+    default_code = 'hashing_busy'
+    wait = 1
+
+
+class HashingPool:
+    def __init__(self, workers, queue):
+        self.local = threading.local()
+        self.slots = threading.BoundedSemaphore(workers + queue)
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='password-hasher', initializer=self._mark_worker
+        )
+
+    def _mark_worker(self):
+        self.local.worker = True
+
+    def run(self, fn, *args, **kwargs):
+        """Run fn on the pool and wait for it; HashingBusy if the queue is full."""
+        if getattr(self.local, 'worker', False):
+            return fn(*args, **kwargs)
+        if not self.slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            return self.executor.submit(fn, *args, **kwargs).result()
+        finally:
+            self.slots.release()
+
+    def submit(self, fn, *args):
+        """
+        Run fn on the pool in the background, closing the worker's database
+        connection afterwards. Returns False (and drops fn) if the queue is
+        full.
+        """
+        if not self.slots.acquire(blocking=False):
+            return False
+        future = self.executor.submit(self._run_in_background, fn, *args)
+        future.add_done_callback(lambda _: self.slots.release())
+        return True
+
+    @staticmethod
+    def _run_in_background(fn, *args):
+        try:
+            fn(*args)
+        except Exception:
+            logger.exception("Background password hashing task failed")
+        finally:
+            connection.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = HashingPool(settings.PASSWORD_HASHING_WORKERS, settings.PASSWORD_HASHING_QUEUE)
+    return _pool
+
+
+def rehash(pk, password, encoded):
+    """Store a fresh hash of password, unless the password changed meanwhile."""
+    get_user_model()._default_manager.filter(pk=pk, password=encoded).update(
+        password=hashers.make_password(password)
+    )
+
+
+def rehash_later(pk, password, encoded):
+    if not get_pool().submit(rehash, pk, password, encoded):
+        logger.info("Hashing pool busy; password upgrade for user %s deferred to a later login", pk)
+
+
+class BoundedHasherMixin:
+    """Runs the hasher's CPU-bound methods on the hashing pool."""
+
+    def encode(self, *args, **kwargs):
+        return get_pool().run(super().encode, *args, **kwargs)
+
+    def verify(self, password, encoded):
+        return get_pool().run(super().verify, password, encoded)
+
+    def harden_runtime(self, password, encoded):
+        return get_pool().run(super().harden_runtime, password, encoded)
+
+
+class ScryptPasswordHasher(BoundedHasherMixin, hashers.ScryptPasswordHasher):
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT_WORK_FACTOR
+
+    @property
+    def block_size(self):
+        return settings.PASSWORD_SCRYPT_BLOCK_SIZE
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_SCRYPT_PARALLELISM
+
+    @property
+    def maxmem(self):
+        # scrypt needs about 128 * r * (N + p) bytes; OpenSSL's default
+        # limit (32 MiB) is too low from N = 2**15, r = 8.
+        return 2 * 128 * self.block_size * (self.work_factor + self.parallelism)
+
+
+class Argon2PasswordHasher(BoundedHasherMixin, hashers.Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class PBKDF2PasswordHasher(BoundedHasherMixin, hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS or hashers.PBKDF2PasswordHasher.iterations
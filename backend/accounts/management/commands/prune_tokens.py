@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from accounts import revocation
+
+
+class Command(BaseCommand):
+    help = "Delete expired outstanding and blacklisted JWTs in batches (run periodically, e.g. hourly)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Tokens deleted per transaction.")
+        parser.add_argument(
+            '--pause', type=float, default=0.0,
+            help="Seconds to sleep between batches, to leave room for other writers."
+        )
+
+    def handle(self, *args, **options):
+        outstanding, blacklisted = revocation.prune(options['batch_size'], options['pause'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Pruned {outstanding} expired token(s), {blacklisted} of them blacklisted."
+        ))
@@ -1,7 +1,10 @@
+from django.contrib.auth.hashers import check_password
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 import uuid
 
+from .hashers import rehash_later
+
 class User(AbstractUser):
     """
     Custom User model extending AbstractUser.
@@ -10,12 +13,14 @@ class User(AbstractUser):
     - id: UUID primary key
     - email: Unique email address (used for login)
     - avatar: User profile image
+    - avatar_variants: Storage names of the avatar's thumbnails (see images.thumbnails)
     - created_at: Timestamp when user was created
     - updated_at: Timestamp when user was last updated
     """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     email = models.EmailField(unique=True)
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
+    avatar_variants = models.JSONField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -25,3 +30,13 @@ class User(AbstractUser):
     def __str__(self):
         """Return string representation of user (email)."""
         return self.email
+
+    def check_password(self, raw_password):
+        """
+        Like AbstractBaseUser.check_password, but an outdated hash is
+        upgraded in the background instead of inside the login request
+        (see accounts.hashers).
+        """
+        def setter(raw_password):
+            rehash_later(self.pk, raw_password, self.password)
+        return check_password(raw_password, self.password, setter)
@@ -0,0 +1,254 @@
+"""
+Revoked refresh tokens, checked without a query per request.
+
+The blacklist tables (rest_framework_simplejwt.token_blacklist) are the
+source of truth. Each process keeps a Bloom filter of the jtis of
+blacklisted tokens that still matter, i.e. whose refresh token or any
+access token minted from it has not expired (see retention_cutoff()):
+
+- a jti the filter has not seen is not revoked, without a query;
+- a possible hit (a revoked token, or a false positive, ~1%) is
+  confirmed against the database once and the answer kept in an LRU.
+
+Every TOKEN_REVOCATION_CACHE_SECONDS the filter catches up with tokens
+blacklisted by other processes, loading rows added since by id. Ids are
+allocated at insert but rows become visible at commit, so a row can show
+up behind one with a higher id that was already loaded: each catch-up
+reads the last CATCH_UP_WINDOW ids before the highest one seen again.
+Every TOKEN_REVOCATION_REBUILD_SECONDS, or once it fills up, the filter
+is rebuilt from scratch in a background thread, which drops expired
+tokens and picks up any row that committed even later. Tokens revoked by
+this process are added at once. Only the first load of a process blocks
+a request: about half a second per 100k live blacklisted tokens on
+SQLite.
+
+Expired rows are deleted in batches by `manage.py prune_tokens`.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+logger = logging.getLogger(__name__)
+
+MIN_CAPACITY = 10000
+ERROR_RATE = 0.01
+CONFIRMED_SIZE = 10000
+# Ids below the highest one seen that each catch-up reads again, for rows
+# committed out of id order.
+CATCH_UP_WINDOW = 1000
+
+
+def retention_cutoff():
+    """
+    Blacklisted tokens that expired before this no longer matter: access
+    tokens outlive the refresh token they were minted from by at most
+    ACCESS_TOKEN_LIFETIME.
+    """
+    return timezone.now() - api_settings.ACCESS_TOKEN_LIFETIME
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter of strings, sized for `capacity` keys."""
+
+    def __init__(self, capacity, error_rate=ERROR_RATE):
+        self.capacity = max(capacity, MIN_CAPACITY)
+        self.size = math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing: k positions from two 64-bit halves of one digest.
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        """Add a key; returns False if it was (probably) present already."""
+        positions = self._positions(key)
+        if all(self.bits[p >> 3] & (1 << (p & 7)) for p in positions):
+            return False
+        for p in positions:
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+        return True
+
+    def __contains__(self, key):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    @property
+    def full(self):
+        return self.count > self.capacity
+
+
+class RevocationSet:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rebuild_lock = threading.Lock()
+        self.filter = None
+        self.rebuilding = False
+        self.watermark = 0
+        self.built_at = self.synced_at = 0.0
+        self.confirmed = OrderedDict()
+
+    def _rows(self, **filters):
+        return (
+            BlacklistedToken.objects.filter(token__expires_at__gt=retention_cutoff(), **filters)
+            .order_by('id').values_list('id', 'token__jti').iterator(chunk_size=10000)
+        )
+
+    def rebuild(self, built_at=None):
+        """
+        Rebuild the filter from the database, unless it has been rebuilt
+        since `built_at` while waiting for another thread.
+        """
+        with self.rebuild_lock:
+            if built_at is not None and self.built_at != built_at:
+                return
+            queryset = BlacklistedToken.objects.filter(token__expires_at__gt=retention_cutoff())
+            bloom = BloomFilter(capacity=2 * queryset.count())
+            watermark = 0
+            for row_id, jti in self._rows():
+                bloom.add(jti)
+                watermark = row_id
+            with self.lock:
+                # Rows caught up into the old filter meanwhile are read again.
+                self.filter, self.watermark = bloom, watermark
+                self.confirmed.clear()
+                self.built_at = self.synced_at = time.monotonic()
+
+    def _rebuild_in_background(self, built_at):
+        try:
+            self.rebuild(built_at)
+        except Exception:
+            logger.exception("Rebuilding the token revocation filter failed")
+        finally:
+            self.rebuilding = False
+            connection.close()
+
+    def catch_up(self):
+        """Add tokens blacklisted since the last sync."""
+        with self.lock:
+            bloom, watermark = self.filter, self.watermark
+            self.synced_at = time.monotonic()
+        for row_id, jti in self._rows(id__gt=watermark - CATCH_UP_WINDOW):
+            bloom.add(jti)
+            with self.lock:
+                self.confirmed.pop(jti, None)
+                self.watermark = max(self.watermark, row_id)
+
+    def sync(self):
+        if self.filter is None:
+            self.rebuild(self.built_at)
+            return
+        now = time.monotonic()
+        with self.lock:
+            stale = now - self.built_at >= settings.TOKEN_REVOCATION_REBUILD_SECONDS or self.filter.full
+            due = now - self.synced_at >= settings.TOKEN_REVOCATION_CACHE_SECONDS
+            if due:
+                # Only this thread catches up; concurrent requests keep
+                # using the filter as it is.
+                self.synced_at = now
+        if stale:
+            self.start_rebuild()
+        if due:
+            self.catch_up()
+
+    def start_rebuild(self):
+        """Rebuild in a background thread; requests keep using the current filter."""
+        with self.lock:
+            if self.rebuilding:
+                return
+            self.rebuilding = True
+            built_at = self.built_at
+        threading.Thread(
+            target=self._rebuild_in_background, args=(built_at,),
+            name='token-revocation-rebuild', daemon=True,
+        ).start()
+
+    def __contains__(self, jti):
+        self.sync()
+        if jti not in self.filter:
+            return False
+        with self.lock:
+            revoked = self.confirmed.get(jti)
+            if revoked is not None:
+                self.confirmed.move_to_end(jti)
+                return revoked
+        revoked = BlacklistedToken.objects.filter(token__jti=jti).exists()
+        self._confirm(jti, revoked)
+        return revoked
+
+    def _confirm(self, jti, revoked):
+        with self.lock:
+            self.confirmed[jti] = revoked
+            self.confirmed.move_to_end(jti)
+            while len(self.confirmed) > CONFIRMED_SIZE:
+                self.confirmed.popitem(last=False)
+
+    def add(self, jti):
+        if self.filter is None:
+            self.rebuild(self.built_at)
+        self.filter.add(jti)
+        self._confirm(jti, True)
+
+
+_revoked = RevocationSet()
+
+
+def is_revoked(jti):
+    return jti is not None and jti in _revoked
+
+
+def revoke(token):
+    """
+    Blacklist a refresh token and add it to this process's set. Returns
+    False if it was blacklisted already.
+    """
+    _, created = token.blacklist()
+    _revoked.add(token[api_settings.JTI_CLAIM])
+    return created
+
+
+def sync():
+    """Load or catch up this process's set if it is due."""
+    _revoked.sync()
+
+
+def prune(batch_size=5000, pause=0.0):
+    """
+    Delete outstanding tokens (and their blacklist entries) that expired
+    before retention_cutoff(), batch_size at a time so each transaction
+    stays short. Returns (outstanding, blacklisted) deleted counts.
+    """
+    cutoff = retention_cutoff()
+    outstanding = blacklisted = 0
+    while True:
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=cutoff)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        _, deleted = OutstandingToken.objects.filter(id__in=ids).delete()
+        outstanding += deleted.get(OutstandingToken._meta.label, 0)
+        blacklisted += deleted.get(BlacklistedToken._meta.label, 0)
+        if pause:
+            time.sleep(pause)
+    return outstanding, blacklisted
+
+
+def clear():
+    """Forget the cached set; the next check reloads it."""
+    global _revoked
+    _revoked = RevocationSet()
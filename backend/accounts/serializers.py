@@ -1,17 +1,27 @@
 from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from django.utils.translation import gettext_lazy as _
+from images.serializers import ImageVariantsField
+from . import revocation
+from .tokens import USER_CLAIMS, ClaimsRefreshToken
 
 User = get_user_model()
 
 class UserSerializer(serializers.ModelSerializer):
     """
     Serializer for User model.
-    Read-only fields: id, created_at, updated_at
+    Read-only fields: id, avatar_srcset, created_at, updated_at
     """
+    avatar_srcset = ImageVariantsField(source='avatar_variants')
+
     class Meta:
         model = User
-        fields = ['id', 'email', 'username', 'first_name', 'last_name', 'avatar', 'is_staff', 'is_superuser', 'created_at', 'updated_at']
+        fields = ['id', 'email', 'username', 'first_name', 'last_name', 'avatar', 'avatar_srcset', 'is_staff', 'is_superuser', 'created_at', 'updated_at']
         read_only_fields = ['id', 'is_staff', 'is_superuser', 'created_at', 'updated_at']
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -54,3 +64,40 @@ class UpdateProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['first_name', 'last_name', 'avatar']
+
+class TokenObtainPairSerializer(jwt_serializers.TokenObtainPairSerializer):
+    """
+    Login serializer issuing ClaimsRefreshToken pairs (see accounts.tokens).
+    """
+    token_class = ClaimsRefreshToken
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    """
+    Refresh serializer for ClaimsRefreshToken.
+    Refreshes the user claims from the database and rotates the refresh
+    token before minting the access token, so its refresh_jti names the
+    new refresh token rather than the one just blacklisted.
+    """
+    token_class = ClaimsRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: refresh[api_settings.USER_ID_CLAIM]}).first()
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        for claim in USER_CLAIMS:
+            refresh[claim] = getattr(user, claim)
+
+        data = {}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            # Only one request can blacklist a token, so a refresh token
+            # replayed before the revocation set caught up still fails.
+            if api_settings.BLACKLIST_AFTER_ROTATION and not revocation.revoke(refresh):
+                raise TokenError(_("Token is blacklisted"))
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data['refresh'] = str(refresh)
+        return {'access': str(refresh.access_token), **data}
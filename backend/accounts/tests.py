@@ -1,3 +1,273 @@
-from django.test import TestCase
+import io
+import threading
+import uuid
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from orders.models import Order
+from . import hashers, revocation
+from .authentication import ClaimsUser, StatelessJWTAuthentication, token_cache
+from .tokens import ClaimsRefreshToken
+
+User = get_user_model()
+
+PASSWORD = 'Str0ng-passw0rd!'
+
+
+class StatelessJWTAuthenticationTests(TestCase):
+    """Requests authenticate from token claims (accounts.authentication)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='reader@example.com', username='reader', password=PASSWORD)
+        cls.staff = User.objects.create_user(
+            email='staff@example.com', username='staff', password=PASSWORD, is_staff=True
+        )
+        Order.objects.create(user=cls.user, email=cls.user.email, total_amount='10.00')
+        Order.objects.create(user=cls.staff, email=cls.staff.email, total_amount='20.00')
+
+    def setUp(self):
+        token_cache.clear()
+        revocation.clear()
+
+    def login(self, user):
+        response = APIClient().post('/api/auth/login/', {'email': user.email, 'password': PASSWORD}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def client_for(self, access):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        return client
+
+    def authenticate(self, access):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {access}')
+        return StatelessJWTAuthentication().authenticate(request)
+
+    def test_authenticates_without_queries(self):
+        access = self.login(self.staff)['access']
+        revocation.sync()
+
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(access)
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertEqual((user.pk, user.email, user.is_staff), (str(self.staff.pk), self.staff.email, True))
+
+    def test_views_load_the_user_only_when_needed(self):
+        client = self.client_for(self.login(self.user)['access'])
+        revocation.sync()
+
+        response = client.get('/api/orders/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+        with self.assertNumQueries(1):
+            response = client.get('/api/auth/profile/')
+        self.assertEqual(response.data['email'], self.user.email)
+
+    def test_staff_claim(self):
+        client = self.client_for(self.login(self.staff)['access'])
+        self.assertEqual(len(client.get('/api/orders/').data['results']), 2)
+
+    def test_logout_revokes_access_tokens_of_the_session(self):
+        tokens = self.login(self.user)
+        other_session = self.login(self.user)
+        client = self.client_for(tokens['access'])
+        self.assertEqual(client.get('/api/auth/profile/').status_code, 200)
+
+        response = client.post('/api/auth/logout/', {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 205)
+
+        self.assertEqual(client.get('/api/auth/profile/').status_code, 401)
+        self.assertEqual(self.client_for(other_session['access']).get('/api/auth/profile/').status_code, 200)
+
+    def test_refresh_rotates_and_revokes_the_old_session(self):
+        tokens = self.login(self.user)
+        response = APIClient().post('/api/auth/token/refresh/', {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+
+        self.assertEqual(self.client_for(response.data['access']).get('/api/auth/profile/').status_code, 200)
+        self.assertEqual(self.client_for(tokens['access']).get('/api/auth/profile/').status_code, 401)
+        reused = APIClient().post('/api/auth/token/refresh/', {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(reused.status_code, 401)
+
+    def test_refresh_updates_claims(self):
+        tokens = self.login(self.user)
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        response = APIClient().post('/api/auth/token/refresh/', {'refresh': tokens['refresh']}, format='json')
+
+        user, _ = self.authenticate(response.data['access'])
+        self.assertTrue(user.is_staff)
+
+    @override_settings(TOKEN_REVOCATION_CACHE_SECONDS=0)
+    def test_revocations_by_other_processes_are_reloaded(self):
+        tokens = self.login(self.user)
+        client = self.client_for(tokens['access'])
+        self.assertEqual(client.get('/api/auth/profile/').status_code, 200)
+
+        jti = RefreshToken(tokens['refresh'])['jti']
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=jti))
+        self.assertEqual(client.get('/api/auth/profile/').status_code, 401)
+
+    def test_tokens_without_claims_load_the_user(self):
+        access = RefreshToken.for_user(self.user).access_token
+        user, _ = self.authenticate(str(access))
+        self.assertIsInstance(user, User)
+
+    def test_cached_tokens_expire_with_the_token(self):
+        access = RefreshToken.for_user(self.user).access_token
+        access.set_exp(lifetime=-access.lifetime)
+        self.assertIsNone(token_cache.get(b'missing'))
+        token_cache.set(b'expired', access, 30)
+        self.assertIsNone(token_cache.get(b'expired'))
+
+
+class TokenRevocationTests(TestCase):
+    """The cached blacklist (accounts.revocation) and its pruning."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='reader@example.com', username='reader', password=PASSWORD)
+
+    def setUp(self):
+        token_cache.clear()
+        revocation.clear()
+
+    def blacklist(self, expires_at):
+        token = OutstandingToken.objects.create(
+            user=self.user, jti=uuid.uuid4().hex, token='', expires_at=expires_at
+        )
+        BlacklistedToken.objects.create(token=token)
+        return token.jti
+
+    def refresh(self, token):
+        return APIClient().post('/api/auth/token/refresh/', {'refresh': str(token)}, format='json')
+
+    def test_bloom_filter(self):
+        bloom = revocation.BloomFilter(capacity=10000)
+        keys = [uuid.uuid4().hex for _ in range(10000)]
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_unrevoked_tokens_need_no_query(self):
+        revoked = self.blacklist(timezone.now() + timedelta(days=1))
+        revocation.sync()
+
+        with self.assertNumQueries(0):
+            self.assertFalse(revocation.is_revoked(uuid.uuid4().hex))
+        self.assertTrue(revocation.is_revoked(revoked))
+        with self.assertNumQueries(0):
+            self.assertTrue(revocation.is_revoked(revoked))
+
+    def test_catch_up_loads_new_rows_only(self):
+        revocation.sync()
+        revoked = self.blacklist(timezone.now() + timedelta(days=1))
+        with override_settings(TOKEN_REVOCATION_CACHE_SECONDS=0), self.assertNumQueries(1):
+            revocation.sync()
+        self.assertTrue(revocation.is_revoked(revoked))
+
+    @override_settings(TOKEN_REVOCATION_CACHE_SECONDS=0)
+    def test_catch_up_rereads_rows_committed_out_of_order(self):
+        revoked = self.blacklist(timezone.now() + timedelta(days=1))
+        revocation.sync()
+        late = self.blacklist(timezone.now() + timedelta(days=1))
+        # A row with a lower id committing after `revoked` was loaded.
+        BlacklistedToken.objects.filter(token__jti=late).update(
+            id=BlacklistedToken.objects.get(token__jti=revoked).id - 1
+        )
+        self.assertTrue(revocation.is_revoked(late))
+
+    def test_expired_tokens_are_not_loaded(self):
+        expired = self.blacklist(timezone.now() - timedelta(days=1))
+        revocation.sync()
+        with self.assertNumQueries(0):
+            self.assertFalse(revocation.is_revoked(expired))
+
+    def test_refresh_without_blacklist_queries(self):
+        token = ClaimsRefreshToken.for_user(self.user)
+        revocation.sync()
+        # User, outstanding token, blacklist entry (insert in a savepoint), new outstanding token.
+        with self.assertNumQueries(6):
+            response = self.refresh(token)
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def test_replayed_refresh_fails_before_the_set_catches_up(self):
+        token = ClaimsRefreshToken.for_user(self.user)
+        revocation.sync()
+        # Rotated by another process, after this one loaded its set.
+        token.blacklist()
+
+        self.assertFalse(revocation.is_revoked(token['jti']))
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_prune_keeps_tokens_access_tokens_may_still_reference(self):
+        now = timezone.now()
+        old = self.blacklist(now - timedelta(days=2))
+        recent = self.blacklist(now - timedelta(minutes=5))
+        OutstandingToken.objects.create(user=self.user, jti='expired', token='', expires_at=now - timedelta(days=2))
+        live = ClaimsRefreshToken.for_user(self.user)
+
+        out = io.StringIO()
+        call_command('prune_tokens', '--batch-size', '1', stdout=out)
+        self.assertIn('Pruned 2 expired token(s), 1 of them blacklisted.', out.getvalue())
+        self.assertEqual(
+            set(OutstandingToken.objects.values_list('jti', flat=True)), {recent, live['jti']}
+        )
+        self.assertFalse(BlacklistedToken.objects.filter(token__jti=old).exists())
+
+
+class PasswordHashingTests(TestCase):
+    """Tunable hashers on a bounded pool (accounts.hashers)."""
+
+    def login(self, email, password=PASSWORD):
+        return APIClient().post('/api/auth/login/', {'email': email, 'password': password}, format='json')
+
+    def test_new_passwords_use_the_configured_hasher(self):
+        user = User.objects.create_user(email='reader@example.com', username='reader', password=PASSWORD)
+        self.assertTrue(user.password.startswith('scrypt$32768$'))
+
+    def test_outdated_hashes_are_upgraded_after_login(self):
+        legacy = make_password(PASSWORD, hasher='pbkdf2_sha256')
+        user = User.objects.create(email='legacy@example.com', username='legacy', password=legacy)
+        tasks = []
+        with mock.patch.object(hashers.get_pool(), 'submit', lambda fn, *args: tasks.append((fn, args)) or True):
+            response = self.login(user.email)
+        self.assertEqual(response.status_code, 200, response.data)
+
+        user.refresh_from_db()
+        self.assertEqual(user.password, legacy)
+        self.assertEqual([fn for fn, _ in tasks], [hashers.rehash])
+        for fn, args in tasks:
+            fn(*args)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('scrypt$'))
+        self.assertTrue(user.check_password(PASSWORD))
+
+    def test_rehash_skips_changed_passwords(self):
+        legacy = make_password(PASSWORD, hasher='pbkdf2_sha256')
+        user = User.objects.create(email='legacy@example.com', username='legacy', password=legacy)
+        user.set_password('An0ther-passw0rd!')
+        user.save()
+        hashers.rehash(user.pk, PASSWORD, legacy)
+        user.refresh_from_db()
+        self.assertTrue(user.check_password('An0ther-passw0rd!'))
+
+    def test_full_pool_refuses_logins(self):
+        user = User.objects.create_user(email='reader@example.com', username='reader', password=PASSWORD)
+        with mock.patch.object(hashers.get_pool(), 'slots', threading.BoundedSemaphore(1)) as slots:
+            slots.acquire()
+            response = self.login(user.email)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
@@ -0,0 +1,75 @@
+"""
+JWTs carrying what StatelessJWTAuthentication needs to authenticate a
+request without loading the user:
+
+- email and is_staff, copied from the refresh token into every access
+  token minted from it;
+- refresh_jti, the jti of the refresh token an access token was minted
+  from, so logging out (blacklisting the refresh token) also revokes the
+  access tokens of that session.
+
+Blacklist checks go through the cached revocation set
+(accounts.revocation) instead of a query per token, and blacklisting /
+outstanding a token reuses the user id from its claims instead of loading
+the user.
+"""
+from django.db import IntegrityError, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from . import revocation
+
+REFRESH_JTI_CLAIM = 'refresh_jti'
+USER_CLAIMS = ('email', 'is_staff')
+
+
+class ClaimsRefreshToken(RefreshToken):
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        access[REFRESH_JTI_CLAIM] = self[api_settings.JTI_CLAIM]
+        return access
+
+    def check_blacklist(self):
+        if revocation.is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def _outstanding_defaults(self):
+        return {
+            'user_id': self.payload.get(api_settings.USER_ID_CLAIM),
+            'token': str(self),
+            'created_at': self.current_time,
+            'expires_at': datetime_from_epoch(self.payload['exp']),
+        }
+
+    def blacklist(self):
+        """
+        Blacklist this token; returns (BlacklistedToken, created). The
+        unique token_id makes this atomic: of concurrent calls for one
+        token, only one creates the entry.
+        """
+        outstanding, _created = OutstandingToken.objects.get_or_create(
+            jti=self.payload[api_settings.JTI_CLAIM], defaults=self._outstanding_defaults()
+        )
+        try:
+            with transaction.atomic():
+                return BlacklistedToken.objects.create(token=outstanding), True
+        except IntegrityError:
+            return BlacklistedToken.objects.get(token=outstanding), False
+
+    def outstand(self):
+        """Record a token minted by set_jti(), whose jti is new."""
+        return OutstandingToken.objects.create(
+            jti=self.payload[api_settings.JTI_CLAIM], **self._outstanding_defaults()
+        )
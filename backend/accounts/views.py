@@ -1,8 +1,10 @@
 from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
+from . import revocation
+from .authentication import get_full_user
+from .tokens import ClaimsRefreshToken
 from .serializers import (
     RegisterSerializer, UserSerializer, ChangePasswordSerializer, UpdateProfileSerializer
 )
@@ -12,10 +14,11 @@ User = get_user_model()
 class RegisterView(generics.CreateAPIView):
     """
     API view to register a new user.
-    Public access.
+    Public access, rate limited per client (see config.throttling).
     """
     queryset = User.objects.all()
     permission_classes = (permissions.AllowAny,)
+    throttle_scope = 'register'
     serializer_class = RegisterSerializer
 
 class LogoutView(APIView):
@@ -28,8 +31,8 @@ class LogoutView(APIView):
     def post(self, request):
         try:
             refresh_token = request.data["refresh"]
-            token = RefreshToken(refresh_token)
-            token.blacklist()
+            token = ClaimsRefreshToken(refresh_token)
+            revocation.revoke(token)
             return Response(status=status.HTTP_205_RESET_CONTENT)
         except Exception as e:
             return Response(status=status.HTTP_400_BAD_REQUEST)
@@ -42,7 +45,7 @@ class ProfileView(generics.RetrieveAPIView):
     serializer_class = UserSerializer
 
     def get_object(self):
-        return self.request.user
+        return get_full_user(self.request.user)
 
 class UpdateProfileView(generics.UpdateAPIView):
     """
@@ -52,7 +55,7 @@ class UpdateProfileView(generics.UpdateAPIView):
     serializer_class = UpdateProfileSerializer
 
     def get_object(self):
-        return self.request.user
+        return get_full_user(self.request.user)
 
 class ChangePasswordView(generics.UpdateAPIView):
     """
@@ -62,7 +65,7 @@ class ChangePasswordView(generics.UpdateAPIView):
     serializer_class = ChangePasswordSerializer
 
     def get_object(self):
-        return self.request.user
+        return get_full_user(self.request.user)
 
     def update(self, request, *args, **kwargs):
         """
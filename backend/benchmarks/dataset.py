@@ -0,0 +1,164 @@
+"""
+Deterministic dataset generator for benchmarks and local development.
+
+seed() fills the database with N books across M categories, K users and
+historical orders (with their items and payment transactions), using
+bulk inserts. The same seed always produces the same catalog, so
+benchmark runs on different commits are comparable.
+"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from books import facets
+from books.models import Book, Category
+from orders import reporting
+from orders.models import Order, OrderItem
+from payments.models import PaymentTransaction
+
+User = get_user_model()
+
+PASSWORD = 'benchmark-pass-123'
+
+WORDS = (
+    'shadow river garden silent empire winter golden secret night ocean '
+    'forest stone glass iron paper crown letter journey memory promise '
+    'storm island city mountain harbor lantern mirror orchard signal thread '
+    'wild quiet broken hidden last first little distant burning endless'
+).split()
+
+
+@contextmanager
+def preserve_timestamps(model, *field_names):
+    """Let bulk_create keep explicit values for auto_now(_add) fields."""
+    fields = [model._meta.get_field(name) for name in field_names]
+    saved = [(f.auto_now, f.auto_now_add) for f in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _phrase(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def seed(books=2000, categories=20, users=50, orders=500, seed=42, batch_size=1000, days=365, tokens=0):
+    """
+    Seed the database and return a summary of what was created.
+    All users share the password in PASSWORD.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+
+    def past():
+        return now - timedelta(seconds=rng.randint(0, days * 86400))
+
+    category_objs = Category.objects.bulk_create([
+        Category(name=f'Category {i}', slug=f'category-{seed}-{i}') for i in range(categories)
+    ])
+
+    book_objs = []
+    with preserve_timestamps(Book, 'created_at', 'updated_at'):
+        for i in range(books):
+            created = past()
+            book_objs.append(Book(
+                title=_phrase(rng, rng.randint(1, 5)).title(),
+                author=f'{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}',
+                description=_phrase(rng, rng.randint(30, 600)),
+                price=Decimal(rng.randint(299, 9999)) / 100,
+                category=rng.choice(category_objs),
+                stock_quantity=rng.choice([0] + [rng.randint(1, 500)] * 9),
+                isbn=f'9{seed % 10}{i:011d}',
+                publisher=f'{rng.choice(WORDS).title()} Press',
+                is_active=rng.random() > 0.05,
+                created_at=created,
+                updated_at=created,
+            ))
+        book_objs = Book.objects.bulk_create(book_objs, batch_size=batch_size)
+    # bulk_create skips the signals that maintain the facet table.
+    facets.rebuild()
+
+    password = make_password(PASSWORD)
+    user_objs = User.objects.bulk_create([
+        User(
+            email=f'reader{seed}-{i}@example.com', username=f'reader{seed}-{i}',
+            first_name='Bench', last_name=f'Reader {i}', password=password,
+            is_staff=(i == 0),
+        )
+        for i in range(users)
+    ], batch_size=batch_size)
+
+    order_objs, item_objs, txn_objs = [], [], []
+    with preserve_timestamps(Order, 'created_at', 'updated_at'), \
+            preserve_timestamps(PaymentTransaction, 'created_at'):
+        for i in range(orders):
+            created = past()
+            user = rng.choice(user_objs)
+            status_val = rng.choices(['paid', 'failed', 'pending'], weights=[80, 5, 15])[0]
+            order = Order(
+                user=user, email=user.email, payment_method='paystack',
+                payment_status=status_val, created_at=created, updated_at=created,
+            )
+            total = Decimal('0')
+            for book in rng.sample(book_objs, rng.randint(1, 5)):
+                quantity = rng.randint(1, 3)
+                subtotal = book.price * quantity
+                total += subtotal
+                item_objs.append(OrderItem(
+                    order=order, book=book, quantity=quantity, price=book.price, subtotal=subtotal
+                ))
+            order.total_amount = total
+            order_objs.append(order)
+            txn_objs.append(PaymentTransaction(
+                order=order, provider='paystack', reference=f'seed-{seed}-{i}',
+                status={'paid': 'successful', 'failed': 'failed', 'pending': 'pending'}[status_val],
+                created_at=created,
+            ))
+        Order.objects.bulk_create(order_objs, batch_size=batch_size)
+        OrderItem.objects.bulk_create(item_objs, batch_size=batch_size)
+        PaymentTransaction.objects.bulk_create(txn_objs, batch_size=batch_size)
+    reporting.rebuild()
+    seed_tokens(tokens, user_objs, rng, now)
+
+    return {
+        'seed': seed,
+        'categories': len(category_objs),
+        'books': len(book_objs),
+        'users': len(user_objs),
+        'orders': len(order_objs),
+        'order_items': len(item_objs),
+        'tokens': tokens,
+    }
+
+
+def seed_tokens(count, users, rng, now, batch_size=10000):
+    """
+    Fill the JWT blacklist tables the way logins and rotations would:
+    `count` refresh tokens issued over the last two refresh lifetimes (so
+    about half have expired), 95% of them blacklisted.
+    """
+    lifetime = jwt_settings.REFRESH_TOKEN_LIFETIME
+    span = 2 * lifetime.total_seconds()
+    for start in range(0, count, batch_size):
+        batch = []
+        for _ in range(min(batch_size, count - start)):
+            issued = now - timedelta(seconds=rng.uniform(0, span))
+            batch.append(OutstandingToken(
+                user=rng.choice(users), jti=f'{rng.getrandbits(128):032x}', token='',
+                created_at=issued, expires_at=issued + lifetime,
+            ))
+        outstanding = OutstandingToken.objects.bulk_create(batch)
+        BlacklistedToken.objects.bulk_create(
+            [BlacklistedToken(token=token) for token in outstanding if rng.random() < 0.95]
+        )
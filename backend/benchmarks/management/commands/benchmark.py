@@ -0,0 +1,110 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from benchmarks import dataset, runner
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the in-process API benchmark suite against a freshly seeded "
+        "throwaway database and write machine-readable results."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=2000)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--orders', type=int, default=500)
+        parser.add_argument(
+            '--tokens', type=int, default=0,
+            help="Outstanding/blacklisted JWTs to seed, e.g. to time accounts.refresh on a large blacklist."
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--requests', type=int, default=200, help="Requests per scenario.")
+        parser.add_argument('--concurrency', type=int, default=8, help="Threads for concurrent scenarios.")
+        parser.add_argument(
+            '--only', action='append', default=[],
+            help="Only run scenarios whose name starts with this prefix (repeatable)."
+        )
+        parser.add_argument('--output', help="Write the JSON results to this file.")
+        parser.add_argument('--compare', help="Baseline JSON results to compare against.")
+        parser.add_argument(
+            '--threshold', type=float, default=20.0,
+            help="Allowed p95 latency growth in percent before --compare fails."
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        tmpdir = tempfile.mkdtemp(prefix='bookshop-bench-')
+        if connection.vendor == 'sqlite':
+            # A file database rather than in-memory so concurrent scenarios
+            # exercise real connection-per-thread behaviour.
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tmpdir, 'bench.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        cache.clear()
+        try:
+            with transaction.atomic():
+                summary = dataset.seed(
+                    books=options['books'],
+                    categories=options['categories'],
+                    users=options['users'],
+                    orders=options['orders'],
+                    tokens=options['tokens'],
+                    seed=options['seed'],
+                )
+            self.stdout.write(f"Seeded {json.dumps(summary)}")
+            report = runner.run(
+                summary,
+                requests=options['requests'],
+                concurrency=options['concurrency'],
+                only=options['only'],
+                seed=options['seed'],
+                log=self.log_result,
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            self.compare(report, options['compare'], options['threshold'] / 100)
+
+    def log_result(self, name, result):
+        if 'p95_ms' in result:
+            self.stdout.write(
+                f"{name:32} {result['throughput_rps']:>9.1f} req/s  "
+                f"p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  "
+                f"p99 {result['p99_ms']:>8.2f}ms  queries {result['queries_mean']:>5.1f}  "
+                f"{result['bytes_mean']:>8} B  errors {result['errors']}"
+            )
+        else:
+            self.stdout.write(f"{name:32} {json.dumps(result)}")
+
+    def compare(self, report, baseline_path, threshold):
+        with open(baseline_path) as fh:
+            baseline = json.load(fh)
+        rows, regressions = runner.compare(report, baseline, threshold)
+        self.stdout.write(f"\nCompared with {baseline['meta'].get('revision') or baseline_path}:")
+        for row in rows:
+            flag = 'REGRESSED' if row['regressed'] else 'ok'
+            self.stdout.write(
+                f"{row['scenario']:32} p95 {row['p95_before_ms']:>8.2f} -> {row['p95_after_ms']:>8.2f}ms "
+                f"({row['p95_change']:+.1%})  max queries {row['queries_before']} -> {row['queries_after']}  {flag}"
+            )
+        if regressions:
+            raise CommandError(f"Performance regressed in: {', '.join(regressions)}")
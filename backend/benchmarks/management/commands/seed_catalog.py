@@ -0,0 +1,29 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from benchmarks import dataset
+
+
+class Command(BaseCommand):
+    help = "Fill the database with a deterministic catalog, users and order history."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=2000)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--orders', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            summary = dataset.seed(
+                books=options['books'],
+                categories=options['categories'],
+                users=options['users'],
+                orders=options['orders'],
+                seed=options['seed'],
+            )
+        self.stdout.write(json.dumps(summary))
+        self.stdout.write(self.style.SUCCESS(f"Seeded users share the password '{dataset.PASSWORD}'."))
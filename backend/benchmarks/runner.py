@@ -0,0 +1,381 @@
+"""
+In-process load tests for the REST API.
+
+Each scenario drives one endpoint through Django's full request stack
+(middleware, authentication, views, serializers) with APIClient, from a
+pool of threads. For every request the wall-clock latency, the number
+of SQL queries and the response size are recorded; scenarios report
+throughput, latency percentiles, queries and bytes per request.
+
+Results are plain JSON (see run()) so runs on different commits can be
+compared with compare().
+"""
+import os
+import platform
+import random
+import statistics
+import subprocess
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import django
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+
+from accounts.tokens import ClaimsRefreshToken
+from books.models import Book, Category
+from config import throttling
+from orders.models import Order
+from payments import worker
+from payments.models import PaymentTransaction
+from .dataset import PASSWORD, User
+
+
+@dataclass
+class Scenario:
+    """
+    A named endpoint workload. `call(client, rng, i)` issues request i and
+    returns the response; `user` authenticates the client when set.
+    """
+    name: str
+    call: Callable
+    requests: int = 200
+    concurrency: int = 1
+    user: Optional[object] = None
+    expected: tuple = (200,)
+    # Client addresses to spread requests over; 0 gives every request its
+    # own, so rate limits (config.throttling) are paid for but not hit.
+    clients: int = 0
+
+
+@dataclass
+class Result:
+    latencies: list = field(default_factory=list)
+    queries: list = field(default_factory=list)
+    sizes: list = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+    elapsed: float = 0.0
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(scenario, result):
+    latencies_ms = [value * 1000 for value in result.latencies]
+    unexpected = sum(
+        count for code, count in result.statuses.items() if code not in scenario.expected
+    )
+    return {
+        'requests': len(latencies_ms),
+        'concurrency': scenario.concurrency,
+        'throughput_rps': round(len(latencies_ms) / result.elapsed, 2) if result.elapsed else 0.0,
+        'mean_ms': round(statistics.fmean(latencies_ms), 3),
+        'p50_ms': round(percentile(latencies_ms, 50), 3),
+        'p95_ms': round(percentile(latencies_ms, 95), 3),
+        'p99_ms': round(percentile(latencies_ms, 99), 3),
+        'max_ms': round(max(latencies_ms), 3),
+        'queries_mean': round(statistics.fmean(result.queries), 2),
+        'queries_max': max(result.queries),
+        'bytes_mean': round(statistics.fmean(result.sizes)),
+        'status_codes': {str(code): count for code, count in sorted(result.statuses.items())},
+        'errors': unexpected,
+    }
+
+
+def _authenticate(client, user):
+    if user is not None:
+        token = ClaimsRefreshToken.for_user(user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+
+def _client_address(n):
+    return f'10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}'
+
+
+def run_scenario(scenario, seed=42):
+    result = Result()
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(i):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = APIClient()
+            _authenticate(client, scenario.user)
+        rng = random.Random(seed * 100003 + i)
+        client.defaults['REMOTE_ADDR'] = _client_address(i % scenario.clients if scenario.clients else i)
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = scenario.call(client, rng, i)
+            # Streamed exports are only produced as they are consumed.
+            size = len(b''.join(response.streaming_content) if response.streaming else response.content)
+            latency = time.perf_counter() - start
+        with lock:
+            result.latencies.append(latency)
+            result.queries.append(len(queries))
+            result.sizes.append(size)
+            result.statuses[response.status_code] += 1
+
+    def task(i):
+        try:
+            one(i)
+        finally:
+            close_old_connections()
+
+    start = time.perf_counter()
+    if scenario.concurrency <= 1:
+        for i in range(scenario.requests):
+            one(i)
+    else:
+        with ThreadPoolExecutor(max_workers=scenario.concurrency) as pool:
+            list(pool.map(task, range(scenario.requests)))
+    result.elapsed = time.perf_counter() - start
+    return summarize(scenario, result)
+
+
+def _deep_cursor(client, pages):
+    """Walk the book list to find the cursor of page `pages`."""
+    url = '/api/books/?page_size=24'
+    for _ in range(pages - 1):
+        next_url = client.get(url).data.get('next')
+        if not next_url:
+            break
+        url = next_url
+    return url
+
+
+def build_scenarios(requests=200, concurrency=8):
+    """Build the standard scenario set against the seeded database."""
+    book_ids = [str(pk) for pk in Book.objects.filter(is_active=True).values_list('id', flat=True)[:500]]
+    in_stock = [
+        str(pk) for pk in Book.objects.filter(is_active=True, stock_quantity__gte=100)
+        .values_list('id', flat=True)[:200]
+    ]
+    slugs = list(Category.objects.values_list('slug', flat=True))
+    staff = User.objects.filter(is_staff=True).first()
+    customer = User.objects.filter(is_staff=False, orders__isnull=False).first()
+    order_ids = [str(pk) for pk in Order.objects.filter(user=customer).values_list('id', flat=True)]
+    pending_refs = list(
+        PaymentTransaction.objects.filter(status='pending').values_list('reference', flat=True)[:50]
+    )
+    deep_page = _deep_cursor(APIClient(), 20)
+    words = ['shadow', 'river', 'gold', 'secret night', 'iron', 'harb', 'lantern mirror']
+
+    def checkout(client, rng, i):
+        items = [{'book_id': book_id, 'quantity': 1} for book_id in rng.sample(in_stock, rng.randint(1, 3))]
+        return client.post('/api/checkout/initiate/', {
+            'items': items, 'email': 'bench@example.com', 'provider': 'paystack'
+        }, format='json')
+
+    def webhook(client, rng, i):
+        # A storm: a few references delivered many times (provider retries),
+        # mixed with first deliveries.
+        reference = pending_refs[i % max(1, min(len(pending_refs), 10))] if pending_refs else 'missing'
+        return client.post('/api/payments/webhook/paystack/', {
+            'reference': reference, 'status': 'successful'
+        }, format='json')
+
+    def register(client, rng, i):
+        stamp = f'{int(time.time() * 1000)}-{i}-{rng.randint(0, 10 ** 6)}'
+        return client.post('/api/auth/register/', {
+            'email': f'new-{stamp}@example.com', 'username': f'new-{stamp}',
+            'password': PASSWORD, 'password_confirm': PASSWORD,
+            'first_name': 'New', 'last_name': 'Reader',
+        }, format='json')
+
+    def login(client, rng, i):
+        return client.post('/api/auth/login/', {'email': customer.email, 'password': PASSWORD}, format='json')
+
+    refresh_tokens = [str(ClaimsRefreshToken.for_user(customer))]
+
+    def refresh(client, rng, i):
+        # Refresh tokens rotate: each one is only accepted once.
+        response = client.post('/api/auth/token/refresh/', {'refresh': refresh_tokens[-1]}, format='json')
+        if response.status_code == 200:
+            refresh_tokens.append(response.data['refresh'])
+        return response
+
+    slow = max(10, requests // 10)
+    return [
+        Scenario('books.list', lambda c, r, i: c.get('/api/books/'), requests),
+        Scenario('books.list_slim', lambda c, r, i: c.get('/api/books/?expand='), requests),
+        Scenario('books.list_page_20', lambda c, r, i: c.get(deep_page), requests),
+        Scenario('books.list_concurrent', lambda c, r, i: c.get('/api/books/'), requests, concurrency),
+        Scenario('books.search', lambda c, r, i: c.get('/api/books/', {'search': r.choice(words)}), requests),
+        Scenario('books.filter', lambda c, r, i: c.get('/api/books/', {
+            'category': r.choice(slugs), 'min_price': 5, 'max_price': 50
+        }), requests),
+        Scenario('books.facets', lambda c, r, i: c.get('/api/books/facets/', {
+            'category': r.choice(slugs), 'max_price': 50
+        }), requests),
+        Scenario('books.facets_search', lambda c, r, i: c.get('/api/books/facets/', {
+            'search': r.choice(words)
+        }), requests),
+        Scenario('books.detail', lambda c, r, i: c.get(f'/api/books/{r.choice(book_ids)}/'), requests),
+        Scenario('books.categories', lambda c, r, i: c.get('/api/categories/'), requests),
+        Scenario('orders.list', lambda c, r, i: c.get('/api/orders/'), requests, user=customer),
+        Scenario('orders.list_compact', lambda c, r, i: c.get('/api/orders/?compact=true'), requests, user=customer),
+        Scenario('orders.list_staff', lambda c, r, i: c.get('/api/orders/'), requests, user=staff),
+        Scenario('orders.export', lambda c, r, i: c.get('/api/orders/export/', {'payment_status': 'paid'}),
+                 slow, user=staff),
+        Scenario('orders.daily_sales', lambda c, r, i: c.get('/api/orders/reports/daily/'), requests, user=staff),
+        Scenario('orders.detail', lambda c, r, i: c.get(f'/api/orders/{r.choice(order_ids)}/'), requests,
+                 user=customer),
+        Scenario('payments.checkout_concurrent', checkout, requests, concurrency, expected=(201,)),
+        # One client past its checkout limit: most requests answer 429.
+        Scenario('payments.checkout_flood', checkout, requests, concurrency, expected=(201, 429), clients=1),
+        Scenario('payments.webhook_storm', webhook, requests, concurrency, expected=(200, 202)),
+        Scenario('payments.confirm', lambda c, r, i: c.get('/api/checkout/confirm/', {
+            'reference': r.choice(pending_refs) if pending_refs else 'missing'
+        }), requests),
+        Scenario('accounts.register', register, slow, expected=(201,)),
+        Scenario('accounts.login', login, slow),
+        # Beyond PASSWORD_HASHING_QUEUE waiting logins the API answers 503.
+        Scenario('accounts.login_concurrent', login, slow, concurrency, expected=(200, 503)),
+        Scenario('accounts.refresh', refresh, slow),
+        Scenario('accounts.profile', lambda c, r, i: c.get('/api/auth/profile/'), requests, user=customer),
+    ]
+
+
+def run_webhook_drain(workers=4):
+    """Time the worker draining whatever the webhook storm queued."""
+    depth = worker.queue_depth()
+    queued = depth['pending'] + depth['processing']
+    start = time.perf_counter()
+    processed, failed, retried = worker.run(workers=workers, once=True)
+    elapsed = time.perf_counter() - start
+    return {
+        'events': queued,
+        'processed': processed,
+        'failed': failed,
+        'retried': retried,
+        'elapsed_s': round(elapsed, 4),
+        'events_per_s': round(queued / elapsed, 2) if elapsed and queued else 0.0,
+    }
+
+
+def run_rate_limit_overhead(checks=20000):
+    """Microseconds per throttle check, without a scope and with each store."""
+    factory = APIRequestFactory()
+    requests = [Request(factory.get('/', REMOTE_ADDR=_client_address(i))) for i in range(checks)]
+    for request in requests:
+        request.user  # Authenticated (anonymously) before throttles run.
+    unscoped, scoped = APIView(), APIView()
+    scoped.throttle_scope = 'bench'
+    rates = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'bench': '1000/s'}}
+
+    def time_checks(view):
+        start = time.perf_counter()
+        for request in requests:
+            throttling.RateLimitThrottle().allow_request(request, view)
+        return round((time.perf_counter() - start) / checks * 1e6, 2)
+
+    report = {'checks': checks}
+    with override_settings(REST_FRAMEWORK=rates):
+        report['unscoped_us'] = time_checks(unscoped)
+        for store in ('memory', 'cache'):
+            with override_settings(RATE_LIMIT_STORE=store):
+                throttling.clear()
+                report[f'{store}_us'] = time_checks(scoped)
+    throttling.clear()
+    return report
+
+
+def logins_per_core(login):
+    """Successful logins per second and per CPU, from accounts.login_concurrent."""
+    cpus = os.cpu_count() or 1
+    ok_share = login['status_codes'].get('200', 0) / login['requests']
+    logins_per_s = login['throughput_rps'] * ok_share
+    return {
+        'hasher': settings.PASSWORD_HASHER,
+        'cpus': cpus,
+        'hashing_workers': settings.PASSWORD_HASHING_WORKERS,
+        'logins_per_s': round(logins_per_s, 2),
+        'logins_per_s_per_core': round(logins_per_s / cpus, 2),
+        'refused': login['status_codes'].get('503', 0),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(dataset, requests=200, concurrency=8, only=None, seed=42, log=print):
+    """Run every scenario (or those whose name starts with one of `only`)."""
+    results = {}
+    for scenario in build_scenarios(requests, concurrency):
+        if only and not any(scenario.name.startswith(prefix) for prefix in only):
+            continue
+        results[scenario.name] = run_scenario(scenario, seed)
+        log(scenario.name, results[scenario.name])
+    if 'payments.webhook_storm' in results:
+        results['payments.webhook_drain'] = run_webhook_drain()
+        log('payments.webhook_drain', results['payments.webhook_drain'])
+    if not only or any('ratelimit.overhead'.startswith(prefix) for prefix in only):
+        results['ratelimit.overhead'] = run_rate_limit_overhead()
+        log('ratelimit.overhead', results['ratelimit.overhead'])
+    if 'accounts.login_concurrent' in results:
+        results['accounts.logins_per_core'] = logins_per_core(results['accounts.login_concurrent'])
+        log('accounts.logins_per_core', results['accounts.logins_per_core'])
+
+    return {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'cpus': os.cpu_count(),
+            'requests': requests,
+            'concurrency': concurrency,
+            'dataset': dataset,
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold=0.2):
+    """
+    Compare two result documents. Returns (rows, regressions): a row per
+    shared scenario, and the names of scenarios whose p95 latency grew by
+    more than `threshold` or whose worst-case query count went up. (The
+    mean depends on how many requests hit the cache, so it is reported
+    but not gated on.)
+    """
+    rows, regressions = [], []
+    for name, now in current['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if before is None or 'p95_ms' not in now or 'p95_ms' not in before:
+            continue
+        p95_change = (now['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+        regressed = p95_change > threshold or now['queries_max'] > before['queries_max']
+        rows.append({
+            'scenario': name,
+            'p95_before_ms': before['p95_ms'],
+            'p95_after_ms': now['p95_ms'],
+            'p95_change': round(p95_change, 4),
+            'queries_before': before['queries_max'],
+            'queries_after': now['queries_max'],
+            'regressed': regressed,
+        })
+        if regressed:
+            regressions.append(name)
+    return rows, regressions
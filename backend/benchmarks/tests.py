@@ -0,0 +1,44 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+
+class BenchmarkCommandTests(SimpleTestCase):
+    """
+    The app is only installed with BENCHMARKS_ENABLED=True, and the command
+    sets up a test environment and database of its own, so it runs in a
+    separate process rather than under this test run.
+    """
+
+    def benchmark(self, *args):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output = os.path.join(tmpdir, 'bench.json')
+            process = subprocess.run(
+                [sys.executable, 'manage.py', 'benchmark', '--output', output, *args],
+                cwd=settings.BASE_DIR, env={**os.environ, 'BENCHMARKS_ENABLED': 'True'},
+                capture_output=True, text=True, timeout=120,
+            )
+            self.assertEqual(process.returncode, 0, process.stderr)
+            with open(output) as fh:
+                return json.load(fh)
+
+    def test_reports_each_scenario(self):
+        report = self.benchmark(
+            '--books', '20', '--categories', '2', '--orders', '5', '--users', '3',
+            '--requests', '3', '--concurrency', '2', '--only', 'books.list',
+        )
+        self.assertEqual(report['meta']['dataset']['books'], 20)
+        self.assertEqual(report['meta']['requests'], 3)
+        self.assertTrue(report['results'])
+        for name, result in report['results'].items():
+            self.assertTrue(name.startswith('books.list'))
+            for key in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_mean', 'bytes_mean'):
+                self.assertIn(key, result)
+            self.assertEqual(result['requests'], 3)
+            self.assertEqual(result['errors'], 0)
+            self.assertEqual(result['status_codes'], {'200': 3})
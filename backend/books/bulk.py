@@ -0,0 +1,241 @@
+"""
+Bulk catalog import and export in CSV or JSONL.
+
+Both directions stream, so memory stays flat however long the feed is:
+
+- Import reads one row at a time, validates it against the Book model
+  fields, and upserts valid rows by isbn in batches with
+  bulk_create(update_conflicts=True). Categories are resolved by slug from
+  a map loaded once up front; unknown slugs are row errors, not new
+  categories. Rows without an isbn can't be matched and are rejected.
+  Invalid rows are reported with their line number and skipped; the rest
+  of the feed is still imported. Each batch commits on its own.
+  Optional columns left out of a row (or empty) keep their stored values
+  on existing books and take the model defaults on new ones.
+- Export walks the books with .iterator(chunk_size) and yields text one
+  row at a time, for a management command or a StreamingHttpResponse.
+
+Exported files import back unchanged (books without an isbn excepted).
+
+bulk_create bypasses model signals, so after an import the facet table
+is rebuilt and every cached catalog payload dropped; the search index is
+maintained by the database (see books.search).
+"""
+import csv
+import json
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from config.streaming import FORMATS, csv_lines, jsonl_lines
+from . import cache as catalog_cache
+from . import facets
+from .models import Book, Category
+
+
+# File columns, in export order; "category" holds the category slug.
+COLUMNS = (
+    'isbn', 'title', 'author', 'description', 'price', 'category',
+    'stock_quantity', 'publisher', 'is_active', 'cover_image',
+)
+REQUIRED_COLUMNS = ('isbn', 'title', 'author', 'price', 'category')
+MODEL_FIELDS = tuple(name for name in COLUMNS if name != 'category')
+
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'f', 'no', 'n'}
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def detect_format(filename, default='csv'):
+    """Guess the format from a file name: .jsonl / .ndjson, else CSV."""
+    if filename and filename.lower().endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if filename and filename.lower().endswith('.csv'):
+        return 'csv'
+    return default
+
+
+@dataclass
+class RowError:
+    line: int
+    errors: dict
+
+    def as_dict(self):
+        return {'line': self.line, 'errors': self.errors}
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    # The first `max_errors` row errors; `failed` counts them all.
+    errors: list = field(default_factory=list)
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'failed': self.failed,
+            'errors': [error.as_dict() for error in self.errors],
+        }
+
+
+def read_rows(lines, fmt):
+    """
+    Yield (line number, row dict or RowError) from an iterable of text
+    lines. Malformed JSON lines become RowErrors; blank lines are skipped.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            # Cells beyond the header end up under the None key.
+            row.pop(None, None)
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield number, RowError(number, {'row': [f'Invalid JSON: {exc}']})
+                continue
+            if not isinstance(row, dict):
+                yield number, RowError(number, {'row': ['Expected a JSON object.']})
+                continue
+            yield number, row
+    else:
+        raise ValueError(f"Unknown format {fmt!r}; use one of {', '.join(FORMATS)}")
+
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValidationError('Must be true or false.')
+
+
+def clean_row(row, categories):
+    """
+    Validate a raw row against the Book fields. Returns (values, None) or
+    (None, {column: [messages]}).
+    """
+    values, errors = {}, {}
+    for name in REQUIRED_COLUMNS:
+        if row.get(name) in (None, ''):
+            errors[name] = ['This field is required.']
+
+    slug = row.get('category')
+    if 'category' not in errors:
+        category_id = categories.get(str(slug).strip())
+        if category_id is None:
+            errors['category'] = [f'Unknown category {slug!r}.']
+        else:
+            values['category_id'] = category_id
+
+    for name in MODEL_FIELDS:
+        raw = row.get(name)
+        if name in errors or raw is None or (raw == '' and name not in REQUIRED_COLUMNS):
+            continue
+        if isinstance(raw, str):
+            raw = raw.strip()
+        model_field = Book._meta.get_field(name)
+        try:
+            if name == 'is_active':
+                values[name] = _to_bool(raw)
+            else:
+                values[name] = model_field.clean(raw, None)
+        except ValidationError as exc:
+            errors[name] = list(exc.messages)
+
+    if errors:
+        return None, errors
+    return values, None
+
+
+def _upsert(batch, fields, dry_run):
+    """Upsert {isbn: values} rows that all set `fields`; returns (created, updated)."""
+    existing = Book.objects.filter(isbn__in=batch).count()
+    if not dry_run:
+        update_fields = ['category' if name == 'category_id' else name for name in fields if name != 'isbn']
+        with transaction.atomic():
+            Book.objects.bulk_create(
+                [Book(**values) for values in batch.values()],
+                update_conflicts=True, unique_fields=['isbn'], update_fields=[*update_fields, 'updated_at'],
+            )
+    return len(batch) - existing, existing
+
+
+def import_books(lines, fmt, batch_size=DEFAULT_BATCH_SIZE, dry_run=False, max_errors=100, on_error=None):
+    """
+    Upsert the books in a CSV or JSONL stream. `on_error(RowError)` is
+    called for every rejected row. With `dry_run` rows are validated and
+    counted but nothing is written.
+    """
+    categories = dict(Category.objects.values_list('slug', 'id'))
+    result = ImportResult()
+    # Pending rows grouped by the fields they set, each group keyed by
+    # isbn: a later row for the same isbn replaces an earlier one, as one
+    # upsert can't touch a row twice.
+    batches = defaultdict(dict)
+
+    def reject(error):
+        result.failed += 1
+        if len(result.errors) < max_errors:
+            result.errors.append(error)
+        if on_error is not None:
+            on_error(error)
+
+    def flush(fields):
+        created, updated = _upsert(batches.pop(fields), fields, dry_run)
+        result.created += created
+        result.updated += updated
+
+    for line, row in read_rows(lines, fmt):
+        if isinstance(row, RowError):
+            reject(row)
+            continue
+        values, errors = clean_row(row, categories)
+        if errors:
+            reject(RowError(line, errors))
+            continue
+        fields = tuple(sorted(values))
+        batches[fields][values['isbn']] = values
+        if len(batches[fields]) >= batch_size:
+            flush(fields)
+    for fields in list(batches):
+        flush(fields)
+
+    if not dry_run and result.created + result.updated:
+        facets.rebuild()
+        transaction.on_commit(catalog_cache.invalidate_all)
+    return result
+
+
+def export_rows(queryset=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield one dict of file columns per book, streaming from the database."""
+    if queryset is None:
+        queryset = Book.objects.all()
+    columns = [name if name != 'category' else 'category__slug' for name in COLUMNS]
+    rows = queryset.order_by('created_at', 'id').values_list(*columns)
+    for values in rows.iterator(chunk_size=chunk_size):
+        row = dict(zip(COLUMNS, values))
+        row['price'] = str(row['price'])
+        yield row
+
+
+def export_lines(fmt, queryset=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the export as text, a line at a time."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; use one of {', '.join(FORMATS)}")
+    rows = export_rows(queryset, chunk_size)
+    return csv_lines(rows, COLUMNS) if fmt == 'csv' else jsonl_lines(rows)
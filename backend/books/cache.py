@@ -0,0 +1,177 @@
+"""
+Read-through cache for serialized catalog payloads.
+
+Book detail and book list responses are cached in the cache alias named
+by CATALOG_CACHE_ALIAS (local-memory LRU by default, Redis when REDIS_URL
+is set; see CACHES in settings).
+
+Invalidation:
+- Detail entries are keyed per book and deleted when that book changes.
+- List entries embed a catalog generation number, which is bumped on any
+  book or category change; stale list entries are never read again and
+  age out of the LRU / TTL.
+- Detail entries also embed a category generation number, bumped when a
+  category changes, because each book payload nests its category.
+
+Changes are picked up from Book/Category post_save/post_delete signals
+(books.signals) and from bulk stock updates in payments.services.
+
+The list generation is coarse on purpose: every book save (checkouts
+and payments included, through their stock updates) drops every cached
+page, including pages the book isn't on. Narrowing it to "fields in the
+list payload" wouldn't help, since updated_at is in the payload and
+changes on every save, and mapping a book to the pages it appears on
+would need the filters and cursors of every cached page. So the list
+hit rate falls as the write rate rises; stats() reports it separately
+from the detail hit rate (GET /api/books/cache-stats/), which is what to
+watch before reaching for anything finer.
+
+List entries are stored with a digest of their payload, taken when the
+page was built. BookListView uses it as the page's ETag, so validating a
+conditional request costs the cache lookup the page needs anyway.
+"""
+import hashlib
+import json
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+
+LIST_PARAMS = ('search', 'category', 'min_price', 'max_price', 'cursor', 'page_size', 'fields', 'expand')
+
+# Comma-separated name sets; order doesn't change the response.
+SET_PARAMS = ('fields', 'expand')
+
+CATALOG_GENERATION_KEY = 'catalog:generation'
+CATEGORY_GENERATION_KEY = 'catalog:category-generation'
+
+_stats_lock = threading.Lock()
+_stats = {'list': {'hits': 0, 'misses': 0}, 'detail': {'hits': 0, 'misses': 0}}
+
+
+def get_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def _record(kind, hit):
+    with _stats_lock:
+        _stats[kind]['hits' if hit else 'misses'] += 1
+
+
+def _rate(hits, misses):
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else 0.0,
+    }
+
+
+def stats():
+    """Return this process's hit/miss counters, overall and per kind."""
+    with _stats_lock:
+        counts = {kind: dict(counters) for kind, counters in _stats.items()}
+    overall = _rate(
+        sum(counters['hits'] for counters in counts.values()),
+        sum(counters['misses'] for counters in counts.values()),
+    )
+    return {**overall, **{kind: _rate(**counters) for kind, counters in counts.items()}}
+
+
+def reset_stats():
+    with _stats_lock:
+        for counters in _stats.values():
+            counters.update(hits=0, misses=0)
+
+
+def _generation(cache, key):
+    generation = cache.get(key)
+    if generation is None:
+        # add() so concurrent first readers agree on the starting value.
+        cache.add(key, 1, timeout=None)
+        generation = cache.get(key, 1)
+    return generation
+
+
+def _bump(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, timeout=None)
+
+
+def _read_through(cache, kind, key, build):
+    payload = cache.get(key)
+    if payload is not None:
+        _record(kind, True)
+        return payload
+    _record(kind, False)
+    payload = build()
+    cache.set(key, payload, timeout=settings.CATALOG_CACHE_TIMEOUT)
+    return payload
+
+
+def list_key(request, generation):
+    """Cache key for a list request: host plus normalized filter/page params."""
+    params = []
+    for name in LIST_PARAMS:
+        if name not in request.query_params:
+            continue
+        value = request.query_params[name].strip()
+        if name in SET_PARAMS:
+            value = ','.join(sorted({part.strip() for part in value.split(',') if part.strip()}))
+        if value or name in SET_PARAMS:
+            params.append(f'{name}={value}')
+    raw = '&'.join(params)
+    digest = hashlib.md5(f'{request.get_host()}?{raw}'.encode()).hexdigest()
+    return f'catalog:page:{generation}:{digest}'
+
+
+def detail_key(book_id, generation):
+    return f'catalog:book:{generation}:{book_id}'
+
+
+def _versioned(payload):
+    raw = json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return hashlib.md5(raw.encode()).hexdigest(), payload
+
+
+def get_or_set_list(request, build):
+    """
+    Return (version, payload) for a list request, where version is the
+    digest of the payload; it is the same in every process that serves it.
+    """
+    cache = get_cache()
+    key = list_key(request, _generation(cache, CATALOG_GENERATION_KEY))
+    return _read_through(cache, 'list', key, lambda: _versioned(build()))
+
+
+def get_or_set_detail(book_id, build):
+    """
+    Detail payloads are host-independent (built without the request, so
+    media URLs are relative); callers make URLs absolute per request.
+    """
+    cache = get_cache()
+    key = detail_key(book_id, _generation(cache, CATEGORY_GENERATION_KEY))
+    return _read_through(cache, 'detail', key, build)
+
+
+def invalidate_books(book_ids):
+    """Drop cached detail payloads for the given books and all list pages."""
+    cache = get_cache()
+    generation = _generation(cache, CATEGORY_GENERATION_KEY)
+    cache.delete_many([detail_key(book_id, generation) for book_id in book_ids])
+    _bump(CATALOG_GENERATION_KEY)
+
+
+def invalidate_categories():
+    """Drop every cached payload that nests category data."""
+    _bump(CATEGORY_GENERATION_KEY)
+    _bump(CATALOG_GENERATION_KEY)
+
+
+def invalidate_all():
+    """Drop every cached catalog payload (after bulk writes that skip signals)."""
+    invalidate_categories()
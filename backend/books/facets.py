@@ -0,0 +1,183 @@
+"""
+Catalog facets: counts of active books per category, price bucket and
+in-stock flag, for rendering storefront filters.
+
+Counts are materialized in BookFacet at (category, price, in_stock) grain,
+which is far smaller than the book table (prices repeat) yet still lets
+every BookListView filter except search - category slug and any price
+range - be answered exactly by one aggregate over the facet table.
+Searches fall back to the same aggregate over the matching books.
+
+The table is kept current incrementally:
+- Book save/delete signals (books.signals) move a book's count between
+  rows inside the saving transaction.
+- payments.services reports books that sold out via stock_depleted(),
+  and books put back in stock via stock_restored().
+Bulk writes that bypass signals (bulk_create, queryset.update) must call
+rebuild(), also available as `manage.py rebuild_facets`.
+"""
+from collections import Counter
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Case, Count, F, IntegerField, Q, Sum, Value, When
+
+from .models import Book, BookFacet
+from .search import search_books
+
+# Upper bounds (exclusive) of the price buckets; the last bucket is open.
+PRICE_BUCKET_BOUNDS = (Decimal('10.00'), Decimal('20.00'), Decimal('50.00'), Decimal('100.00'))
+
+KEY_FIELDS = ('category_id', 'price', 'stock_quantity', 'is_active')
+
+
+def facet_key(category_id, price, stock_quantity, is_active):
+    """The BookFacet row a book is counted in, or None if it isn't counted."""
+    if not is_active:
+        return None
+    return category_id, Decimal(price).quantize(Decimal('0.01')), stock_quantity > 0
+
+
+def book_key(book):
+    return facet_key(*(getattr(book, field) for field in KEY_FIELDS))
+
+
+def adjust(deltas):
+    """
+    Apply {facet key: count delta}. Must run inside the transaction that
+    changed the books, so counts commit or roll back with them.
+    """
+    for key, delta in deltas.items():
+        if key is None or delta == 0:
+            continue
+        category_id, price, in_stock = key
+        rows = BookFacet.objects.filter(category_id=category_id, price=price, in_stock=in_stock)
+        if delta < 0:
+            rows.filter(count__gte=-delta).update(count=F('count') + delta)
+            rows.filter(count=0).delete()
+        elif not rows.update(count=F('count') + delta):
+            try:
+                with transaction.atomic():
+                    BookFacet.objects.create(
+                        category_id=category_id, price=price, in_stock=in_stock, count=delta
+                    )
+            except IntegrityError:
+                # A concurrent writer created the row first.
+                rows.update(count=F('count') + delta)
+
+
+def move(old_key, new_key):
+    if old_key != new_key:
+        adjust(Counter({old_key: -1, new_key: 1}))
+
+
+def stock_depleted(book_ids):
+    """
+    Record that stock was deducted from the given books with a bulk UPDATE;
+    those now at zero move from the in-stock to the out-of-stock rows.
+    """
+    deltas = Counter()
+    sold_out = Book.objects.filter(id__in=book_ids, is_active=True, stock_quantity=0)
+    for category_id, price in sold_out.values_list('category_id', 'price'):
+        deltas[facet_key(category_id, price, 1, True)] -= 1
+        deltas[facet_key(category_id, price, 0, True)] += 1
+    adjust(deltas)
+
+
+def stock_restored(quantities):
+    """
+    Record that {book id: quantity} was put back in stock with a bulk
+    UPDATE; books that were at zero move to the in-stock rows.
+    """
+    if not quantities:
+        return
+    restocked = Q()
+    for book_id, quantity in quantities.items():
+        restocked |= Q(id=book_id, stock_quantity=quantity)
+    deltas = Counter()
+    for category_id, price in Book.objects.filter(restocked, is_active=True).values_list('category_id', 'price'):
+        deltas[facet_key(category_id, price, 0, True)] -= 1
+        deltas[facet_key(category_id, price, 1, True)] += 1
+    adjust(deltas)
+
+
+@transaction.atomic
+def rebuild():
+    """Recompute the whole facet table from the book table."""
+    BookFacet.objects.all().delete()
+    rows = (
+        Book.objects.filter(is_active=True).order_by()
+        .annotate(in_stock=Case(When(stock_quantity__gt=0, then=Value(True)),
+                                default=Value(False), output_field=BooleanField()))
+        .values('category_id', 'price', 'in_stock')
+        .annotate(count=Count('id'))
+    )
+    BookFacet.objects.bulk_create(
+        [BookFacet(**row) for row in rows.iterator(chunk_size=2000)], batch_size=1000
+    )
+
+
+def price_bucket():
+    return Case(
+        *[When(price__lt=bound, then=Value(i)) for i, bound in enumerate(PRICE_BUCKET_BOUNDS)],
+        default=Value(len(PRICE_BUCKET_BOUNDS)),
+        output_field=IntegerField(),
+    )
+
+
+def bucket_ranges():
+    lower = (Decimal('0.00'),) + PRICE_BUCKET_BOUNDS
+    upper = PRICE_BUCKET_BOUNDS + (None,)
+    return list(zip(lower, upper))
+
+
+def facet_rows(lookups, search=None):
+    """
+    One grouped query returning (category slug, name, bucket, in_stock, count)
+    rows for the books matching BookListView's filters.
+    """
+    if search:
+        books = search_books(Book.objects.filter(is_active=True), search).filter(**lookups)
+        return (
+            books.order_by()
+            .annotate(bucket=price_bucket(), stocked=Case(
+                When(stock_quantity__gt=0, then=Value(True)), default=Value(False), output_field=BooleanField()
+            ))
+            .values('category__slug', 'category__name', 'bucket', 'stocked')
+            .annotate(total=Count('id'))
+            .values_list('category__slug', 'category__name', 'bucket', 'stocked', 'total')
+        )
+    return (
+        BookFacet.objects.filter(**lookups).order_by()
+        .annotate(bucket=price_bucket())
+        .values('category__slug', 'category__name', 'bucket', 'in_stock')
+        .annotate(total=Sum('count'))
+        .values_list('category__slug', 'category__name', 'bucket', 'in_stock', 'total')
+    )
+
+
+def facet_counts(lookups, search=None):
+    """Fold facet rows into the category, price bucket and in-stock facets."""
+    categories, names = Counter(), {}
+    buckets = Counter()
+    stock = Counter()
+    total = 0
+    for slug, name, bucket, in_stock, count in facet_rows(lookups, search):
+        names[slug] = name
+        categories[slug] += count
+        buckets[bucket] += count
+        stock[in_stock] += count
+        total += count
+
+    return {
+        'total': total,
+        'categories': [
+            {'slug': slug, 'name': names[slug], 'count': categories[slug]}
+            for slug in sorted(categories, key=lambda slug: names[slug])
+        ],
+        'price_buckets': [
+            {'min': str(low), 'max': str(high) if high is not None else None, 'count': buckets[i]}
+            for i, (low, high) in enumerate(bucket_ranges())
+        ],
+        'in_stock': {'true': stock[True], 'false': stock[False]},
+    }
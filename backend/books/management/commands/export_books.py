@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from books import bulk
+
+
+class Command(BaseCommand):
+    help = "Stream every book to CSV or JSONL, in the format import_books reads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=bulk.FORMATS, default='csv', dest='fmt')
+        parser.add_argument('--output', '-o', default='-', help="File to write, or - for stdout.")
+        parser.add_argument(
+            '--chunk-size', type=int, default=bulk.DEFAULT_CHUNK_SIZE, help="Rows fetched per query."
+        )
+
+    def handle(self, *args, **options):
+        lines = bulk.export_lines(options['fmt'], chunk_size=options['chunk_size'])
+        if options['output'] == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            output.writelines(lines)
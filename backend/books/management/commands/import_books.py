@@ -0,0 +1,45 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from books import bulk
+
+
+class Command(BaseCommand):
+    help = "Upsert books by isbn from a CSV or JSONL file (see books.bulk for the columns)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or - for stdin.")
+        parser.add_argument(
+            '--format', choices=bulk.FORMATS, dest='fmt',
+            help="File format (default: from the file name, else csv)."
+        )
+        parser.add_argument('--batch-size', type=int, default=bulk.DEFAULT_BATCH_SIZE, help="Rows per upsert.")
+        parser.add_argument('--dry-run', action='store_true', help="Validate and count without writing.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['fmt'] or bulk.detect_format(path)
+
+        def report(error):
+            self.stderr.write(f"line {error.line}: {json.dumps(error.errors)}")
+
+        try:
+            if path == '-':
+                result = bulk.import_books(
+                    sys.stdin, fmt, options['batch_size'], options['dry_run'], on_error=report
+                )
+            else:
+                with open(path, encoding='utf-8-sig', newline='') as lines:
+                    result = bulk.import_books(
+                        lines, fmt, options['batch_size'], options['dry_run'], on_error=report
+                    )
+        except (OSError, UnicodeDecodeError) as exc:
+            raise CommandError(str(exc))
+
+        summary = f"{result.created} created, {result.updated} updated, {result.failed} failed"
+        if options['dry_run']:
+            summary += " (dry run, nothing written)"
+        style = self.style.WARNING if result.failed else self.style.SUCCESS
+        self.stdout.write(style(summary + "."))
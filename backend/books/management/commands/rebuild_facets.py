@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from books import facets
+from books.models import BookFacet
+
+
+class Command(BaseCommand):
+    help = "Recompute the catalog facet table from the books (after bulk imports or updates)."
+
+    def handle(self, *args, **options):
+        facets.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {BookFacet.objects.count()} facet rows."))
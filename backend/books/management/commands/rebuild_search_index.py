@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from books import search
+
+
+class Command(BaseCommand):
+    help = "Refill the SQLite full-text index from the books."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help="Database alias to rebuild.")
+
+    def handle(self, *args, **options):
+        search.rebuild_index(options['database'])
+        self.stdout.write(self.style.SUCCESS("Rebuilt the search index."))
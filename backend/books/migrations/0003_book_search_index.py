@@ -0,0 +1,86 @@
+from django.db import migrations
+
+# SQLite: an external-content FTS5 table over books_book, keyed on its
+# implicit rowid. books_book's primary key is a UUID, so the rowid isn't
+# stable: VACUUM may renumber it, and so does any migration that rebuilds
+# the table (see 0005_indexes), leaving the index pointing at the wrong
+# rows. 0008 replaces it with an index keyed on the book id.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE books_book_fts USING fts5(
+        title, author, description, isbn, publisher,
+        content='books_book', content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER books_book_fts_ai AFTER INSERT ON books_book BEGIN
+        INSERT INTO books_book_fts(rowid, title, author, description, isbn, publisher)
+        VALUES (new.rowid, new.title, new.author, new.description, new.isbn, new.publisher);
+    END
+    """,
+    """
+    CREATE TRIGGER books_book_fts_ad AFTER DELETE ON books_book BEGIN
+        INSERT INTO books_book_fts(books_book_fts, rowid, title, author, description, isbn, publisher)
+        VALUES ('delete', old.rowid, old.title, old.author, old.description, old.isbn, old.publisher);
+    END
+    """,
+    # Only reindex when a searchable column changes, so stock and price
+    # updates don't touch the index.
+    """
+    CREATE TRIGGER books_book_fts_au AFTER UPDATE OF title, author, description, isbn, publisher
+    ON books_book BEGIN
+        INSERT INTO books_book_fts(books_book_fts, rowid, title, author, description, isbn, publisher)
+        VALUES ('delete', old.rowid, old.title, old.author, old.description, old.isbn, old.publisher);
+        INSERT INTO books_book_fts(rowid, title, author, description, isbn, publisher)
+        VALUES (new.rowid, new.title, new.author, new.description, new.isbn, new.publisher);
+    END
+    """,
+    "INSERT INTO books_book_fts(books_book_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS books_book_fts_au",
+    "DROP TRIGGER IF EXISTS books_book_fts_ad",
+    "DROP TRIGGER IF EXISTS books_book_fts_ai",
+    "DROP TABLE IF EXISTS books_book_fts",
+]
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE books_book ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(isbn, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(author, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(publisher, '')), 'C') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'D')
+    ) STORED
+    """,
+    "CREATE INDEX books_book_search_vector_gin ON books_book USING GIN (search_vector)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS books_book_search_vector_gin",
+    "ALTER TABLE books_book DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0002_book_isbn_book_publisher'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            _run({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE}),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 6.0 on 2026-10-18 17:50
+
+import importlib
+
+from django.db import migrations, models
+
+# Adding the constraint rebuilds books_book on SQLite, which drops the
+# full-text triggers and may renumber the rowids 0003's index is keyed on.
+# Drop the index before the rebuild and create it again, filled from the
+# new rowids, after.
+rowid_index = importlib.import_module('books.migrations.0003_book_search_index')
+
+
+def _run_on_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'sqlite':
+            for statement in statements:
+                schema_editor.execute(statement)
+    return run
+
+
+drop_sqlite_search_index = _run_on_sqlite(rowid_index.SQLITE_REVERSE)
+create_sqlite_search_index = _run_on_sqlite(rowid_index.SQLITE_FORWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0004_category_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_sqlite_search_index, create_sqlite_search_index),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', 'price'], name='book_active_cat_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['price'], name='book_active_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at', '-id'], name='book_active_recent_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='book',
+            constraint=models.CheckConstraint(condition=models.Q(('stock_quantity__gte', 0)), name='book_stock_non_negative'),
+        ),
+        migrations.RunPython(create_sqlite_search_index, drop_sqlite_search_index),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 6.0 on 2026-10-18 17:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_facets(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    BookFacet = apps.get_model('books', 'BookFacet')
+    db_alias = schema_editor.connection.alias
+    rows = (
+        Book.objects.using(db_alias).filter(is_active=True).order_by()
+        .annotate(in_stock=models.Case(
+            models.When(stock_quantity__gt=0, then=models.Value(True)),
+            default=models.Value(False), output_field=models.BooleanField(),
+        ))
+        .values('category_id', 'price', 'in_stock')
+        .annotate(count=models.Count('id'))
+    )
+    BookFacet.objects.using(db_alias).bulk_create([BookFacet(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0005_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookFacet',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('in_stock', models.BooleanField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='books.category')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['price'], name='book_facet_price_idx')],
+                'constraints': [models.UniqueConstraint(fields=('category', 'price', 'in_stock'), name='unique_book_facet')],
+            },
+        ),
+        migrations.RunPython(populate_facets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,92 @@
+import importlib
+
+from django.db import migrations
+
+# 0003's index is keyed on books_book's implicit rowid, which VACUUM and
+# table rebuilds renumber. Replace it with one keyed on the book id:
+# books_book_search assigns each book a rowid of its own, which the
+# contentless FTS5 table is keyed on, so nothing depends on books_book's
+# rowids. The triggers are attached to books_book, so a migration that
+# rebuilds that table must run SQLITE_TRIGGERS again afterwards (the
+# index itself survives).
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER books_book_fts_ai AFTER INSERT ON books_book BEGIN
+        INSERT INTO books_book_search(book_id) VALUES (new.id);
+        INSERT INTO books_book_fts(rowid, title, author, description, isbn, publisher)
+        VALUES (last_insert_rowid(), new.title, new.author, new.description, new.isbn, new.publisher);
+    END
+    """,
+    """
+    CREATE TRIGGER books_book_fts_ad AFTER DELETE ON books_book BEGIN
+        INSERT INTO books_book_fts(books_book_fts, rowid, title, author, description, isbn, publisher)
+        SELECT 'delete', rowid, old.title, old.author, old.description, old.isbn, old.publisher
+        FROM books_book_search WHERE book_id = old.id;
+        DELETE FROM books_book_search WHERE book_id = old.id;
+    END
+    """,
+    # Only reindex when a searchable column changes, so stock and price
+    # updates don't touch the index.
+    """
+    CREATE TRIGGER books_book_fts_au AFTER UPDATE OF title, author, description, isbn, publisher
+    ON books_book BEGIN
+        INSERT INTO books_book_fts(books_book_fts, rowid, title, author, description, isbn, publisher)
+        SELECT 'delete', rowid, old.title, old.author, old.description, old.isbn, old.publisher
+        FROM books_book_search WHERE book_id = old.id;
+        INSERT INTO books_book_fts(rowid, title, author, description, isbn, publisher)
+        SELECT rowid, new.title, new.author, new.description, new.isbn, new.publisher
+        FROM books_book_search WHERE book_id = new.id;
+    END
+    """,
+]
+
+SQLITE_FORWARD = [
+    "CREATE TABLE books_book_search (rowid INTEGER PRIMARY KEY, book_id char(32) NOT NULL UNIQUE)",
+    """
+    CREATE VIRTUAL TABLE books_book_fts USING fts5(
+        title, author, description, isbn, publisher,
+        content='',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    *SQLITE_TRIGGERS,
+    "INSERT INTO books_book_search(book_id) SELECT id FROM books_book",
+    """
+    INSERT INTO books_book_fts(rowid, title, author, description, isbn, publisher)
+    SELECT s.rowid, b.title, b.author, b.description, b.isbn, b.publisher
+    FROM books_book b JOIN books_book_search s ON s.book_id = b.id
+    """,
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS books_book_fts_au",
+    "DROP TRIGGER IF EXISTS books_book_fts_ad",
+    "DROP TRIGGER IF EXISTS books_book_fts_ai",
+    "DROP TABLE IF EXISTS books_book_fts",
+    "DROP TABLE IF EXISTS books_book_search",
+]
+
+rowid_index = importlib.import_module('books.migrations.0003_book_search_index')
+
+
+def _run_on_sqlite(*statement_lists):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'sqlite':
+            for statements in statement_lists:
+                for statement in statements:
+                    schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0007_book_cover_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run_on_sqlite(rowid_index.SQLITE_REVERSE, SQLITE_FORWARD),
+            _run_on_sqlite(SQLITE_REVERSE, rowid_index.SQLITE_FORWARD),
+        ),
+    ]
@@ -9,6 +9,7 @@ class Category(models.Model):
     name = models.CharField(max_length=255)
     slug = models.SlugField(unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = "Categories"
@@ -27,6 +28,7 @@ class Book(models.Model):
     - description: Book description
     - price: Book price
     - cover_image: Book cover image (defaults to default_book.jpg)
+    - cover_variants: Storage names of the cover's thumbnails (see images.thumbnails)
     - category: Foreign key to Category
     - stock_quantity: Number of books in stock
     - is_active: Boolean to soft delete/hide books
@@ -37,6 +39,7 @@ class Book(models.Model):
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     cover_image = models.ImageField(upload_to='books/', default='defaults/default_book.jpg')
+    cover_variants = models.JSONField(null=True, blank=True, editable=False)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='books')
     stock_quantity = models.PositiveIntegerField(default=0)
     isbn = models.CharField(max_length=13, unique=True, blank=True, null=True)
@@ -45,6 +48,23 @@ class Book(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Storefront filters: active books by category and price range.
+            models.Index(
+                fields=['category', 'price'], condition=models.Q(is_active=True), name='book_active_cat_price_idx'
+            ),
+            # Price filters without a category, over active books only.
+            models.Index(fields=['price'], condition=models.Q(is_active=True), name='book_active_price_idx'),
+            # Keyset pagination of active books, newest first.
+            models.Index(
+                fields=['-created_at', '-id'], condition=models.Q(is_active=True), name='book_active_recent_idx'
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(stock_quantity__gte=0), name='book_stock_non_negative'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -52,3 +72,27 @@ class Book(models.Model):
     def is_in_stock(self):
         """Check if book is in stock."""
         return self.stock_quantity > 0
+
+class BookFacet(models.Model):
+    """
+    Materialized count of active books per (category, price, in-stock flag),
+    maintained incrementally by books.facets. Facet queries aggregate these
+    rows instead of scanning the book table.
+    """
+    id = models.BigAutoField(primary_key=True)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='facets')
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    in_stock = models.BooleanField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'price', 'in_stock'], name='unique_book_facet'),
+        ]
+        indexes = [
+            # Price filters without a category.
+            models.Index(fields=['price'], name='book_facet_price_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.category_id} @ {self.price} ({"in" if self.in_stock else "out of"} stock): {self.count}'
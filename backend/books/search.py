@@ -0,0 +1,123 @@
+"""
+Full-text search over the book catalog.
+
+The index is maintained by the database itself so every write to
+books_book (save, bulk update, raw SQL) keeps it current incrementally:
+
+- SQLite: a contentless FTS5 table (books_book_fts) kept in sync by
+  triggers, ranked with bm25(). It is keyed on books_book_search, which
+  gives every book id a rowid of its own, so the index doesn't depend on
+  books_book's rowids (VACUUM and table rebuilds renumber those).
+- PostgreSQL: a stored, generated tsvector column (search_vector) with a
+  GIN index, ranked with ts_rank().
+
+Both are created by migration 0003_book_search_index; 0008 rekeys the
+SQLite index by book id. Other backends fall back to icontains matching.
+rebuild_index() (`manage.py rebuild_search_index`) refills the SQLite
+index from scratch, should it ever drift from the table.
+
+Every search term is prefix-matched, so "harr pot" finds "Harry Potter".
+Matching rows are annotated with `search_rank`, where higher is better.
+"""
+import re
+
+from django.db import connections, transaction
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'books_book_fts'
+FTS_IDS_TABLE = 'books_book_search'
+
+# Column weights: title, author, description, isbn, publisher.
+FTS_WEIGHTS = (10.0, 5.0, 1.0, 10.0, 2.0)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def rebuild_index(using='default'):
+    """Refill the SQLite index from books_book; a no-op elsewhere."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')")
+        cursor.execute(f"DELETE FROM {FTS_IDS_TABLE}")
+        cursor.execute(f"INSERT INTO {FTS_IDS_TABLE}(book_id) SELECT id FROM books_book")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, title, author, description, isbn, publisher) "
+            f"SELECT s.rowid, b.title, b.author, b.description, b.isbn, b.publisher "
+            f"FROM books_book b JOIN {FTS_IDS_TABLE} s ON s.book_id = b.id"
+        )
+
+
+def tokenize(query):
+    """Split a user query into index terms, dropping punctuation."""
+    return TOKEN_RE.findall(query.lower())
+
+
+def _sqlite_query(terms):
+    # Quoting each term neutralises FTS5 operators (AND, NEAR, column:...).
+    return ' '.join('"%s"*' % term for term in terms)
+
+
+def _postgres_query(terms):
+    return ' & '.join('%s:*' % term for term in terms)
+
+
+def search_books(queryset, query):
+    """
+    Filter a Book queryset down to rows matching `query` and annotate each
+    with `search_rank`.
+    """
+    terms = tokenize(query)
+    if not terms:
+        # Still annotated: callers order and paginate on search_rank.
+        return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        match = _sqlite_query(terms)
+        return queryset.filter(
+            RawSQL(
+                'books_book.id IN (SELECT s.book_id FROM {fts} JOIN {ids} s ON s.rowid = {fts}.rowid '
+                'WHERE {fts} MATCH %s)'.format(fts=FTS_TABLE, ids=FTS_IDS_TABLE),
+                [match],
+                output_field=BooleanField(),
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                '(SELECT -bm25({fts}, {weights}) FROM {fts} JOIN {ids} s ON s.rowid = {fts}.rowid '
+                'WHERE {fts} MATCH %s AND s.book_id = books_book.id)'.format(
+                    fts=FTS_TABLE, ids=FTS_IDS_TABLE, weights=', '.join(str(w) for w in FTS_WEIGHTS)
+                ),
+                [match],
+                output_field=FloatField(),
+            )
+        )
+
+    if vendor == 'postgresql':
+        match = _postgres_query(terms)
+        return queryset.filter(
+            RawSQL(
+                "books_book.search_vector @@ to_tsquery('simple', %s)",
+                [match],
+                output_field=BooleanField(),
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                "ts_rank(books_book.search_vector, to_tsquery('simple', %s))",
+                [match],
+                output_field=FloatField(),
+            )
+        )
+
+    condition = Q()
+    for term in terms:
+        condition &= (
+            Q(title__icontains=term) | Q(author__icontains=term)
+            | Q(description__icontains=term) | Q(isbn__icontains=term)
+            | Q(publisher__icontains=term)
+        )
+    return queryset.filter(condition).annotate(
+        search_rank=Value(0.0, output_field=FloatField())
+    )
@@ -1,4 +1,6 @@
 from rest_framework import serializers
+from config.serialization import CompiledSerializer
+from images.serializers import ImageVariantsField
 from .models import Category, Book
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -13,8 +15,11 @@ class BookSerializer(serializers.ModelSerializer):
     """
     Serializer for Book model.
     Includes nested category details and handles category_id for writing.
+    cover_srcset holds srcset strings of the cover's thumbnails once they
+    have been generated (see images.thumbnails).
     """
     category = CategorySerializer(read_only=True)
+    cover_srcset = ImageVariantsField(source='cover_variants')
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(), source='category', write_only=True
     )
@@ -23,7 +28,96 @@ class BookSerializer(serializers.ModelSerializer):
         model = Book
         fields = [
             'id', 'title', 'author', 'description', 'price', 
-            'cover_image', 'category', 'category_id', 
+            'cover_image', 'cover_srcset', 'category', 'category_id', 
             'stock_quantity', 'isbn', 'publisher', 'is_active', 'is_in_stock', 
             'created_at', 'updated_at'
         ]
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin for sparse fieldsets. Reads two options from the
+    serializer context:
+    - fields: names of the fields to include (default: Meta.default_fields
+      when set, otherwise every field)
+    - expand: names from `expandable_fields` to render as nested objects;
+      unexpanded, they render as the related object's id
+    """
+    expandable_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self.context.get('fields') or getattr(self.Meta, 'default_fields', None)
+        if requested is not None:
+            fields = {name: field for name, field in fields.items() if name in requested}
+        for name in self.context.get('expand', ()):
+            if name in fields:
+                fields[name] = self.expandable_fields[name](read_only=True)
+        return fields
+
+
+class BookListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    Lightweight, read-only book representation for grid views: by default
+    only the fields a book card shows, with the category as its id.
+    Any BookSerializer field can be requested with ?fields=, and the
+    category nested with ?expand=category.
+    """
+    category = serializers.PrimaryKeyRelatedField(read_only=True)
+    cover_srcset = ImageVariantsField(source='cover_variants')
+    expandable_fields = {'category': CategorySerializer}
+
+    # Model columns each field reads, for QuerySet.only().
+    field_columns = {
+        'category': ('category_id',),
+        'cover_srcset': ('cover_variants',),
+        'is_in_stock': ('stock_quantity',),
+    }
+    expanded_columns = {
+        'category': ('category__id', 'category__name', 'category__slug', 'category__created_at'),
+    }
+
+    class Meta:
+        model = Book
+        fields = [
+            'id', 'title', 'author', 'description', 'price',
+            'cover_image', 'cover_srcset', 'category',
+            'stock_quantity', 'isbn', 'publisher', 'is_active', 'is_in_stock',
+            'created_at', 'updated_at'
+        ]
+        default_fields = ['id', 'title', 'author', 'price', 'cover_image', 'cover_srcset', 'category', 'is_in_stock']
+        read_only_fields = fields
+
+    @classmethod
+    def only_columns(cls, fields, expand):
+        """The columns to load for the given fields and expansions."""
+        columns = {'id'}
+        for name in fields:
+            columns.update(cls.field_columns.get(name, (name,)))
+            if name in expand:
+                columns.update(cls.expanded_columns[name])
+        return sorted(columns)
+
+    @classmethod
+    def project(cls, data, fields, expand):
+        """
+        Cut a full BookSerializer payload down to the given fields, the way
+        this serializer would render them.
+        """
+        projected = {}
+        for name in cls.Meta.fields:
+            if name not in fields:
+                continue
+            value = data[name]
+            if name in cls.expandable_fields and name not in expand and value is not None:
+                value = value['id']
+            projected[name] = value
+        return projected
+
+
+# Model properties the compiled serializers compute from columns.
+BOOK_PROPERTIES = {
+    Book: {'is_in_stock': (('stock_quantity',), lambda stock_quantity: stock_quantity > 0)},
+}
+
+# BookSerializer output from .values() rows (see config.serialization).
+compiled_book_serializer = CompiledSerializer(BookSerializer, BOOK_PROPERTIES)
@@ -0,0 +1,51 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from images.signals import variants_updated
+
+from . import cache as catalog_cache
+from . import facets
+from .models import Book, Category
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_book_cache(sender, instance, **kwargs):
+    """Drop the cached payloads for a book once its change commits."""
+    book_id = instance.pk
+    transaction.on_commit(lambda: catalog_cache.invalidate_books([book_id]))
+
+
+@receiver(variants_updated, sender=Book)
+def invalidate_book_cache_on_thumbnails(sender, pk, **kwargs):
+    """Thumbnail URLs are part of the cached payloads."""
+    catalog_cache.invalidate_books([pk])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    """Category data is nested in every book payload."""
+    transaction.on_commit(catalog_cache.invalidate_categories)
+
+
+@receiver(pre_save, sender=Book)
+def remember_facet_key(sender, instance, update_fields=None, **kwargs):
+    """Look up which facet row the stored version of the book counts in."""
+    facet_fields = {'category', 'category_id', 'price', 'stock_quantity', 'is_active'}
+    if update_fields is not None and not set(update_fields) & facet_fields:
+        instance._facet_key = facets.book_key(instance)
+        return
+    stored = Book.objects.filter(pk=instance.pk).values_list(*facets.KEY_FIELDS).first()
+    instance._facet_key = facets.facet_key(*stored) if stored else None
+
+
+@receiver(post_save, sender=Book)
+def update_facets_on_save(sender, instance, **kwargs):
+    facets.move(getattr(instance, '_facet_key', None), facets.book_key(instance))
+
+
+@receiver(post_delete, sender=Book)
+def update_facets_on_delete(sender, instance, **kwargs):
+    facets.move(facets.book_key(instance), None)
@@ -1,3 +1,726 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import uuid
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+
+from . import bulk
+from . import cache as catalog_cache
+from . import facets
+from orders.models import Order, OrderItem
+from payments.models import PaymentTransaction
+from payments.services import deduct_stock, release_stock_for_orders
+from .models import Book, BookFacet, Category
+from .search import search_books
+from .serializers import BookListSerializer, BookSerializer, compiled_book_serializer
+
+User = get_user_model()
+
+
+class IndexUsageTestMixin:
+    """
+    Asserts that a queryset's plan (EXPLAIN) uses a given index.
+
+    On PostgreSQL sequential scans are disabled for the test, since the
+    planner would otherwise prefer them on near-empty tables.
+    """
+
+    def assertUsesIndex(self, queryset, index_name):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, f"Expected {index_name} in plan:\n{plan}")
+
+
+class BookIndexTests(IndexUsageTestMixin, TestCase):
+    """
+    Regression tests proving each hot catalog query is served by its index.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Fiction', slug='fiction')
+        Book.objects.create(
+            title='A Book', author='An Author', description='Text', price=10,
+            category=cls.category, stock_quantity=3,
+        )
+
+    def test_category_and_price_filter_uses_index(self):
+        queryset = Book.objects.filter(
+            is_active=True, category__slug='fiction', price__gte=5, price__lte=20
+        )
+        self.assertUsesIndex(queryset, 'book_active_cat_price_idx')
+
+    def test_price_filter_uses_partial_index(self):
+        queryset = Book.objects.filter(is_active=True, price__gte=5)
+        self.assertUsesIndex(queryset, 'book_active_price_idx')
+
+    def test_keyset_listing_uses_partial_index(self):
+        latest = Book.objects.get()
+        queryset = Book.objects.filter(is_active=True, created_at__lt=latest.created_at).order_by(
+            '-created_at', '-id'
+        )[:25]
+        self.assertUsesIndex(queryset, 'book_active_recent_idx')
+
+
+class BookConstraintTests(TestCase):
+
+    def test_stock_cannot_go_negative(self):
+        category = Category.objects.create(name='Fiction', slug='fiction')
+        book = Book.objects.create(
+            title='A Book', author='An Author', description='Text', price=10,
+            category=category, stock_quantity=1,
+        )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Book.objects.filter(pk=book.pk).update(stock_quantity=F('stock_quantity') - 2)
+
+
+class BookSearchTests(TestCase):
+    """Full-text search (books.search) and ranked pagination of its results."""
+
+    @classmethod
+    def setUpTestData(cls):
+        fiction = Category.objects.create(name='Fiction', slug='fiction')
+
+        def book(title, description='Text.', author='An Author'):
+            return Book.objects.create(
+                title=title, author=author, description=description, price=10,
+                category=fiction, stock_quantity=1,
+            )
+
+        cls.in_title = book('The Iron Harbour')
+        cls.in_description = book('Quiet Waters', description='An iron gate by the sea.')
+        cls.unrelated = book('Silent Rivers', author='Bo Chen')
+        cls.many = [book(f'Iron Lantern {i}', description='Iron and iron again.') for i in range(4)]
+
+    def setUp(self):
+        catalog_cache.get_cache().clear()
+
+    def search(self, query):
+        return list(search_books(Book.objects.all(), query).order_by('-search_rank', '-id'))
+
+    def test_prefix_matching(self):
+        self.assertEqual(self.search('harb'), [self.in_title])
+        self.assertEqual(self.search('iron harb'), [self.in_title])
+        self.assertEqual(self.search('chen'), [self.unrelated])
+
+    def test_title_matches_rank_above_description_matches(self):
+        results = self.search('iron')
+        self.assertEqual(len(results), 6)
+        self.assertEqual(results[-1], self.in_description)
+        ranks = [book.search_rank for book in results]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+
+    def test_queries_without_terms_match_nothing(self):
+        for query in ('"', '-', '   ', '*:()'):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query), [])
+                response = self.client.get('/api/books/', {'search': query})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data['results'], [])
+
+    def test_empty_search_lists_everything(self):
+        response = self.client.get('/api/books/', {'search': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), Book.objects.count())
+
+    def test_paginates_ranked_results(self):
+        expected = [str(book.id) for book in self.search('iron')]
+        seen, url = [], '/api/books/?search=iron&page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(seen, expected)
+
+    def test_survives_rowid_changes(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('The FTS5 index is SQLite only')
+        # As VACUUM or a table rebuild may do.
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE books_book SET rowid = rowid + 1000')
+        self.assertEqual(self.search('harb'), [self.in_title])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.in_title.title = 'The Copper Harbour'
+        self.in_title.save()
+        self.assertEqual(self.search('copper'), [self.in_title])
+        self.assertEqual(self.search('iron harb'), [])
+        self.unrelated.delete()
+        self.assertEqual(self.search('chen'), [])
+
+    def test_rebuild(self):
+        expected = self.search('iron')
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(self.search('iron'), expected)
+        self.assertEqual(self.search('harb'), [self.in_title])
+
+
+class BookFacetTests(TestCase):
+    """Incremental upkeep of the facet table and the facets endpoint (books.facets)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fiction = Category.objects.create(name='Fiction', slug='fiction')
+        cls.poetry = Category.objects.create(name='Poetry', slug='poetry')
+        cls.book = Book.objects.create(
+            title='Book', author='An Author', description='Text', price=Decimal('5.00'),
+            category=cls.fiction, stock_quantity=2,
+        )
+        Book.objects.create(
+            title='Other', author='An Author', description='Text', price=Decimal('5.00'),
+            category=cls.fiction, stock_quantity=1,
+        )
+
+    def setUp(self):
+        catalog_cache.get_cache().clear()
+
+    def rows(self):
+        return {
+            (facet.category.slug, str(facet.price), facet.in_stock): facet.count
+            for facet in BookFacet.objects.select_related('category')
+        }
+
+    def assertRows(self, expected):
+        rows = self.rows()
+        self.assertEqual(rows, expected)
+        # Incremental upkeep agrees with a rebuild from scratch.
+        facets.rebuild()
+        self.assertEqual(self.rows(), rows)
+
+    def test_create_update_delete_move_counts(self):
+        self.assertRows({('fiction', '5.00', True): 2})
+        self.book.price = Decimal('25.00')
+        self.book.save()
+        self.assertRows({('fiction', '5.00', True): 1, ('fiction', '25.00', True): 1})
+        self.book.category = self.poetry
+        self.book.save(update_fields=['category'])
+        self.assertRows({('fiction', '5.00', True): 1, ('poetry', '25.00', True): 1})
+        self.book.stock_quantity = 0
+        self.book.save()
+        self.assertRows({('fiction', '5.00', True): 1, ('poetry', '25.00', False): 1})
+        self.book.is_active = False
+        self.book.save()
+        self.assertRows({('fiction', '5.00', True): 1})
+        self.book.is_active = True
+        self.book.save()
+        self.book.delete()
+        self.assertRows({('fiction', '5.00', True): 1})
+        # Changes that don't touch the key leave the rows alone.
+        other = Book.objects.get(title='Other')
+        other.title = 'Renamed'
+        other.save(update_fields=['title'])
+        self.assertRows({('fiction', '5.00', True): 1})
+
+    def test_bulk_stock_changes_move_counts(self):
+        deduct_stock({self.book.pk: 1})
+        self.assertRows({('fiction', '5.00', True): 2})
+        deduct_stock({self.book.pk: 1})
+        self.assertRows({('fiction', '5.00', True): 1, ('fiction', '5.00', False): 1})
+
+        order = Order.objects.create(email='buyer@example.com', total_amount=Decimal('10.00'))
+        OrderItem.objects.create(order=order, book=self.book, quantity=2, price=self.book.price)
+        release_stock_for_orders([order.pk])
+        self.assertRows({('fiction', '5.00', True): 2})
+
+    def test_endpoint(self):
+        self.book.price = Decimal('25.00')
+        self.book.stock_quantity = 0
+        self.book.save()
+        data = self.client.get('/api/books/facets/').data
+        self.assertEqual(data['total'], 2)
+        self.assertEqual(data['categories'], [{'slug': 'fiction', 'name': 'Fiction', 'count': 2}])
+        self.assertEqual([bucket['count'] for bucket in data['price_buckets']], [1, 0, 1, 0, 0])
+        self.assertEqual(data['in_stock'], {'true': 1, 'false': 1})
+        data = self.client.get('/api/books/facets/', {'min_price': '10', 'max_price': '30'}).data
+        self.assertEqual((data['total'], data['in_stock']), (1, {'true': 0, 'false': 1}))
+
+    def test_invalid_prices_are_rejected(self):
+        for url in ('/api/books/facets/', '/api/books/'):
+            for params in ({'min_price': 'abc'}, {'max_price': '1e'}, {'min_price': 'NaN'}, {'max_price': 'inf'}):
+                with self.subTest(url=url, params=params):
+                    response = self.client.get(url, params)
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn(next(iter(params)), response.data)
+            self.assertEqual(self.client.get(url, {'min_price': '', 'max_price': ' 9.5 '}).status_code, 200)
+
+
+class CompiledBookSerializerTests(TestCase):
+    """
+    Contract tests: the compiled serializer (config.serialization) must
+    render exactly the same JSON as BookSerializer, directly and through
+    the list and detail endpoints.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        fiction = Category.objects.create(name='Fiction', slug='fiction')
+        poetry = Category.objects.create(name='Poetry & Verse', slug='poetry')
+        cls.books = [
+            Book.objects.create(
+                title='The Iron Harbour', author='Ada Lane', description='Ships, "quotes" and ünïcode.',
+                price=Decimal('12.50'), category=fiction, stock_quantity=4, isbn='9780000000011',
+                publisher='Harbour Press', cover_image='books/iron.jpg',
+            ),
+            Book.objects.create(
+                title='Silent Rivers', author='Bo Chen', description='Poems.', price=Decimal('7'),
+                category=poetry, stock_quantity=0,
+            ),
+        ]
+        for i in range(3):
+            Book.objects.create(
+                title=f'Iron Lantern {i}', author='Cy Dale', description='More.', price=Decimal('3.333'),
+                category=fiction, stock_quantity=i,
+            )
+        # Thumbnails as stored by images.worker.
+        Book.objects.filter(pk=cls.books[0].pk).update(cover_variants={
+            'webp': [[160, 'books/iron.w160.webp'], [320, 'books/iron.w320.webp']],
+            'jpeg': [[160, 'books/iron.w160.jpg'], [320, 'books/iron.w320.jpg']],
+        })
+        cls.books[0].refresh_from_db()
+
+    def setUp(self):
+        catalog_cache.get_cache().clear()
+
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def assertSameResponse(self, url):
+        catalog_cache.get_cache().clear()
+        with override_settings(FAST_SERIALIZATION=False):
+            expected = self.client.get(url)
+        catalog_cache.get_cache().clear()
+        actual = self.client.get(url)
+        self.assertEqual(actual.status_code, expected.status_code)
+        self.assertEqual(actual.content, expected.content)
+        return actual
+
+    def test_matches_book_serializer(self):
+        request = APIRequestFactory().get('/api/books/')
+        queryset = Book.objects.order_by('-created_at', '-id')
+        expected = BookSerializer(queryset, many=True, context={'request': request}).data
+        actual = compiled_book_serializer.serialize(compiled_book_serializer.values(queryset), request)
+        self.assertEqual(self.render(actual), self.render(expected))
+
+    def test_matches_book_serializer_without_request(self):
+        book = self.books[0]
+        actual = compiled_book_serializer.serialize(
+            compiled_book_serializer.values(Book.objects.filter(pk=book.pk))
+        )
+        self.assertEqual(self.render(actual[0]), self.render(BookSerializer(book).data))
+
+    def test_matches_book_serializer_in_another_timezone(self):
+        with timezone.override('Africa/Lagos'):
+            expected = BookSerializer(Book.objects.order_by('id'), many=True).data
+            actual = compiled_book_serializer.serialize(
+                compiled_book_serializer.values(Book.objects.order_by('id'))
+            )
+        self.assertEqual(self.render(actual), self.render(expected))
+
+    def test_list_endpoint_matches(self):
+        response = self.assertSameResponse('/api/books/?page_size=2')
+        self.assertSameResponse(response.data['next'])
+        self.assertSameResponse('/api/books/?category=fiction&min_price=3&max_price=20')
+
+    def test_search_endpoint_matches(self):
+        response = self.assertSameResponse('/api/books/?search=iron&page_size=2')
+        self.assertIsNotNone(response.data['next'])
+        self.assertSameResponse(response.data['next'])
+
+    def test_detail_endpoint_matches(self):
+        for book in self.books:
+            self.assertSameResponse(f'/api/books/{book.id}/')
+        self.assertSameResponse(f'/api/books/{uuid.uuid4()}/')
+
+    def test_serializes_with_one_query(self):
+        with self.assertNumQueries(1):
+            compiled_book_serializer.serialize(compiled_book_serializer.values(Book.objects.all()))
+
+
+class SparseFieldsetTests(TestCase):
+    """?fields= and ?expand= on the book endpoints (BookListSerializer)."""
+
+    FULL_FIELDS = {
+        'id', 'title', 'author', 'description', 'price', 'cover_image', 'cover_srcset', 'category',
+        'stock_quantity', 'isbn', 'publisher', 'is_active', 'is_in_stock', 'created_at', 'updated_at',
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fiction = Category.objects.create(name='Fiction', slug='fiction')
+        cls.books = [
+            Book.objects.create(
+                title=f'Book {i}', author='An Author', description='Long text.', price=Decimal('10.00'),
+                category=cls.fiction, stock_quantity=i,
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        catalog_cache.get_cache().clear()
+
+    def get(self, url, params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.json()
+
+    def results(self, params):
+        return self.get('/api/books/', params)['results']
+
+    def test_default_is_the_full_payload(self):
+        for row in self.results({}):
+            self.assertEqual(set(row), self.FULL_FIELDS)
+            self.assertEqual(row['category']['slug'], 'fiction')
+
+    def test_selects_fields(self):
+        rows = self.results({'fields': 'title, id,title'})
+        self.assertEqual([set(row) for row in rows], [{'id', 'title'}] * 3)
+        row = self.results({'fields': 'category,is_in_stock'})[0]
+        self.assertEqual(row, {'category': str(self.fiction.pk), 'is_in_stock': True})
+        row = self.results({'fields': 'category', 'expand': 'category'})[0]
+        self.assertEqual(row['category']['name'], 'Fiction')
+        # ?expand= alone gives the card defaults.
+        row = self.results({'expand': ''})[0]
+        self.assertEqual(list(row), BookListSerializer.Meta.default_fields)
+
+    def test_loads_only_the_selected_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.results({'fields': 'id,title'})
+        sql = queries.captured_queries[-1]['sql']
+        self.assertIn('"title"', sql)
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn('books_category', sql)
+
+    def test_pages_with_selected_fields(self):
+        response = self.client.get('/api/books/', {'fields': 'id', 'page_size': 2})
+        self.assertEqual(len(response.data['results']), 2)
+        rest = self.client.get(response.data['next']).data
+        self.assertEqual(len(rest['results']), 1)
+        self.assertIsNone(rest['next'])
+
+    def test_unknown_names_are_rejected(self):
+        for params in ({'fields': 'title,nope'}, {'fields': 'category_id'}, {'expand': 'author'}):
+            param = next(iter(params))
+            with self.subTest(params=params):
+                response = self.client.get('/api/books/', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(param, response.data)
+                response = self.client.get(f'/api/books/{self.books[0].pk}/', params)
+                self.assertEqual(response.status_code, 400)
+
+    def test_detail_matches_the_list(self):
+        book = self.books[1]
+        for params in ({'fields': 'id,title,category'}, {'fields': 'id,price', 'expand': 'category'}):
+            with self.subTest(params=params):
+                rows = {row['id']: row for row in self.results(params)}
+                self.assertEqual(self.get(f'/api/books/{book.pk}/', params), rows[str(book.pk)])
+        # Unlike the list, ?expand= alone keeps every detail field.
+        row = self.get(f'/api/books/{book.pk}/', {'expand': 'category'})
+        self.assertEqual(set(row), self.FULL_FIELDS)
+        self.assertEqual(row['category']['slug'], 'fiction')
+
+
+class BookImportExportTests(TestCase):
+    """Bulk upserts by isbn and streaming exports (books.bulk)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fiction = Category.objects.create(name='Fiction', slug='fiction')
+        cls.poetry = Category.objects.create(name='Poetry', slug='poetry')
+        cls.existing = Book.objects.create(
+            title='Old Title', author='Ada Lane', description='Kept.', price=Decimal('5.00'),
+            category=cls.fiction, stock_quantity=1, isbn='9780000000001', cover_image='books/old.jpg',
+        )
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='secret-pass-123', is_staff=True
+        )
+
+    CSV = (
+        'isbn,title,author,price,category,stock_quantity\n'
+        '9780000000001,New Title,Ada Lane,7.50,poetry,0\n'
+        '9780000000002,Fresh,Bo Chen,3,fiction,4\n'
+        ',No Isbn,Bo Chen,3,fiction,4\n'
+        '9780000000003,Bad Price,Bo Chen,abc,fiction,4\n'
+        '9780000000004,Lost,Bo Chen,3,missing,4\n'
+    )
+
+    def test_csv_import_upserts_and_reports_row_errors(self):
+        result = bulk.import_books(io.StringIO(self.CSV), 'csv', batch_size=2)
+
+        self.assertEqual((result.created, result.updated, result.failed), (1, 1, 3))
+        self.assertEqual([error.line for error in result.errors], [4, 5, 6])
+        self.assertIn('isbn', result.errors[0].errors)
+        self.assertIn('price', result.errors[1].errors)
+        self.assertIn('category', result.errors[2].errors)
+
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.title, 'New Title')
+        self.assertEqual(self.existing.category, self.poetry)
+        self.assertEqual(self.existing.price, Decimal('7.50'))
+        # Columns missing from the feed keep their stored values.
+        self.assertEqual(self.existing.description, 'Kept.')
+        self.assertEqual(self.existing.cover_image.name, 'books/old.jpg')
+        self.assertEqual(Book.objects.get(isbn='9780000000002').stock_quantity, 4)
+        # The search index follows upserts.
+        self.assertEqual([book.isbn for book in search_books(Book.objects.all(), 'new title')], ['9780000000001'])
+        self.assertFalse(search_books(Book.objects.all(), 'old').exists())
+
+        counts = {(facet.category.slug, facet.in_stock): facet.count for facet in BookFacet.objects.all()}
+        self.assertEqual(counts, {('poetry', False): 1, ('fiction', True): 1})
+
+    def test_dry_run_writes_nothing(self):
+        result = bulk.import_books(io.StringIO(self.CSV), 'csv', dry_run=True)
+        self.assertEqual((result.created, result.updated, result.failed), (1, 1, 3))
+        self.assertEqual(Book.objects.count(), 1)
+        self.assertEqual(Book.objects.get().title, 'Old Title')
+
+    def test_jsonl_duplicates_and_malformed_lines(self):
+        lines = [
+            '{"isbn": "9780000000009", "title": "First", "author": "A", "price": 1, "category": "fiction"}\n',
+            'not json\n',
+            '\n',
+            '{"isbn": "9780000000009", "title": "Second", "author": "A", "price": 2.5, "category": "fiction"}\n',
+        ]
+        result = bulk.import_books(lines, 'jsonl')
+        self.assertEqual((result.created, result.updated, result.failed), (1, 0, 1))
+        self.assertEqual(result.errors[0].line, 2)
+        book = Book.objects.get(isbn='9780000000009')
+        self.assertEqual((book.title, book.price), ('Second', Decimal('2.50')))
+
+    def test_export_round_trips(self):
+        Book.objects.create(
+            title='Ünïcode, "quoted"', author='Bo Chen', description='Line one\nline two', price=Decimal('3.10'),
+            category=self.poetry, stock_quantity=0, isbn='9780000000005', is_active=False,
+        )
+        for fmt in bulk.FORMATS:
+            with self.subTest(fmt):
+                exported = ''.join(bulk.export_lines(fmt))
+                before = list(bulk.export_rows())
+                result = bulk.import_books(io.StringIO(exported, newline=''), fmt)
+                self.assertEqual((result.created, result.updated, result.failed), (0, 2, 0))
+                self.assertEqual(list(bulk.export_rows()), before)
+
+    def test_commands(self):
+        out = io.StringIO()
+        call_command('export_books', '--format', 'jsonl', stdout=out)
+        self.assertEqual(json.loads(out.getvalue())['isbn'], '9780000000001')
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as feed:
+            feed.write(self.CSV)
+        self.addCleanup(os.unlink, feed.name)
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_books', feed.name, stdout=out, stderr=err)
+        self.assertIn('1 created, 1 updated, 3 failed', out.getvalue())
+        self.assertIn('line 6', err.getvalue())
+
+    def test_api_is_admin_only(self):
+        client = APIClient()
+        self.assertEqual(client.get('/api/books/export/').status_code, 401)
+        upload = SimpleUploadedFile('feed.csv', self.CSV.encode())
+        self.assertEqual(client.post('/api/books/import/', {'file': upload}).status_code, 401)
+
+    def test_api_import_and_export(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        upload = SimpleUploadedFile('feed.csv', self.CSV.encode())
+        response = client.post('/api/books/import/', {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['failed']), (1, 1, 3))
+        self.assertEqual(response.data['errors'][0]['line'], 4)
+
+        response = client.get('/api/books/export/', {'data_format': 'jsonl'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual({row['isbn'] for row in rows}, {'9780000000001', '9780000000002'})
+
+        self.assertEqual(client.get('/api/books/export/', {'data_format': 'xml'}).status_code, 400)
+
+
+class ConditionalGetTests(TestCase):
+    """ETag validation on the catalog endpoints (config.conditional)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fiction = Category.objects.create(name='Fiction', slug='fiction')
+        cls.books = [
+            Book.objects.create(
+                title=f'Book {i}', author='An Author', description='Text', price=Decimal('10.00'),
+                category=cls.fiction, stock_quantity=1,
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        catalog_cache.get_cache().clear()
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+        return response['ETag']
+
+    def test_list_not_modified(self):
+        etag = self.etag('/api/books/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/books/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get('/api/books/', HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+        self.assertNotEqual(self.etag('/api/books/?page_size=1'), etag)
+
+        # Without an ETag to compare, list views always answer in full.
+        response = self.client.get('/api/books/', HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_etag_changes_with_the_catalog(self):
+        etags = [self.etag('/api/books/')]
+        book = self.books[0]
+        book.title = 'Renamed'
+        # The cache is invalidated once the change commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            book.save()
+        etags.append(self.etag('/api/books/'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.books[1].delete()
+        etags.append(self.etag('/api/books/'))
+        self.fiction.name = 'Novels'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fiction.save()
+        etags.append(self.etag('/api/books/'))
+        self.assertEqual(len(set(etags)), 4)
+
+        # A page with the same content keeps its ETag after the cache is dropped.
+        catalog_cache.get_cache().clear()
+        self.assertEqual(self.etag('/api/books/'), etags[-1])
+
+    def test_detail_not_modified(self):
+        url = f'/api/books/{self.books[0].id}/'
+        response = self.client.get(url)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304
+        )
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304
+        )
+        self.fiction.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_category_list_etag_changes_on_delete(self):
+        Category.objects.create(name='Poetry', slug='poetry')
+        etag = self.etag('/api/categories/')
+        self.assertEqual(self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Category.objects.get(slug='poetry').delete()
+        self.assertNotEqual(self.etag('/api/categories/'), etag)
+
+
+class CatalogCacheTests(TestCase):
+    """Read-through caching and generation invalidation (books.cache)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fiction = Category.objects.create(name='Fiction', slug='fiction')
+        cls.books = [
+            Book.objects.create(
+                title=f'Book {i}', author='An Author', description='Text', price=Decimal('10.00'),
+                category=cls.fiction, stock_quantity=5,
+            )
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        catalog_cache.get_cache().clear()
+        catalog_cache.reset_stats()
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def detail(self, book):
+        return self.get(f'/api/books/{book.pk}/')
+
+    def titles(self):
+        return sorted(row['title'] for row in self.get('/api/books/')['results'])
+
+    def test_hit_after_miss(self):
+        first = self.get('/api/books/')
+        detail = self.detail(self.books[0])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get('/api/books/'), first)
+            # Normalized params share the entry.
+            self.assertEqual(self.get('/api/books/?search=+'), first)
+        # Only the Last-Modified lookup (see config.conditional).
+        with self.assertNumQueries(1):
+            self.assertEqual(self.detail(self.books[0]), detail)
+        stats = catalog_cache.stats()
+        self.assertEqual((stats['list']['hits'], stats['list']['misses']), (2, 1))
+        self.assertEqual((stats['detail']['hits'], stats['detail']['misses']), (1, 1))
+        self.assertEqual(stats['hit_rate'], 0.6)
+
+    def test_book_changes_invalidate(self):
+        self.titles(), self.detail(self.books[0]), self.detail(self.books[1])
+        book = self.books[0]
+        book.title = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            book.save()
+        self.assertEqual(self.titles(), ['Book 1', 'Renamed'])
+        self.assertEqual(self.detail(book)['title'], 'Renamed')
+        # Other books' details stay cached.
+        self.detail(self.books[1])
+        self.assertEqual(catalog_cache.stats()['detail']['hits'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.create(
+                title='New', author='An Author', description='Text', price=Decimal('1.00'),
+                category=self.fiction, stock_quantity=1,
+            )
+        self.assertEqual(self.titles(), ['Book 1', 'New', 'Renamed'])
+        with self.captureOnCommitCallbacks(execute=True):
+            book.delete()
+        self.assertEqual(self.titles(), ['Book 1', 'New'])
+        self.assertEqual(self.client.get(f'/api/books/{book.pk}/').status_code, 404)
+
+    def test_category_changes_invalidate(self):
+        self.titles(), self.detail(self.books[0])
+        self.fiction.name = 'Novels'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fiction.save()
+        self.assertEqual(self.detail(self.books[0])['category']['name'], 'Novels')
+        self.assertEqual(self.get('/api/books/')['results'][0]['category']['name'], 'Novels')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fiction.delete()
+        self.assertEqual(self.titles(), [])
+        self.assertEqual(self.client.get(f'/api/books/{self.books[0].pk}/').status_code, 404)
+
+    @override_settings(PAYMENT_WEBHOOK_ASYNC=False)
+    def test_webhook_stock_change_invalidates(self):
+        book = self.books[0]
+        order = Order.objects.create(email='buyer@example.com', total_amount=book.price, stock_reserved=True)
+        OrderItem.objects.create(order=order, book=book, quantity=2, price=book.price, subtotal=book.price * 2)
+        PaymentTransaction.objects.create(order=order, provider='paystack', reference='ref')
+        self.assertEqual(self.detail(book)['stock_quantity'], 5)
+        self.assertEqual(self.get('/api/books/')['results'][-1]['stock_quantity'], 5)
+
+        # A failed payment puts the reserved copies back.
+        with self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().post('/api/payments/webhook/paystack/', {
+                'event_id': 'evt_1', 'reference': 'ref', 'status': 'failed',
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.detail(book)['stock_quantity'], 7)
+        self.assertEqual(self.get('/api/books/')['results'][-1]['stock_quantity'], 7)
@@ -1,8 +1,13 @@
 from django.urls import path
-from .views import BookListView, BookDetailView, CategoryListView
+from .views import (BookListView, BookDetailView, BookFacetView, CategoryListView, CacheStatsView,
+                    BookImportView, BookExportView)
 
 urlpatterns = [
     path('books/', BookListView.as_view(), name='book_list'),
+    path('books/facets/', BookFacetView.as_view(), name='book_facets'),
+    path('books/import/', BookImportView.as_view(), name='book_import'),
+    path('books/export/', BookExportView.as_view(), name='book_export'),
+    path('books/cache-stats/', CacheStatsView.as_view(), name='book_cache_stats'),
     path('books/<uuid:id>/', BookDetailView.as_view(), name='book_detail'),
     path('categories/', CategoryListView.as_view(), name='category_list'),
 ]
@@ -1,69 +1,330 @@
+import io
+from decimal import Decimal, InvalidOperation
+
 from rest_framework import generics, permissions
-from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.conf import settings
+from django.db.models import Count, Max
+from django.shortcuts import get_object_or_404
+from config.conditional import ConditionalGetMixin
+from config.pagination import KeysetPagination
+from config.streaming import streaming_response
+from images.thumbnails import absolute_srcsets
+from . import bulk
+from . import cache as catalog_cache
+from .facets import facet_counts
 from .models import Book, Category
-from .serializers import BookSerializer, CategorySerializer
+from .search import search_books
+from .serializers import BookListSerializer, BookSerializer, CategorySerializer, compiled_book_serializer
+
+def latest(*timestamps):
+    """Return the most recent of the given timestamps, ignoring None."""
+    timestamps = [t for t in timestamps if t is not None]
+    return max(timestamps) if timestamps else None
 
-class CategoryListView(generics.ListCreateAPIView):
+class CategoryListView(ConditionalGetMixin, generics.ListCreateAPIView):
     """
     API view to list all categories and create new ones.
-    List: Public access.
+    List: Public access, with ETag validation.
     Create: Admin only.
     """
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    replica_reads = True
     
     def get_permissions(self):
         if self.request.method == 'POST':
             return [permissions.IsAdminUser()]
         return [permissions.AllowAny()]
 
-class BookListView(generics.ListCreateAPIView):
+    def get_conditional_state(self):
+        # The count catches deletes in the ETag; there is no Last-Modified,
+        # which a delete doesn't move forward.
+        state = Category.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+        return [state['count'], state['updated']], None
+
+class BookFilterMixin:
+    """
+    Parses the catalog filters shared by the book list and its facets:
+    search, category (slug), min_price and max_price.
+    """
+    def get_search(self):
+        return self.request.query_params.get('search', None)
+
+    def get_filter_lookups(self):
+        category = self.request.query_params.get('category', None)
+        min_price = self.parse_price('min_price')
+        max_price = self.parse_price('max_price')
+
+        lookups = {}
+        if category:
+            lookups['category__slug'] = category
+        if min_price is not None:
+            lookups['price__gte'] = min_price
+        if max_price is not None:
+            lookups['price__lte'] = max_price
+        return lookups
+
+    def parse_price(self, param):
+        value = self.request.query_params.get(param, '').strip()
+        if not value:
+            return None
+        try:
+            price = Decimal(value)
+        except InvalidOperation:
+            price = None
+        if price is None or not price.is_finite():
+            raise ValidationError({param: ['A valid number is required.']})
+        return price
+
+class SparseFieldsetViewMixin:
+    """
+    Parses ?fields= and ?expand= (comma-separated names) against
+    BookListSerializer. Without either parameter responses use the full
+    BookSerializer representation.
+    """
+    # Fields used when only ?expand= is given; None for the serializer's
+    # card defaults.
+    default_sparse_fields = None
+
+    def get_sparse_fieldset(self):
+        """Return (fields, expand), or None for the full representation."""
+        if not hasattr(self, '_sparse_fieldset'):
+            self._sparse_fieldset = self.parse_sparse_fieldset()
+        return self._sparse_fieldset
+
+    def parse_sparse_fieldset(self):
+        params = self.request.query_params
+        if 'fields' not in params and 'expand' not in params:
+            return None
+
+        fields = self.parse_names('fields', BookListSerializer.Meta.fields)
+        expand = self.parse_names('expand', BookListSerializer.expandable_fields)
+        if not fields:
+            fields = self.default_sparse_fields or BookListSerializer.Meta.default_fields
+        return frozenset(fields), frozenset(expand)
+
+    def parse_names(self, param, allowed):
+        names = [name.strip() for name in self.request.query_params.get(param, '').split(',') if name.strip()]
+        unknown = [name for name in names if name not in allowed]
+        if unknown:
+            raise ValidationError({param: [f"Unknown field(s): {', '.join(unknown)}"]})
+        return names
+
+class BookListView(BookFilterMixin, SparseFieldsetViewMixin, ConditionalGetMixin, generics.ListCreateAPIView):
     """
     API view to list books with filtering options and create new books.
     List: Public access.
     Create: Admin only.
+    Sparse fieldsets:
+    - fields: Comma-separated fields to return; selects the lightweight
+      BookListSerializer and loads only the matching columns
+    - expand: Nest related objects (category) in that representation
+    Pass either (e.g. ?expand= for the card defaults) to get slim results.
     Filters:
-    - search: Search by title or description
+    - search: Ranked, prefix-matching full-text search over title, author,
+      description, isbn and publisher (see books.search); rate limited
+      per client (see config.throttling)
     - category: Filter by category slug
     - min_price: Filter by minimum price
     - max_price: Filter by maximum price
+    Results are keyset-paginated, newest first, or by relevance when
+    searching (see KeysetPagination). Pages are served from the catalog
+    cache, keyed on the normalized filter params (see books.cache), and
+    carry an ETag validator. Reads may be served by a
+    replica (see config.routers). Full results are built by the compiled
+    BookSerializer unless FAST_SERIALIZATION is off (see
+    config.serialization).
     """
     serializer_class = BookSerializer
+    pagination_class = KeysetPagination
+    replica_reads = True
+    throttle_scope = 'search'
 
     def get_permissions(self):
         if self.request.method == 'POST':
             return [permissions.IsAdminUser()]
         return [permissions.AllowAny()]
 
+    def get_throttles(self):
+        # Plain listings are cheap cache hits; searches are not.
+        if self.request.method == 'GET' and self.get_search():
+            return super().get_throttles()
+        return []
+
     def get_queryset(self):
         queryset = Book.objects.filter(is_active=True)
-        
-        search = self.request.query_params.get('search', None)
-        category = self.request.query_params.get('category', None)
-        min_price = self.request.query_params.get('min_price', None)
-        max_price = self.request.query_params.get('max_price', None)
 
+        search = self.get_search()
         if search:
-            queryset = queryset.filter(
-                Q(title__icontains=search) | Q(description__icontains=search)
+            queryset = search_books(queryset, search)
+
+        sparse = self.get_sparse_fieldset() if self.request.method == 'GET' else None
+        if sparse is None:
+            queryset = queryset.select_related('category')
+        else:
+            fields, expand = sparse
+            # Expanding a field that isn't selected does nothing.
+            if 'category' in expand and 'category' in fields:
+                queryset = queryset.select_related('category')
+            # created_at is read for the pagination cursor.
+            queryset = queryset.only('created_at', *BookListSerializer.only_columns(fields, expand))
+
+        return queryset.filter(**self.get_filter_lookups())
+
+    def get_serializer_class(self):
+        if self.request.method == 'GET' and self.get_sparse_fieldset() is not None:
+            return BookListSerializer
+        return BookSerializer
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        sparse = self.get_sparse_fieldset() if self.request.method == 'GET' else None
+        if sparse is not None:
+            context['fields'], context['expand'] = sparse
+        return context
+
+    def get_cached_list(self):
+        """(version, payload) of the requested page, read through the catalog cache once per request."""
+        if not hasattr(self, '_cached_list'):
+            self._cached_list = catalog_cache.get_or_set_list(
+                self.request, lambda: self.build_list(self.request, *self.args, **self.kwargs)
             )
-        
-        if category:
-            queryset = queryset.filter(category__slug=category)
-        
-        if min_price:
-            queryset = queryset.filter(price__gte=min_price)
-        
-        if max_price:
-            queryset = queryset.filter(price__lte=max_price)
-            
-        return queryset
-
-class BookDetailView(generics.RetrieveAPIView):
+        return self._cached_list
+
+    def list(self, request, *args, **kwargs):
+        _, data = self.get_cached_list()
+        return Response(data)
+
+    def build_list(self, request, *args, **kwargs):
+        if not settings.FAST_SERIALIZATION or self.get_sparse_fieldset() is not None:
+            return super().list(request, *args, **kwargs).data
+        queryset = self.filter_queryset(self.get_queryset())
+        # search_rank is read for the pagination cursor.
+        extra = ('search_rank',) if self.get_search() else ()
+        page = self.paginate_queryset(compiled_book_serializer.values(queryset, *extra))
+        return self.get_paginated_response(compiled_book_serializer.serialize(page, request)).data
+
+    def get_conditional_state(self):
+        # The cached page's digest, not aggregates over the filtered books:
+        # no queries on a cache hit. No Last-Modified either, since deleting
+        # a book doesn't move any remaining timestamp forward.
+        version, _ = self.get_cached_list()
+        return [version], None
+
+    def get_keyset_ordering(self):
+        if self.request.query_params.get('search'):
+            return ('-search_rank', '-id')
+        return ('-created_at', '-id')
+
+class BookFacetView(BookFilterMixin, APIView):
+    """
+    API view returning counts of active books per category, price bucket and
+    in-stock flag, under the same filters as BookListView.
+    Served from the materialized facet table (see books.facets).
+    Public access.
+    """
+    permission_classes = (permissions.AllowAny,)
+    replica_reads = True
+
+    def get(self, request):
+        return Response(facet_counts(self.get_filter_lookups(), self.get_search()))
+
+class BookDetailView(SparseFieldsetViewMixin, ConditionalGetMixin, generics.RetrieveAPIView):
     """
     API view to retrieve details of a specific book.
+    Serialized payloads are served from the catalog cache (see books.cache),
+    with ETag / Last-Modified validators. ?fields= / ?expand= cut the
+    cached payload down as BookListSerializer would render it.
     """
     queryset = Book.objects.filter(is_active=True)
     serializer_class = BookSerializer
     permission_classes = (permissions.AllowAny,)
     lookup_field = 'id'
+    replica_reads = True
+    default_sparse_fields = BookListSerializer.Meta.fields
+
+    def get_conditional_state(self):
+        state = self.get_queryset().filter(id=self.kwargs['id']).values_list(
+            'updated_at', 'category__updated_at'
+        ).first()
+        if state is None:
+            return None
+        return list(state), latest(*state)
+
+    def retrieve(self, request, *args, **kwargs):
+        # Cached without the request so the payload is host-independent;
+        # the cover URL is made absolute for this request afterwards.
+        data = dict(catalog_cache.get_or_set_detail(kwargs['id'], self.build_detail))
+        if data.get('cover_image'):
+            data['cover_image'] = request.build_absolute_uri(data['cover_image'])
+        data['cover_srcset'] = absolute_srcsets(data.get('cover_srcset'), request)
+        sparse = self.get_sparse_fieldset()
+        if sparse is not None:
+            data = BookListSerializer.project(data, *sparse)
+        return Response(data)
+
+    def build_detail(self):
+        if not settings.FAST_SERIALIZATION:
+            return dict(BookSerializer(self.get_object()).data)
+        queryset = compiled_book_serializer.values(self.filter_queryset(self.get_queryset()))
+        row = get_object_or_404(queryset, id=self.kwargs['id'])
+        return compiled_book_serializer.serialize([row])[0]
+
+class CacheStatsView(APIView):
+    """
+    API view exposing catalog cache hit/miss counters for this process.
+    Admin only.
+    """
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        return Response(catalog_cache.stats())
+
+class BookImportView(APIView):
+    """
+    API view to upsert books by isbn from an uploaded CSV or JSONL file
+    (multipart field "file"); see books.bulk for the columns.
+    Admin only.
+    Query params:
+    - data_format: csv or jsonl (default: from the file name, else csv)
+    - dry_run: validate and count without writing
+    Returns created / updated / failed counts and the first row errors.
+    """
+    permission_classes = (permissions.IsAdminUser,)
+    parser_classes = (MultiPartParser,)
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': ['No file was submitted.']})
+        fmt = request.query_params.get('data_format') or bulk.detect_format(upload.name)
+        if fmt not in bulk.FORMATS:
+            raise ValidationError({'data_format': [f"Must be one of: {', '.join(bulk.FORMATS)}."]})
+        dry_run = request.query_params.get('dry_run', '').lower() in ('1', 'true', 'yes')
+
+        # Uploads over FILE_UPLOAD_MAX_MEMORY_SIZE are spooled to disk, and
+        # rows are read from the file one at a time.
+        lines = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        try:
+            result = bulk.import_books(lines, fmt, dry_run=dry_run)
+        except UnicodeDecodeError:
+            raise ValidationError({'file': ['File must be UTF-8 encoded.']})
+        return Response(result.as_dict())
+
+class BookExportView(APIView):
+    """
+    API view streaming every book as CSV or JSONL (?data_format=, default
+    csv), in the format BookImportView reads.
+    Admin only.
+    """
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        fmt = request.query_params.get('data_format', 'csv')
+        if fmt not in bulk.FORMATS:
+            raise ValidationError({'data_format': [f"Must be one of: {', '.join(bulk.FORMATS)}."]})
+        return streaming_response(bulk.export_lines(fmt), fmt, f'books.{fmt}')
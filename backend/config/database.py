@@ -0,0 +1,127 @@
+"""
+DATABASES profiles, built from environment variables (see settings).
+
+DB_ENGINE selects the profile:
+
+- sqlite (default): a single file, tuned for dev and small deploys. WAL
+  journaling lets readers run alongside a writer, synchronous=NORMAL is
+  safe under WAL and skips an fsync per commit, and a busy timeout makes
+  concurrent writers wait instead of failing with "database is locked".
+  Transactions start in IMMEDIATE mode so a transaction that reads and
+  then writes (checkout, webhook processing) takes the write lock up
+  front rather than failing when it tries to upgrade. Tests use a file
+  next to it ("<name>.test") rather than an in-memory database, where a
+  blocked writer fails with "table is locked" instead of waiting.
+
+- postgresql: persistent connections with health checks, or a psycopg 3
+  connection pool when DB_POOL is set (the two are mutually exclusive in
+  Django), plus a server-side statement timeout. DB_REPLICA_HOSTS adds one
+  read-only alias per host ("replica_1", "replica_2", ...) sharing the
+  primary's credentials; config.routers decides what is read from them.
+  DB_SQLITE_REPLICAS does the same for extra SQLite files in development.
+
+In tests, config.testing.TestRunner uses with_test_replica() to add a
+"replica_1" alias mirroring the primary when no replicas are configured,
+so the routing tests always run against a second connection.
+
+The profile functions take the decouple `config` callable so the profiles can be
+exercised without touching the real environment.
+"""
+from decouple import Csv, config as default_config
+from django.core.exceptions import ImproperlyConfigured
+
+REPLICA_PREFIX = 'replica_'
+
+
+def sqlite_database(name, config=default_config):
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': config('DB_BUSY_TIMEOUT', default=20, cast=int),
+            'transaction_mode': config('DB_SQLITE_TRANSACTION_MODE', default='IMMEDIATE'),
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+            ),
+        },
+        'TEST': {'NAME': f'{name}.test'},
+    }
+
+
+def postgres_database(config=default_config):
+    options = {
+        'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
+        'options': '-c statement_timeout=%d' % config('DB_STATEMENT_TIMEOUT_MS', default=30000, cast=int),
+    }
+    conn_max_age = config('DB_CONN_MAX_AGE', default=60, cast=int)
+    if config('DB_POOL', default=False, cast=bool):
+        options['pool'] = {
+            'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+        }
+        # Pooled connections are returned to the pool after each request.
+        conn_max_age = 0
+
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': config('DB_NAME', default='bookshop'),
+        'USER': config('DB_USER', default='postgres'),
+        'PASSWORD': config('DB_PASSWORD', default='postgres'),
+        'HOST': config('DB_HOST', default='localhost'),
+        'PORT': config('DB_PORT', default='5432'),
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': True,
+        # Required behind PgBouncer in transaction pooling mode.
+        'DISABLE_SERVER_SIDE_CURSORS': config('DB_DISABLE_SERVER_SIDE_CURSORS', default=False, cast=bool),
+        'OPTIONS': options,
+    }
+
+
+def replica_databases(primary, hosts):
+    """One alias per "host" or "host:port", mirroring the primary in tests."""
+    replicas = {}
+    for i, host in enumerate(hosts, start=1):
+        host, _, port = host.partition(':')
+        replicas[f'{REPLICA_PREFIX}{i}'] = {
+            **primary,
+            'HOST': host,
+            'PORT': port or primary.get('PORT', ''),
+            'OPTIONS': dict(primary['OPTIONS']),
+            'TEST': {'MIRROR': 'default'},
+        }
+    return replicas
+
+
+def build_databases(sqlite_name, config=default_config):
+    """Return the DATABASES setting for the profile selected by DB_ENGINE."""
+    engine = config('DB_ENGINE', default='sqlite')
+    if engine == 'sqlite':
+        databases = {'default': sqlite_database(sqlite_name, config)}
+        # Extra SQLite files standing in for replicas, to exercise routing
+        # locally; they mirror the primary in tests.
+        for i, name in enumerate(config('DB_SQLITE_REPLICAS', default='', cast=Csv()), start=1):
+            databases[f'{REPLICA_PREFIX}{i}'] = {
+                **sqlite_database(name, config), 'TEST': {'MIRROR': 'default'},
+            }
+        return databases
+    if engine != 'postgresql':
+        raise ImproperlyConfigured(f"Unsupported DB_ENGINE {engine!r}; use 'sqlite' or 'postgresql'")
+
+    primary = postgres_database(config)
+    databases = {'default': primary}
+    databases.update(replica_databases(primary, config('DB_REPLICA_HOSTS', default='', cast=Csv())))
+    return databases
+
+
+def with_test_replica(databases):
+    """Add a replica alias mirroring the primary, unless replicas are configured."""
+    if any(alias.startswith(REPLICA_PREFIX) for alias in databases):
+        return databases
+    return {
+        **databases,
+        f'{REPLICA_PREFIX}1': {**databases['default'], 'TEST': {'MIRROR': 'default'}},
+    }
@@ -0,0 +1,267 @@
+"""
+Opt-in per-request instrumentation.
+
+When INSTRUMENTATION_ENABLED is set, InstrumentationMiddleware records for
+every request, keyed by the resolved URL name (e.g. "book_list"):
+
+- the number of SQL queries and the time spent executing them, across all
+  database aliases (via connection.execute_wrapper),
+- the time spent in the view outside those queries, which for API views
+  is mostly building serializer output,
+- the time spent rendering the response (JSON encoding),
+- the total time spent in the middleware and view stack.
+
+The view and render phases are marked by the middleware's process_view
+and process_template_response hooks, so nothing is patched. A view whose
+response isn't a template response (e.g. streamed exports) counts until
+the response leaves the middleware stack, and has no render time.
+
+The figures are returned in a Server-Timing header, so they show up in the
+browser's network panel, and aggregated into histograms served in the
+Prometheus text format by metrics_view (mounted at /metrics/). Metrics are
+kept per process; scrape every worker or run a single one. The endpoint
+requires INSTRUMENTATION_METRICS_TOKEN as a bearer token, or a staff
+session; with neither it answers 403.
+
+Requests slower than INSTRUMENTATION_SLOW_REQUEST_MS are logged on the
+"config.instrumentation" logger together with their most repeated SQL
+fingerprints, which is usually enough to spot an N+1 query.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+UNRESOLVED_VIEW = '<unresolved>'
+
+
+class RequestStats:
+    """Counters for a single request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.view_time = 0.0
+        self.render_time = 0.0
+        self.fingerprints = Counter()
+        self._view_started = None
+
+    def record_query(self, sql, duration):
+        self.queries += 1
+        self.db_time += duration
+        self.fingerprints[fingerprint(sql)] += 1
+
+    def start_view(self):
+        self._view_started = (time.perf_counter(), self.db_time)
+
+    def end_view(self):
+        """Close the view phase, if open, counting its time outside SQL."""
+        if self._view_started is not None:
+            started, db_time = self._view_started
+            self.view_time += (time.perf_counter() - started) - (self.db_time - db_time)
+            self._view_started = None
+
+    def repeated_queries(self, limit=5):
+        """The most frequent fingerprints that ran more than once."""
+        return [(sql, count) for sql, count in self.fingerprints.most_common(limit) if count > 1]
+
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """
+    Normalize a SQL statement so that queries differing only in their
+    parameters compare equal: literals become ?, IN lists collapse to (...).
+    """
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('(...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+
+class Registry:
+    """Thread-safe histograms per (metric, view)."""
+
+    METRICS = {
+        'bookshop_request_duration_seconds': ('Total time spent handling the request.', DURATION_BUCKETS),
+        'bookshop_request_db_seconds': ('Time spent executing SQL queries.', DURATION_BUCKETS),
+        'bookshop_request_view_seconds': (
+            'Time spent in the view outside SQL queries, mostly building serializer output.', DURATION_BUCKETS
+        ),
+        'bookshop_request_render_seconds': ('Time spent rendering the response.', DURATION_BUCKETS),
+        'bookshop_request_queries': ('Number of SQL queries per request.', QUERY_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {name: {} for name in self.METRICS}
+
+    def observe(self, view, stats, total):
+        values = {
+            'bookshop_request_duration_seconds': total,
+            'bookshop_request_db_seconds': stats.db_time,
+            'bookshop_request_view_seconds': stats.view_time,
+            'bookshop_request_render_seconds': stats.render_time,
+            'bookshop_request_queries': stats.queries,
+        }
+        with self._lock:
+            for name, value in values.items():
+                series = self._histograms[name]
+                if view not in series:
+                    series[view] = Histogram(self.METRICS[name][1])
+                series[view].observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {name: {} for name in self.METRICS}
+
+    def render(self):
+        """Render every histogram in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, (description, _) in self.METRICS.items():
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for view, histogram in sorted(self._histograms[name].items()):
+                    label = _escape_label(view)
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{name}_bucket{{view="{label}",le="{bound}"}} {count}')
+                    lines.append(f'{name}_bucket{{view="{label}",le="+Inf"}} {histogram.total}')
+                    lines.append(f'{name}_sum{{view="{label}"}} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{{view="{label}"}} {histogram.total}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Registry()
+
+
+class InstrumentationMiddleware:
+    """
+    Records queries, DB time, view, render and total time per view.
+    Does nothing unless settings.INSTRUMENTATION_ENABLED is true.
+    """
+    stats_attr = '_instrumentation_stats'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'INSTRUMENTATION_ENABLED', False)
+        self.server_timing = getattr(settings, 'INSTRUMENTATION_SERVER_TIMING', True)
+        self.slow_threshold = getattr(settings, 'INSTRUMENTATION_SLOW_REQUEST_MS', 500) / 1000
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        stats = RequestStats()
+        setattr(request, self.stats_attr, stats)
+
+        def wrapper(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                stats.record_query(sql, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(wrapper))
+            response = self.get_response(request)
+        stats.end_view()
+        total = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or match._func_path) if match else UNRESOLVED_VIEW
+        registry.observe(view, stats, total)
+
+        if self.server_timing:
+            response['Server-Timing'] = server_timing_header(stats, total)
+        if total >= self.slow_threshold:
+            self.log_slow_request(request, response, view, stats, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = getattr(request, self.stats_attr, None)
+        if stats is not None:
+            stats.start_view()
+
+    def process_template_response(self, request, response):
+        stats = getattr(request, self.stats_attr, None)
+        if stats is not None:
+            stats.end_view()
+            started = time.perf_counter()
+
+            def rendered(response):
+                stats.render_time += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def log_slow_request(self, request, response, view, stats, total):
+        repeated = ''.join(
+            f'\n  {count}x {sql}' for sql, count in stats.repeated_queries()
+        )
+        logger.warning(
+            "Slow request %s %s (%s) -> %s: total=%.1fms db=%.1fms queries=%d view=%.1fms render=%.1fms%s",
+            request.method, request.path, view, response.status_code,
+            total * 1000, stats.db_time * 1000, stats.queries, stats.view_time * 1000, stats.render_time * 1000,
+            repeated or '\n  no repeated queries',
+        )
+
+
+def server_timing_header(stats, total):
+    return ', '.join([
+        f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries"',
+        f'view;dur={stats.view_time * 1000:.2f}',
+        f'render;dur={stats.render_time * 1000:.2f}',
+        f'total;dur={total * 1000:.2f}',
+    ])
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Scrapers send INSTRUMENTATION_METRICS_TOKEN
+    as a bearer token; staff can also read it from an admin session.
+    Everyone else, and everyone when no token is set, is refused.
+    """
+    expected = getattr(settings, 'INSTRUMENTATION_METRICS_TOKEN', '')
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    authorized = bool(expected) and constant_time_compare(supplied, expected)
+    if not authorized and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,176 @@
+import datetime
+import json
+from collections import OrderedDict
+
+from django.core import signing
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder truncates datetimes to milliseconds, which would make
+    rows created within the same millisecond skip or repeat across pages.
+    """
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorSerializer:
+    """
+    Signing serializer that accepts datetimes, UUIDs and Decimals; lookups
+    coerce the resulting strings back through the model field.
+    """
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(',', ':'), cls=CursorEncoder).encode('latin-1')
+
+    def loads(self, data):
+        return json.loads(data.decode('latin-1'))
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination ordered by (created_at, id), newest first.
+
+    Views can page on a different key by defining get_keyset_ordering(),
+    which must return a tuple of field names ending in a unique field.
+
+    Each page is fetched with a single indexed range query seeking past the
+    last row of the previous page, so deep pages cost the same as the first
+    one and no COUNT(*) is ever issued.
+
+    Cursors are opaque, signed tokens; a tampered or malformed cursor is
+    rejected with a 404 like DRF's own CursorPagination.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 24
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+    signing_salt = 'config.pagination.KeysetPagination'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(view)
+        position = self.decode_cursor(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_seek_filter(position))
+
+        # Fetch one extra row to find out whether another page follows.
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_ordering(self, view):
+        if view is not None and hasattr(view, 'get_keyset_ordering'):
+            return tuple(view.get_keyset_ordering())
+        return self.ordering
+
+    def get_seek_filter(self, position):
+        """
+        Build the row-value comparison "(a, b, ...) after (va, vb, ...)" as
+        a chain of OR'd prefixes, honouring each field's direction.
+        """
+        seek = Q()
+        equal = {}
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            seek |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return seek
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = signing.loads(
+                encoded, salt=self.get_signing_salt(), serializer=CursorSerializer
+            )
+        except (signing.BadSignature, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def get_signing_salt(self):
+        # Bind cursors to the ordering they were minted under, so a cursor
+        # from a different listing (e.g. before a search was applied) is
+        # rejected instead of being compared against the wrong columns.
+        return '%s:%s' % (self.signing_salt, ','.join(self.ordering))
+
+    def encode_cursor(self, instance):
+        # Pages of .values() rows (see config.serialization) hold dicts.
+        if isinstance(instance, dict):
+            position = [instance[field.lstrip('-')] for field in self.ordering]
+        else:
+            position = [getattr(instance, field.lstrip('-')) for field in self.ordering]
+        return signing.dumps(
+            position, salt=self.get_signing_salt(), serializer=CursorSerializer, compress=True
+        )
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+        return url
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                },
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+        ]
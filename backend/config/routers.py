@@ -0,0 +1,194 @@
+"""
+Read-replica routing.
+
+ReplicaRouter sends reads of catalog and order-history models (the books
+and orders apps) to a replica alias ("replica_1", ... see config.database)
+only while ReplicaRoutingMiddleware has marked the current request as
+replica-safe: a GET/HEAD/OPTIONS request handled by a view that sets
+`replica_reads = True`. Everything else - writes, other views, management
+commands, the webhook worker - uses the primary.
+
+Read-your-writes:
+- Once a request writes, the rest of that request reads from the primary,
+  as do reads inside an open transaction on the primary.
+- After an authenticated user writes, their requests read from the
+  primary for REPLICA_PIN_SECONDS, so a new order shows up in their order
+  list straight away. Pins are stored in the default cache, so they are
+  shared between workers only when the cache is (REDIS_URL).
+- Views that must see writes from other requests (PaymentConfirmView)
+  simply don't opt in.
+
+Lag: each replica's replication delay is measured at most every
+REPLICA_LAG_CHECK_INTERVAL seconds per process. Replicas further behind
+than REPLICA_MAX_LAG_SECONDS, or that fail the check, are skipped; with no
+usable replica, reads fall back to the primary. Catalog pages cached from
+a replica can be at most that far behind when they are stored.
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+
+from config.database import REPLICA_PREFIX
+
+PRIMARY = 'default'
+REPLICA_APPS = frozenset({'books', 'orders'})
+SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+PIN_KEY = 'db:pin:user:{}'
+
+# Zero when the replica has replayed everything it received, otherwise the
+# age of the last replayed transaction.
+POSTGRES_LAG_SQL = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class RoutingState:
+    """Routing decisions for the current request."""
+
+    def __init__(self, request=None, replica_reads=False):
+        self.request = request
+        self.replica_reads = replica_reads
+        self.replica = None
+        self.wrote = False
+        self.user_pinned = None
+
+
+_state = ContextVar('replica_routing_state', default=None)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith(REPLICA_PREFIX)]
+
+
+def replica_lag(alias):
+    """Seconds the replica is behind the primary (0 for non-PostgreSQL)."""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(POSTGRES_LAG_SQL)
+        return float(cursor.fetchone()[0] or 0)
+
+
+class LagMonitor:
+    """Caches each replica's lag so it is measured once per check interval."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lag = {}
+
+    def is_usable(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            checked_at, lag = self._lag.get(alias, (None, None))
+        if checked_at is None or now - checked_at >= settings.REPLICA_LAG_CHECK_INTERVAL:
+            try:
+                lag = replica_lag(alias)
+            except DatabaseError:
+                lag = None
+            with self._lock:
+                self._lag[alias] = (now, lag)
+        return lag is not None and lag <= settings.REPLICA_MAX_LAG_SECONDS
+
+    def reset(self):
+        with self._lock:
+            self._lag.clear()
+
+
+lag_monitor = LagMonitor()
+
+
+def choose_replica():
+    """A random usable replica, or None."""
+    usable = [alias for alias in replica_aliases() if lag_monitor.is_usable(alias)]
+    return random.choice(usable) if usable else None
+
+
+@contextmanager
+def replica_reads(request=None):
+    """Allow reads inside the block to go to a replica (e.g. for exports)."""
+    token = _state.set(RoutingState(request, replica_reads=True))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+def _is_user_pinned(state):
+    if state.user_pinned is None:
+        # DRF copies the authenticated user onto the Django request.
+        user = getattr(state.request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return False
+        state.user_pinned = bool(cache.get(PIN_KEY.format(user.pk)))
+    return state.user_pinned
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (
+            state is None
+            or not state.replica_reads
+            or state.wrote
+            or model._meta.app_label not in REPLICA_APPS
+            or connections[PRIMARY].in_atomic_block
+            or _is_user_pinned(state)
+        ):
+            return PRIMARY
+        if state.replica is None:
+            # Stick to one replica for the whole request.
+            state.replica = choose_replica() or PRIMARY
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication.
+        return not db.startswith(REPLICA_PREFIX)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Tracks routing state per request: enables replica reads for safe
+    requests to opted-in views and pins users to the primary after writes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState(request)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        user = getattr(request, 'user', None)
+        if state.wrote and user is not None and user.is_authenticated:
+            cache.set(PIN_KEY.format(user.pk), True, timeout=settings.REPLICA_PIN_SECONDS)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _state.get()
+        view_class = getattr(view_func, 'view_class', None)
+        if state is not None and request.method in SAFE_METHODS and getattr(view_class, 'replica_reads', False):
+            state.replica_reads = True
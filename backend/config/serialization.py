@@ -0,0 +1,279 @@
+"""
+Compiled, read-only serialization for hot list and detail endpoints.
+
+A DRF ModelSerializer resolves every field of every row through
+get_attribute() and to_representation(), on model instances it first has
+to build. CompiledSerializer walks a serializer's fields once instead and
+turns them into a plan:
+
+- the .values() columns to select (nested serializers become joined
+  "category__name"-style columns; many=True relations become one extra
+  query per relation for the whole page, like prefetch_related), and
+- one precomputed converter per field, reproducing that field's
+  to_representation() for Decimal, UUID, datetime, choice, file/image
+  URL, boolean, integer and string values.
+
+serialize() then maps plain value rows straight to dicts of JSON-native
+values, so rendering never falls back to the JSON encoder's default()
+hook. The output renders to exactly the same JSON as the DRF serializer
+it was compiled from; the contract tests in each app hold it to that.
+
+Fields with no column to read from (ReadOnlyField on a model property)
+are computed from `properties`: {model: {name: (columns, function)}}.
+Field types the compiler doesn't know raise ImproperlyConfigured when
+the plan is built.
+"""
+import datetime
+import decimal
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import ManyToOneRel
+from django.utils import timezone
+from rest_framework import fields as drf_fields
+from rest_framework import relations, serializers
+from rest_framework.settings import api_settings
+
+
+class Context:
+    """Per-call state shared by the converters."""
+
+    def __init__(self, request=None):
+        self.request = request
+        self.timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+        self.related = {}
+
+
+def _as_str(value, context):
+    return str(value)
+
+
+def _as_bool(value, context):
+    return bool(value)
+
+
+def _as_int(value, context):
+    return int(value)
+
+
+def _as_pk(value, context):
+    return str(value) if isinstance(value, uuid.UUID) else value
+
+
+def _decimal_converter(field):
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.normalize_output or field.decimal_places is None:
+        raise ImproperlyConfigured(f'Unsupported DecimalField options on {field.field_name!r}')
+
+    quantize_context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        quantize_context.prec = field.max_digits
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    rounding = field.rounding
+
+    def convert(value, context):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return f'{value.quantize(exponent, rounding=rounding, context=quantize_context):f}'
+    return convert
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != drf_fields.ISO_8601 or hasattr(field, 'timezone'):
+        raise ImproperlyConfigured(f'Unsupported DateTimeField options on {field.field_name!r}')
+
+    def convert(value, context):
+        if not value:
+            return None
+        # DateTimeField.enforce_timezone()
+        if context.timezone is not None:
+            if timezone.is_aware(value):
+                value = value.astimezone(context.timezone)
+            else:
+                value = timezone.make_aware(value, context.timezone)
+        elif timezone.is_aware(value):
+            value = timezone.make_naive(value, datetime.timezone.utc)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def _file_converter(field, model_field):
+    if not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+        return _as_str
+    storage = model_field.storage
+
+    def convert(value, context):
+        if not value:
+            return None
+        url = storage.url(value)
+        if context.request is not None:
+            return context.request.build_absolute_uri(url)
+        return url
+    return convert
+
+
+def _choice_converter(field):
+    choices = field.choice_strings_to_values
+
+    def convert(value, context):
+        if value == '':
+            return value
+        return choices.get(str(value), value)
+    return convert
+
+
+def _field_converter(field, model_field):
+    # Custom fields can provide their own converter.
+    if hasattr(field, 'compiled_converter'):
+        return field.compiled_converter(model_field)
+    if isinstance(field, drf_fields.UUIDField):
+        if field.uuid_format != 'hex_verbose':
+            raise ImproperlyConfigured(f'Unsupported UUID format on {field.field_name!r}')
+        return _as_str
+    if isinstance(field, drf_fields.DecimalField):
+        return _decimal_converter(field)
+    if isinstance(field, drf_fields.DateTimeField):
+        return _datetime_converter(field)
+    if isinstance(field, drf_fields.FileField):
+        return _file_converter(field, model_field)
+    if isinstance(field, drf_fields.ChoiceField):
+        return _choice_converter(field)
+    if isinstance(field, drf_fields.BooleanField):
+        return _as_bool
+    if isinstance(field, drf_fields.IntegerField):
+        return _as_int
+    if isinstance(field, drf_fields.CharField):
+        return _as_str
+    if isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is None:
+        return _as_pk
+    raise ImproperlyConfigured(
+        f'Cannot compile {type(field).__name__} {field.field_name!r}; serialize it with DRF instead'
+    )
+
+
+class Plan:
+    """The compiled form of one serializer, reading columns under `prefix`."""
+
+    def __init__(self, serializer, prefix='', properties=None):
+        properties = properties or {}
+        model = serializer.Meta.model
+        self.prefix = prefix
+        self.pk_column = prefix + model._meta.pk.attname
+        self.columns = [self.pk_column]
+        self.getters = []
+        self.relations = []
+
+        for field in serializer._readable_fields:
+            name, source = field.field_name, field.source
+            if '.' in source or source == '*':
+                raise ImproperlyConfigured(f'Cannot compile dotted source {source!r} of {name!r}')
+
+            if isinstance(field, serializers.ListSerializer):
+                self.getters.append((name, self._many_getter(model, field, source, properties)))
+            elif isinstance(field, serializers.Serializer):
+                nested = Plan(field, f'{prefix}{source}__', properties)
+                self.columns.extend(nested.columns)
+                self.relations.extend(nested.relations)
+                self.getters.append((name, nested.nested_getter()))
+            elif source in properties.get(model, {}):
+                columns, function = properties[model][source]
+                columns = [prefix + column for column in columns]
+                self.columns.extend(columns)
+                self.getters.append((name, self._property_getter(columns, function)))
+            else:
+                model_field = model._meta.get_field(source)
+                column = prefix + source
+                self.columns.append(column)
+                self.getters.append((name, self._value_getter(column, _field_converter(field, model_field))))
+
+        self.columns = list(dict.fromkeys(self.columns))
+
+    @staticmethod
+    def _value_getter(column, convert):
+        def get(row, context):
+            value = row[column]
+            return None if value is None else convert(value, context)
+        return get
+
+    @staticmethod
+    def _property_getter(columns, function):
+        def get(row, context):
+            return function(*(row[column] for column in columns))
+        return get
+
+    def _many_getter(self, model, field, source, properties):
+        relation = model._meta.get_field(source)
+        if not isinstance(relation, ManyToOneRel) or self.prefix:
+            raise ImproperlyConfigured(f'Only top-level reverse foreign keys can be compiled, not {source!r}')
+        child = Plan(field.child, '', properties)
+        fk = relation.field
+        parent_column = self.prefix + fk.target_field.attname
+        self.columns.append(parent_column)
+        self.relations.append((source, child, relation.related_model, fk.name, fk.attname, parent_column))
+
+        def get(row, context):
+            return context.related[source].get(row[parent_column], [])
+        return get
+
+    def nested_getter(self):
+        getters, pk_column = self.getters, self.pk_column
+
+        def get(row, context):
+            if row[pk_column] is None:
+                return None
+            return {name: getter(row, context) for name, getter in getters}
+        return get
+
+    def fetch_related(self, rows, context):
+        """One query per many=True relation for all the rows."""
+        for source, child, related_model, fk_name, fk_column, parent_column in self.relations:
+            keys = {row[parent_column] for row in rows}
+            groups = {key: [] for key in keys}
+            if keys:
+                child_rows = list(
+                    related_model._default_manager.filter(**{f'{fk_name}__in': keys})
+                    .values(*child.columns, fk_column)
+                )
+                for child_row, data in zip(child_rows, child.build(child_rows, context)):
+                    groups[child_row[fk_column]].append(data)
+            context.related[source] = groups
+
+    def build(self, rows, context):
+        self.fetch_related(rows, context)
+        getters = self.getters
+        return [{name: getter(row, context) for name, getter in getters} for row in rows]
+
+
+class CompiledSerializer:
+    """
+    A read-only, .values()-based equivalent of a ModelSerializer class.
+    The plan is compiled on first use.
+    """
+
+    def __init__(self, serializer_class, properties=None):
+        self.serializer_class = serializer_class
+        self.properties = properties or {}
+        self._plan = None
+        self._lock = threading.Lock()
+
+    @property
+    def plan(self):
+        if self._plan is None:
+            with self._lock:
+                if self._plan is None:
+                    self._plan = Plan(self.serializer_class(), properties=self.properties)
+        return self._plan
+
+    def values(self, queryset, *extra):
+        """The queryset's rows as dicts holding every column the plan reads."""
+        return queryset.values(*self.plan.columns, *extra)
+
+    def serialize(self, rows, request=None):
+        """Serialize value rows; like DRF, absolute URLs need the request."""
+        return self.plan.build(list(rows), Context(request))
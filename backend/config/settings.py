@@ -22,7 +22,10 @@ from pathlib import Path
 import os
 from datetime import timedelta
 
-from decouple import config
+from decouple import Csv, config
+from django.core.exceptions import ImproperlyConfigured
+
+from config.database import build_databases
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -53,6 +56,7 @@ INSTALLED_APPS = [
     # Third-party apps
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
 
     # Local apps
@@ -60,8 +64,15 @@ INSTALLED_APPS = [
     'books',
     'orders',
     'payments',
+    'images',
 ]
 
+# The load-testing harness (`manage.py benchmark`, `seed_catalog`) seeds and
+# wipes databases, so it is only installed where asked for.
+BENCHMARKS_ENABLED = config('BENCHMARKS_ENABLED', default=False, cast=bool)
+if BENCHMARKS_ENABLED:
+    INSTALLED_APPS.append('benchmarks')
+
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -69,10 +80,23 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'config.routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Per-request query/timing instrumentation (see config.instrumentation).
+# Adds Server-Timing headers, serves Prometheus metrics at /metrics/ and
+# logs requests slower than INSTRUMENTATION_SLOW_REQUEST_MS.
+INSTRUMENTATION_ENABLED = config('INSTRUMENTATION_ENABLED', default=False, cast=bool)
+INSTRUMENTATION_SERVER_TIMING = config('INSTRUMENTATION_SERVER_TIMING', default=True, cast=bool)
+INSTRUMENTATION_SLOW_REQUEST_MS = config('INSTRUMENTATION_SLOW_REQUEST_MS', default=500, cast=int)
+INSTRUMENTATION_METRICS_TOKEN = config('INSTRUMENTATION_METRICS_TOKEN', default='')
+
+if INSTRUMENTATION_ENABLED:
+    # Outermost, so the total includes every other middleware.
+    MIDDLEWARE.insert(0, 'config.instrumentation.InstrumentationMiddleware')
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -96,24 +120,51 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=sqlite (default) or postgresql; see config.database for the
+# tuning each profile applies and the DB_* variables it reads.
+DATABASES = build_databases(BASE_DIR / 'db.sqlite3')
+
+TEST_RUNNER = 'config.testing.TestRunner'
+
+# Catalog and order-history reads go to replicas when any are configured;
+# see config.routers.
+DATABASE_ROUTERS = ['config.routers.ReplicaRouter']
+REPLICA_MAX_LAG_SECONDS = config('REPLICA_MAX_LAG_SECONDS', default=2.0, cast=float)
+REPLICA_LAG_CHECK_INTERVAL = config('REPLICA_LAG_CHECK_INTERVAL', default=5.0, cast=float)
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=10, cast=int)
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Local-memory LRU by default; set REDIS_URL to share the cache between workers.
+
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'bookshop',
+            'OPTIONS': {
+                'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=10000, cast=int),
+            },
+        }
     }
-}
 
-# Postgres Configuration (Use environment variables to enable)
-# DATABASES = {
-#     'default': {
-#         'ENGINE': 'django.db.backends.postgresql',
-#         'NAME': os.environ.get('DB_NAME', 'bookshop'),
-#         'USER': os.environ.get('DB_USER', 'postgres'),
-#         'PASSWORD': os.environ.get('DB_PASSWORD', 'postgres'),
-#         'HOST': os.environ.get('DB_HOST', 'localhost'),
-#         'PORT': os.environ.get('DB_PORT', '5432'),
-#     }
-# }
+# Cache alias and TTL (seconds) for serialized book payloads (see books.cache)
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = config('CATALOG_CACHE_TIMEOUT', default=300, cast=int)
+
+# Serve book and order reads through the compiled .values() serializers
+# (see config.serialization) instead of DRF's ModelSerializer.
+FAST_SERIALIZATION = config('FAST_SERIALIZATION', default=True, cast=bool)
 
 
 # Password validation
@@ -134,6 +185,37 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing (see accounts.hashers). PASSWORD_HASHER picks the
+# algorithm for new hashes: scrypt, argon2 (needs argon2-cffi) or pbkdf2.
+# Hashes made with the others still verify and are upgraded after login.
+PASSWORD_HASHER = config('PASSWORD_HASHER', default='scrypt')
+_PASSWORD_HASHERS = {
+    'scrypt': 'accounts.hashers.ScryptPasswordHasher',
+    'argon2': 'accounts.hashers.Argon2PasswordHasher',
+    'pbkdf2': 'accounts.hashers.PBKDF2PasswordHasher',
+}
+if PASSWORD_HASHER not in _PASSWORD_HASHERS:
+    raise ImproperlyConfigured(f"PASSWORD_HASHER must be one of {', '.join(_PASSWORD_HASHERS)}")
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    path for name, path in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+] + [
+    # Django's other defaults, so any existing hash still verifies.
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+PASSWORD_SCRYPT_WORK_FACTOR = config('PASSWORD_SCRYPT_WORK_FACTOR', default=2 ** 15, cast=int)
+PASSWORD_SCRYPT_BLOCK_SIZE = config('PASSWORD_SCRYPT_BLOCK_SIZE', default=8, cast=int)
+PASSWORD_SCRYPT_PARALLELISM = config('PASSWORD_SCRYPT_PARALLELISM', default=1, cast=int)
+PASSWORD_ARGON2_TIME_COST = config('PASSWORD_ARGON2_TIME_COST', default=2, cast=int)
+PASSWORD_ARGON2_MEMORY_COST = config('PASSWORD_ARGON2_MEMORY_COST', default=19456, cast=int)  # KiB
+PASSWORD_ARGON2_PARALLELISM = config('PASSWORD_ARGON2_PARALLELISM', default=1, cast=int)
+PASSWORD_PBKDF2_ITERATIONS = config('PASSWORD_PBKDF2_ITERATIONS', default=0, cast=int)  # 0: Django's default
+
+# Threads hashing passwords at once, and requests allowed to wait for one
+# before logins are refused with 503.
+PASSWORD_HASHING_WORKERS = config('PASSWORD_HASHING_WORKERS', default=max(1, (os.cpu_count() or 2) // 2), cast=int)
+PASSWORD_HASHING_QUEUE = config('PASSWORD_HASHING_QUEUE', default=32, cast=int)
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/6.0/topics/i18n/
@@ -156,6 +238,19 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Stream uploads to a temporary file instead of buffering them in memory;
+# FileSystemStorage then moves the file into MEDIA_ROOT.
+FILE_UPLOAD_HANDLERS = ['django.core.files.uploadhandler.TemporaryFileUploadHandler']
+FILE_UPLOAD_TEMP_DIR = config('FILE_UPLOAD_TEMP_DIR', default=None)
+
+# Thumbnails generated by `manage.py process_images` (see images.thumbnails).
+THUMBNAIL_WIDTHS = config('THUMBNAIL_WIDTHS', default='160,320,640', cast=Csv(int))
+THUMBNAIL_FORMATS = ('webp', 'jpeg')
+THUMBNAIL_QUALITY = config('THUMBNAIL_QUALITY', default=80, cast=int)
+# Done thumbnail jobs older than this are deleted by `manage.py
+# prune_image_jobs`.
+IMAGE_JOB_RETENTION_DAYS = config('IMAGE_JOB_RETENTION_DAYS', default=7, cast=int)
+
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.User'
 
@@ -167,17 +262,62 @@ CORS_ALLOWED_ORIGINS = [
 # REST Framework Settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.StatelessJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # Only views with a throttle_scope are limited (see config.throttling).
+    'DEFAULT_THROTTLE_CLASSES': (
+        'config.throttling.RateLimitThrottle',
+    ),
+    # Per view scope, overridden for signed-in users by '<scope>.user' and
+    # for RATE_LIMIT_API_KEYS clients by '<scope>.api_key'.
+    'DEFAULT_THROTTLE_RATES': {
+        'checkout': config('RATE_LIMIT_CHECKOUT', default='20/min'),
+        'checkout.user': config('RATE_LIMIT_CHECKOUT_USER', default='60/min'),
+        'payment_webhook': config('RATE_LIMIT_PAYMENT_WEBHOOK', default='600/min'),
+        'register': config('RATE_LIMIT_REGISTER', default='10/hour'),
+        'search': config('RATE_LIMIT_SEARCH', default='120/min'),
+        'search.user': config('RATE_LIMIT_SEARCH_USER', default='300/min'),
+    },
 }
 
+# Rate limit state: 'memory' (per process) or 'cache' (RATE_LIMIT_CACHE_ALIAS,
+# shared between processes with Redis). Defaults to the cache when Redis is set.
+RATE_LIMIT_ENABLED = config('RATE_LIMIT_ENABLED', default=True, cast=bool)
+RATE_LIMIT_STORE = config('RATE_LIMIT_STORE', default='cache' if REDIS_URL else 'memory')
+RATE_LIMIT_CACHE_ALIAS = 'default'
+# Keys (sent as X-API-Key) of trusted clients, limited by '<scope>.api_key'.
+RATE_LIMIT_API_KEYS = config('RATE_LIMIT_API_KEYS', default='', cast=Csv())
+
+# Pending orders older than this are marked expired, and settled orders
+# older than ORDER_ARCHIVE_AFTER_DAYS are moved to the archive table, by
+# `manage.py expire_orders` / `archive_orders` (see orders.retention).
+ORDER_PENDING_TTL_HOURS = config('ORDER_PENDING_TTL_HOURS', default=24, cast=int)
+ORDER_ARCHIVE_AFTER_DAYS = config('ORDER_ARCHIVE_AFTER_DAYS', default=365, cast=int)
+
+# Payment webhooks are queued and applied by `manage.py process_webhooks`.
+# Disable to apply them synchronously inside the request instead.
+PAYMENT_WEBHOOK_ASYNC = config('PAYMENT_WEBHOOK_ASYNC', default=True, cast=bool)
+# Processed webhook events older than this are deleted by `manage.py
+# prune_webhooks`. They deduplicate redeliveries, so keep them for longer
+# than providers keep retrying.
+PAYMENT_WEBHOOK_RETENTION_DAYS = config('PAYMENT_WEBHOOK_RETENTION_DAYS', default=30, cast=int)
+
 # SimpleJWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    'TOKEN_OBTAIN_SERIALIZER': 'accounts.serializers.TokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.TokenRefreshSerializer',
 }
+
+# Seconds a decoded access token is reused across requests, between
+# syncs of the revoked-token filter with the blacklist, and between full
+# rebuilds of it (see accounts.authentication, accounts.revocation).
+AUTH_TOKEN_CACHE_SECONDS = config('AUTH_TOKEN_CACHE_SECONDS', default=30, cast=int)
+TOKEN_REVOCATION_CACHE_SECONDS = config('TOKEN_REVOCATION_CACHE_SECONDS', default=10, cast=int)
+TOKEN_REVOCATION_REBUILD_SECONDS = config('TOKEN_REVOCATION_REBUILD_SECONDS', default=3600, cast=int)
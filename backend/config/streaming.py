@@ -0,0 +1,40 @@
+"""
+Line-at-a-time CSV and JSONL encoders for streamed exports (catalog and
+order exports). Both take an iterable of dicts and yield text lines, so a
+StreamingHttpResponse or a management command can write them as they are
+produced.
+"""
+import csv
+import json
+
+from django.http import StreamingHttpResponse
+
+FORMATS = ('csv', 'jsonl')
+CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'jsonl': 'application/x-ndjson; charset=utf-8'}
+
+
+class _Echo:
+    """File-like object whose write() returns the line, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, columns):
+    """A header line, then one line per row; None becomes an empty cell."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(['' if row[name] is None else row[name] for name in columns])
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def streaming_response(lines, fmt, filename):
+    """Stream `lines` as a `filename` attachment of the given format."""
+    response = StreamingHttpResponse(lines, content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
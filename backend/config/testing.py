@@ -0,0 +1,38 @@
+"""
+Test runner (TEST_RUNNER).
+
+SQLite tests run against a file rather than Django's shared in-memory
+database (see config.database), so connections on other threads wait
+for each other's locks as they would in production.
+
+When no replicas are configured, the runner adds a "replica_1" alias
+mirroring the primary (see config.database.with_test_replica), so the
+routing tests always run against a second connection.
+"""
+import gc
+
+from django.conf import settings
+from django.db import connections
+from django.test.runner import DiscoverRunner
+
+from config.database import with_test_replica
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        # Before the suite is built: test classes list the replica aliases
+        # they use when they are defined. connections reads the same dict,
+        # so the alias is added in place and given the usual defaults.
+        databases = with_test_replica(settings.DATABASES)
+        for alias in databases.keys() - settings.DATABASES.keys():
+            settings.DATABASES[alias] = databases[alias]
+        connections.configure_settings(settings.DATABASES)
+
+    def teardown_databases(self, old_config, **kwargs):
+        # Connections left by finished worker threads are only closed when
+        # the garbage collector frees them (a DatabaseWrapper is a reference
+        # cycle). Close them before the test database file is removed, or
+        # its -wal and -shm files are left behind.
+        gc.collect()
+        super().teardown_databases(old_config, **kwargs)
@@ -0,0 +1,160 @@
+"""
+Per-client rate limiting for the public endpoints.
+
+RateLimitThrottle is a default throttle class, but it only limits views
+that set a `throttle_scope`. The scope's rate comes from
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] in DRF's "N/period" form, e.g.
+'20/min'. '<scope>.user' and '<scope>.api_key' entries override it for
+those kinds of clients.
+
+Clients are identified by, in order:
+
+- an API key from RATE_LIMIT_API_KEYS, sent as X-API-Key (unknown keys
+  are ignored, so rotating keys doesn't buy a fresh limit);
+- the authenticated user id, read from the token claims without a query;
+- the client IP (DRF's get_ident(), which honours NUM_PROXIES).
+
+Each limit is a token bucket of N tokens that refills at N per period.
+Bursts of up to N requests pass, and the sustained rate is N per period.
+Over the limit, DRF answers 429 and sets Retry-After to the time until
+the next token.
+
+Bucket state lives in the store named by RATE_LIMIT_STORE:
+
+- 'memory': a dict in this process, with no I/O. Limits apply per
+  process.
+- 'cache': the RATE_LIMIT_CACHE_ALIAS cache, shared between processes
+  when it is Redis. Django's cache has no compare-and-set, so this store
+  keeps a sliding-window counter instead of a bucket: the current fixed
+  window's count plus the previous window's count, weighted by how much
+  of the previous window still overlaps. The count is updated with the
+  atomic incr(). Requests that are refused still count.
+"""
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
+from rest_framework.throttling import ScopedRateThrottle
+
+MEMORY_STORE_SIZE = 100000
+API_KEY_HEADER = 'HTTP_X_API_KEY'
+
+
+class MemoryStore:
+    """Token buckets in a per-process LRU of key -> (tokens, updated)."""
+
+    def __init__(self, size=MEMORY_STORE_SIZE):
+        self.size = size
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def acquire(self, key, limit, period, now):
+        """Take a token; returns 0 if one was available, else seconds to wait."""
+        rate = limit / period
+        with self.lock:
+            tokens, updated = self.buckets.get(key, (limit, now))
+            tokens = min(limit, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                tokens, wait = tokens - 1, 0.0
+            else:
+                wait = (1 - tokens) / rate
+            self.buckets[key] = (tokens, now)
+            self.buckets.move_to_end(key)
+            # An evicted client starts over with a full bucket.
+            while len(self.buckets) > self.size:
+                self.buckets.popitem(last=False)
+        return wait
+
+
+class CacheStore:
+    """Sliding-window counters in a Django cache."""
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def acquire(self, key, limit, period, now):
+        cache = caches[self.alias]
+        window, elapsed = divmod(now, period)
+        current = f'ratelimit:{key}:{int(window)}'
+        try:
+            count = cache.incr(current)
+        except ValueError:
+            # First hit in this window; add() keeps a concurrent first hit.
+            cache.add(current, 0, timeout=math.ceil(2 * period))
+            count = cache.incr(current)
+        previous = cache.get(f'ratelimit:{key}:{int(window) - 1}', 0)
+        overlap = 1 - elapsed / period
+        if previous * overlap + count <= limit:
+            return 0.0
+        if count > limit:
+            # Even without the previous window, wait for the next one.
+            return period - elapsed
+        # Wait until enough of the previous window has slid out.
+        return (overlap - (limit - count) / previous) * period
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if settings.RATE_LIMIT_STORE == 'memory':
+                    _store = MemoryStore()
+                elif settings.RATE_LIMIT_STORE == 'cache':
+                    _store = CacheStore(settings.RATE_LIMIT_CACHE_ALIAS)
+                else:
+                    raise ImproperlyConfigured("RATE_LIMIT_STORE must be 'memory' or 'cache'")
+    return _store
+
+
+def clear():
+    """
+    Drop the store; the next request builds it again from settings. This
+    forgets usage kept in memory (cached counters expire on their own).
+    """
+    global _store
+    _store = None
+
+
+class RateLimitThrottle(ScopedRateThrottle):
+    """Token-bucket limits for views with a throttle_scope (see module docstring)."""
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_client(self, request):
+        """(kind, ident) of the client: ('api_key', digest), ('user', pk) or ('ip', address)."""
+        # META rather than request.headers, which parses every header.
+        api_key = request.META.get(API_KEY_HEADER)
+        if api_key and api_key in settings.RATE_LIMIT_API_KEYS:
+            # Keys stay out of the store's (possibly shared) keys.
+            return 'api_key', hashlib.sha256(api_key.encode()).hexdigest()[:16]
+        if request.user and request.user.is_authenticated:
+            return 'user', request.user.pk
+        return 'ip', self.get_ident(request)
+
+    def allow_request(self, request, view):
+        scope = getattr(view, self.scope_attr, None)
+        if not scope or not settings.RATE_LIMIT_ENABLED:
+            return True
+        kind, ident = self.get_client(request)
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        rate = rates.get(f'{scope}.{kind}', rates.get(scope))
+        if rate is None:
+            return True
+        limit, period = self.parse_rate(rate)
+        self.wait_seconds = get_store().acquire(f'{scope}:{kind}:{ident}', limit, period, time.time())
+        return self.wait_seconds == 0
+
+    def wait(self):
+        return self.wait_seconds
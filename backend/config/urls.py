@@ -3,6 +3,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from config.instrumentation import metrics_view
+
 """
 URL configuration for config project.
 
@@ -13,6 +15,7 @@ Routes:
 - /admin/: Django Admin interface
 - /api/auth/: Authentication endpoints (Register, Login, etc.)
 - /api/: Application endpoints (Books, Orders, Payments)
+- /metrics/: Prometheus metrics, when INSTRUMENTATION_ENABLED is set
 """
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -22,5 +25,8 @@ urlpatterns = [
     path('api/', include('payments.urls')),
 ]
 
+if settings.INSTRUMENTATION_ENABLED:
+    urlpatterns.append(path('metrics/', metrics_view, name='metrics'))
+
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
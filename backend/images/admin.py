@@ -0,0 +1,8 @@
+from django.contrib import admin
+from .models import ImageJob
+
+@admin.register(ImageJob)
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ('model', 'object_id', 'field', 'status', 'attempts', 'created_at', 'processed_at')
+    list_filter = ('status', 'model')
+    search_fields = ('object_id', 'source')
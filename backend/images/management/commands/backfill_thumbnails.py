@@ -0,0 +1,48 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from images.models import ImageJob
+from images.thumbnails import IMAGE_FIELDS, default_image
+
+
+class Command(BaseCommand):
+    help = (
+        "Queue thumbnail jobs for existing images that have no variants yet (or all of them with --all), "
+        "except default images."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model', action='append', dest='models', choices=list(IMAGE_FIELDS),
+            help="Only this model (repeatable; default: all tracked models)."
+        )
+        parser.add_argument('--all', action='store_true', help="Regenerate images that already have variants.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for label in options['models'] or IMAGE_FIELDS:
+            model = apps.get_model(label)
+            field, variants_field = IMAGE_FIELDS[label]
+            queryset = model._default_manager.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+            default = default_image(model, field)
+            if default:
+                # Not queued on save either (see images.signals.queue_thumbnails).
+                queryset = queryset.exclude(**{field: default})
+            if not options['all']:
+                queryset = queryset.filter(**{f'{variants_field}__isnull': True})
+            pending = set(
+                ImageJob.objects.filter(model=label, field=field, status__in=['pending', 'processing'])
+                .values_list('object_id', flat=True)
+            )
+
+            batch, queued = [], 0
+            for pk, source in queryset.values_list('pk', field).iterator(chunk_size=options['batch_size']):
+                if str(pk) in pending:
+                    continue
+                batch.append(ImageJob(model=label, object_id=str(pk), field=field, source=source))
+                if len(batch) >= options['batch_size']:
+                    queued += len(ImageJob.objects.bulk_create(batch))
+                    batch = []
+            if batch:
+                queued += len(ImageJob.objects.bulk_create(batch))
+            self.stdout.write(self.style.SUCCESS(f"Queued {queued} {label} image(s)."))
@@ -0,0 +1,39 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from images import worker
+
+
+class Command(BaseCommand):
+    help = "Generate queued thumbnails with a pool of worker threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help="Size of the worker pool.")
+        parser.add_argument('--batch-size', type=int, default=20, help="Jobs claimed per batch.")
+        parser.add_argument(
+            '--poll-interval', type=float, default=2.0,
+            help="Seconds to wait before polling an empty queue again."
+        )
+        parser.add_argument(
+            '--max-attempts', type=int, default=worker.MAX_ATTEMPTS,
+            help="Attempts before a job is marked failed."
+        )
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is drained.")
+        parser.add_argument('--stats', action='store_true', help="Print the queue depth and exit.")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(worker.queue_depth()))
+            return
+
+        totals = worker.run(
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            poll_interval=options['poll_interval'],
+            max_attempts=options['max_attempts'],
+            once=options['once'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {totals['done']}, failed: {totals['failed']}, retried: {totals['retried']}."
+        ))
@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='imagejob',
+            index=models.Index(fields=['status', 'processed_at'], name='image_job_processed_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+import uuid
+
+from django.db import models
+from django.utils import timezone
+
+
+class ImageJob(models.Model):
+    """
+    A queued request to generate the thumbnails of one image field of one
+    object, processed by images.worker.
+
+    Fields:
+    - model: Label of the model holding the image ("books.Book")
+    - object_id: Primary key of the object
+    - field: Name of the image field
+    - source: Storage name of the image the thumbnails are generated from
+    - status: pending, processing, done or failed
+    - attempts / next_attempt_at / claim_token / last_error: Retry and
+      claim state, as for payment webhook events
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    model = models.CharField(max_length=100)
+    object_id = models.CharField(max_length=64)
+    field = models.CharField(max_length=100)
+    source = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim_token = models.UUIDField(blank=True, null=True, db_index=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Claiming due jobs.
+            models.Index(fields=['status', 'next_attempt_at'], name='image_job_due_idx'),
+            # Finding an object's pending job to supersede.
+            models.Index(fields=['model', 'object_id', 'field'], name='image_job_object_idx'),
+            # Pruning done jobs.
+            models.Index(fields=['status', 'processed_at'], name='image_job_processed_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model}:{self.object_id}.{self.field} ({self.status})"
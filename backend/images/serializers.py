@@ -0,0 +1,24 @@
+from rest_framework import serializers
+
+from .thumbnails import srcsets
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    Read-only field rendering a variants column (see images.thumbnails) as
+    srcset strings per format, e.g.
+    {"webp": "https://.../cover.w160.webp 160w, ...", "jpeg": "..."},
+    or null until the thumbnails have been generated.
+    """
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return srcsets(value, self.context.get('request'))
+
+    def compiled_converter(self, model_field):
+        """Converter for config.serialization."""
+        def convert(value, context):
+            return srcsets(value, context.request)
+        return convert
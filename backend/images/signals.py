@@ -0,0 +1,63 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import Signal
+
+from .models import ImageJob
+from .thumbnails import IMAGE_FIELDS, default_image
+
+# Sent with sender=model and pk once images.worker has stored new variants
+# for an object (via queryset.update(), so post_save is not sent).
+variants_updated = Signal()
+
+
+def connect():
+    for label in IMAGE_FIELDS:
+        model = apps.get_model(label)
+        pre_save.connect(remember_image, sender=model, dispatch_uid=f'images.remember:{label}')
+        post_save.connect(queue_thumbnails, sender=model, dispatch_uid=f'images.queue:{label}')
+
+
+def remember_image(sender, instance, update_fields=None, **kwargs):
+    """
+    Look up the stored image name, to tell whether this save changes it.
+    An unchanged image keeps the stored variants, which the worker may
+    have filled in after this instance was loaded.
+    """
+    field, variants_field = IMAGE_FIELDS[sender._meta.label]
+    if update_fields is not None and field not in update_fields:
+        instance._stored_image = getattr(instance, field).name
+        return
+    stored = None
+    if not instance._state.adding:
+        stored = sender._default_manager.filter(pk=instance.pk).values_list(field, variants_field).first()
+    if stored is None:
+        instance._stored_image = None
+        return
+    instance._stored_image, variants = stored
+    if getattr(instance, field).name == instance._stored_image:
+        setattr(instance, variants_field, variants)
+
+
+def queue_thumbnails(sender, instance, **kwargs):
+    """
+    Drop the variants of a replaced image and queue new ones, unless the
+    new image is the field's default, shared by every object left on it.
+    """
+    field, variants_field = IMAGE_FIELDS[sender._meta.label]
+    name = getattr(instance, field).name or None
+    if name == (getattr(instance, '_stored_image', None) or None):
+        return
+    if getattr(instance, variants_field) is not None:
+        setattr(instance, variants_field, None)
+        sender._default_manager.filter(pk=instance.pk).update(**{variants_field: None})
+    if name and name != default_image(sender, field):
+        enqueue(sender._meta.label, instance.pk, field, name)
+
+
+def enqueue(label, pk, field, source):
+    """Queue thumbnails for an object, superseding a job still pending for it."""
+    with transaction.atomic():
+        pending = ImageJob.objects.filter(model=label, object_id=str(pk), field=field, status='pending')
+        if not pending.update(source=source):
+            ImageJob.objects.create(model=label, object_id=str(pk), field=field, source=source)
@@ -0,0 +1,209 @@
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from books import cache as catalog_cache
+from books.models import Book, Category
+from . import worker
+from .models import ImageJob
+from .thumbnails import generate
+
+User = get_user_model()
+
+
+def png(width, height, color=(200, 40, 40, 255)):
+    buffer = io.BytesIO()
+    Image.new('RGBA', (width, height), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class ThumbnailTests(TransactionTestCase):
+    """
+    Covers are resized by images.worker, not in the upload request.
+    TransactionTestCase, since the worker runs jobs on other threads.
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, THUMBNAIL_WIDTHS=[160, 320, 640], THUMBNAIL_FORMATS=('webp', 'jpeg')
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.media = Path(media_root)
+        catalog_cache.get_cache().clear()
+
+        self.category = Category.objects.create(name='Fiction', slug='fiction')
+        self.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='pass12345', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def upload_book(self, image):
+        response = self.client.post('/api/books/', {
+            'title': 'Harbour', 'author': 'Ada Lane', 'description': 'Ships.', 'price': '9.99',
+            'category_id': str(self.category.id), 'stock_quantity': 3, 'is_active': True,
+            'cover_image': SimpleUploadedFile('cover.png', image, content_type='image/png'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Book.objects.get(id=response.data['id'])
+
+    def thumbnails(self):
+        return sorted(path.name for path in self.media.rglob('*.w*.*'))
+
+    def test_upload_queues_job_without_resizing(self):
+        book = self.upload_book(png(800, 400))
+
+        self.assertIsNone(book.cover_variants)
+        self.assertEqual(self.thumbnails(), [])
+        job = ImageJob.objects.get(model='books.Book', object_id=str(book.id))
+        self.assertEqual((job.status, job.field, job.source), ('pending', 'cover_image', book.cover_image.name))
+        response = self.client.get(f'/api/books/{book.id}/')
+        self.assertIsNone(response.data['cover_srcset'])
+
+    def test_worker_generates_variants(self):
+        book = self.upload_book(png(800, 400))
+
+        self.assertEqual(worker.run(workers=2, once=True), {'done': 1, 'failed': 0, 'retried': 0})
+
+        book.refresh_from_db()
+        self.assertEqual([width for width, _ in book.cover_variants['webp']], [160, 320, 640])
+        self.assertEqual(len(self.thumbnails()), 6)
+        name = book.cover_variants['jpeg'][1][1]
+        self.assertTrue(name.endswith('.w320.jpg'))
+        with Image.open(self.media / name) as image:
+            self.assertEqual((image.format, image.size), ('JPEG', (320, 160)))
+        self.assertEqual(ImageJob.objects.get().status, 'done')
+
+        response = self.client.get(f'/api/books/{book.id}/')
+        webp = response.data['cover_srcset']['webp'].split(', ')
+        self.assertEqual(len(webp), 3)
+        self.assertTrue(webp[0].startswith('http://testserver/media/books/'))
+        self.assertTrue(webp[0].endswith('.w160.webp 160w'))
+        listed = self.client.get('/api/books/').data['results'][0]
+        self.assertEqual(listed['cover_srcset'], response.data['cover_srcset'])
+
+    def test_small_image_keeps_its_width(self):
+        book = self.upload_book(png(100, 150))
+        worker.run(once=True)
+        book.refresh_from_db()
+        self.assertEqual([width for width, _ in book.cover_variants['jpeg']], [100])
+
+    def test_new_cover_replaces_variants(self):
+        book = self.upload_book(png(800, 400))
+        worker.run(once=True)
+
+        book.cover_image.save('new.png', ContentFile(png(400, 400)))
+        book.refresh_from_db()
+        self.assertIsNone(book.cover_variants)
+        job = ImageJob.objects.get(status='pending')
+        self.assertEqual(job.source, book.cover_image.name)
+
+        worker.run(once=True)
+        book.refresh_from_db()
+        self.assertTrue(all(name.startswith('books/new') for _, name in book.cover_variants['webp']))
+
+    def test_saves_without_a_new_image_queue_nothing(self):
+        book = self.upload_book(png(300, 300))
+        worker.run(once=True)
+        book.title = 'Renamed'
+        book.save()
+        self.assertFalse(ImageJob.objects.filter(status='pending').exists())
+        book.refresh_from_db()
+        self.assertIsNotNone(book.cover_variants)
+
+    def test_job_for_a_replaced_image_does_nothing(self):
+        book = self.upload_book(png(300, 300))
+        Book.objects.filter(pk=book.pk).update(cover_image='books/elsewhere.jpg')
+
+        self.assertEqual(worker.run(once=True)['done'], 1)
+        book.refresh_from_db()
+        self.assertIsNone(book.cover_variants)
+        self.assertEqual(self.thumbnails(), [])
+
+    def test_unreadable_image_fails(self):
+        name = Book._meta.get_field('cover_image').storage.save('books/broken.jpg', ContentFile(b'not an image'))
+        book = Book.objects.create(
+            title='Broken', author='Bo', description='x', price=Decimal('1'), category=self.category,
+            cover_image=name,
+        )
+
+        self.assertEqual(worker.run(once=True), {'done': 0, 'failed': 1, 'retried': 0})
+        job = ImageJob.objects.get(object_id=str(book.id))
+        self.assertEqual(job.status, 'failed')
+        self.assertTrue(job.last_error)
+
+    def test_existing_variants_are_reused(self):
+        storage = Book._meta.get_field('cover_image').storage
+        name = storage.save('defaults/shared.png', ContentFile(png(400, 200)))
+        first = generate(name, storage)
+        created = self.thumbnails()
+        self.assertEqual(generate(name, storage), first)
+        self.assertEqual(self.thumbnails(), created)
+
+    def test_default_cover_is_not_queued(self):
+        book = Book.objects.create(
+            title='Plain', author='Cy', description='x', price=Decimal('1'), category=self.category,
+        )
+        self.assertEqual(book.cover_image.name, 'defaults/default_book.jpg')
+        self.assertFalse(ImageJob.objects.exists())
+        call_command('backfill_thumbnails', stdout=io.StringIO())
+        self.assertFalse(ImageJob.objects.exists())
+
+    def test_backfill_queues_images_without_variants(self):
+        done = self.upload_book(png(300, 300))
+        worker.run(once=True)
+        name = Book._meta.get_field('cover_image').storage.save('books/plain.png', ContentFile(png(50, 50)))
+        Book.objects.create(
+            title='Plain', author='Cy', description='x', price=Decimal('1'), category=self.category,
+            cover_image=name,
+        )
+        ImageJob.objects.all().delete()
+
+        call_command('backfill_thumbnails', '--model', 'books.Book', stdout=io.StringIO())
+        self.assertEqual(ImageJob.objects.count(), 1)
+        self.assertNotEqual(ImageJob.objects.get().object_id, str(done.id))
+
+        call_command('backfill_thumbnails', '--model', 'books.Book', '--all', stdout=io.StringIO())
+        self.assertEqual(ImageJob.objects.count(), 2)
+
+    def test_batches_are_logged_and_old_done_jobs_pruned(self):
+        self.upload_book(png(300, 300))
+        with self.assertLogs('images.worker', 'INFO') as logs:
+            worker.run(once=True)
+        self.assertEqual(logs.output, ['INFO:images.worker:Image batch of 1 job(s): done=1 failed=0 retried=0'])
+
+        self.upload_book(png(300, 300))
+        ImageJob.objects.filter(status='done').update(processed_at=timezone.now() - timedelta(days=8))
+        ImageJob.objects.create(model='books.Book', object_id='1', field='cover_image', source='x', status='failed')
+        self.assertEqual(worker.prune(batch_size=1), 1)
+        self.assertEqual(sorted(ImageJob.objects.values_list('status', flat=True)), ['failed', 'pending'])
+        self.assertEqual(
+            {key: value for key, value in worker.queue_depth().items() if key != 'oldest_pending_age_seconds'},
+            {'pending': 1, 'processing': 0, 'failed': 1},
+        )
+
+    def test_avatar_srcset(self):
+        response = self.client.patch('/api/auth/profile/update/', {
+            'avatar': SimpleUploadedFile('me.png', png(500, 500), content_type='image/png'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 200, response.data)
+        worker.run(once=True)
+
+        self.client.force_authenticate(User.objects.get(pk=self.admin.pk))
+        response = self.client.get('/api/auth/profile/')
+        self.assertTrue(response.data['avatar_srcset']['jpeg'].endswith('.w320.jpg 320w'))
@@ -0,0 +1,135 @@
+"""
+Responsive thumbnails for uploaded images.
+
+Each tracked image field (IMAGE_FIELDS) has a JSON "variants" column next
+to it, holding the storage names of its thumbnails:
+
+    {"webp": [[160, "books/cover.w160.webp"], [320, ...]], "jpeg": [...]}
+
+Thumbnails are stored alongside the original ("books/cover.jpg" ->
+"books/cover.w320.webp") at each of THUMBNAIL_WIDTHS narrower than the
+original (or one at the original width if it is narrower than all of
+them), in every format of THUMBNAIL_FORMATS.
+
+Nothing is resized in the request that uploads an image: saving a new
+image clears the variants and queues an ImageJob (images.signals), and
+images.worker generates the files and fills the column in. Until then
+serializers fall back to the original. Objects left on the field's
+default image (the default cover) are not queued, and keep falling back
+to it; other images shared by many objects are only generated once, as
+variants already in storage are reused.
+"""
+import io
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# Model label -> (image field, variants field).
+IMAGE_FIELDS = {
+    'books.Book': ('cover_image', 'cover_variants'),
+    'accounts.User': ('avatar', 'avatar_variants'),
+}
+
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+PIL_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+
+def default_image(model, field):
+    """The image an object gets when none is uploaded, or None."""
+    return model._meta.get_field(field).get_default() or None
+
+
+def variant_name(source, width, fmt):
+    path = PurePosixPath(source)
+    return str(path.with_name(f'{path.stem}.w{width}.{EXTENSIONS[fmt]}'))
+
+
+def target_widths(original_width, widths=None):
+    """The configured widths below the original's, or just the original's."""
+    widths = sorted(widths or settings.THUMBNAIL_WIDTHS)
+    return [width for width in widths if width < original_width] or [original_width]
+
+
+def _flatten(image):
+    """RGB copy of an image, with any transparency composited on white."""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    options = {'quality': settings.THUMBNAIL_QUALITY}
+    if fmt == 'jpeg':
+        image = _flatten(image)
+        options.update(optimize=True, progressive=True)
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    image.save(buffer, PIL_FORMATS[fmt], **options)
+    return buffer.getvalue()
+
+
+def generate(source, storage=default_storage, widths=None, formats=None):
+    """
+    Create (or reuse) the thumbnails of `source` and return its variants
+    mapping. Raises OSError / PIL.UnidentifiedImageError for missing or
+    unreadable images.
+    """
+    formats = formats or settings.THUMBNAIL_FORMATS
+    with storage.open(source, 'rb') as file:
+        image = Image.open(file)
+        planned = target_widths(image.width, widths)
+        names = {(width, fmt): variant_name(source, width, fmt) for width in planned for fmt in formats}
+        missing = [key for key, name in names.items() if not storage.exists(name)]
+
+        if missing:
+            # Let the JPEG decoder scale down while decoding, to at least
+            # the largest width needed.
+            largest = max(width for width, _ in missing)
+            image.draft('RGB', (largest, max(1, image.height * largest // image.width)))
+            image = ImageOps.exif_transpose(image)
+            image.load()
+            for width in sorted({width for width, _ in missing}, reverse=True):
+                height = max(1, round(image.height * width / image.width))
+                resized = image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+                for fmt in formats:
+                    if (width, fmt) in missing:
+                        name = names[width, fmt]
+                        names[width, fmt] = storage.save(name, ContentFile(_encode(resized, fmt)))
+
+    return {fmt: [[width, names[width, fmt]] for width in planned] for fmt in formats}
+
+
+def srcsets(variants, request=None, storage=default_storage):
+    """
+    {format: "url 160w, url 320w, ..."} for a variants mapping, with
+    absolute URLs when a request is given; None if there are no variants.
+    """
+    if not variants:
+        return None
+    result = {}
+    for fmt, entries in variants.items():
+        urls = [storage.url(name) for _, name in entries]
+        if request is not None:
+            urls = [request.build_absolute_uri(url) for url in urls]
+        result[fmt] = ', '.join(f'{url} {width}w' for url, (width, _) in zip(urls, entries))
+    return result
+
+
+def absolute_srcsets(value, request):
+    """Make the URLs of a srcsets() result built without a request absolute."""
+    if not value:
+        return value
+    return {
+        fmt: ', '.join(
+            f'{request.build_absolute_uri(url)} {descriptor}'
+            for url, descriptor in (candidate.rsplit(' ', 1) for candidate in srcset.split(', '))
+        )
+        for fmt, srcset in value.items()
+    }
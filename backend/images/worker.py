@@ -0,0 +1,155 @@
+"""
+Background worker generating thumbnails for queued ImageJobs.
+
+Jobs are claimed with payments.worker's queue helpers, exactly like
+payment webhook events: a conditional UPDATE stamps due jobs with a claim
+token and a lease, so several workers never process the same job, and
+jobs of a worker that died become due again when the lease expires.
+
+A job whose object has since got a different image (or was deleted) is
+finished without work. Otherwise the thumbnails are generated and stored
+with a conditional UPDATE that only applies if the image is still the
+one they were made from. Unreadable or missing images fail at once;
+other errors are retried with exponential backoff.
+
+Done jobs are kept for IMAGE_JOB_RETENTION_DAYS, then deleted by prune()
+(`manage.py prune_image_jobs`).
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+from PIL import UnidentifiedImageError
+
+from payments.worker import backoff_delay, claim, delete_in_batches
+from .models import ImageJob
+from .signals import variants_updated
+from .thumbnails import IMAGE_FIELDS, generate
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+QUEUED_STATUSES = ('pending', 'processing', 'failed')
+
+
+def claim_batch(batch_size):
+    """Claim up to batch_size due jobs and return their ids."""
+    token = claim(ImageJob, batch_size)
+    if token is None:
+        return []
+    return list(ImageJob.objects.filter(claim_token=token).values_list('id', flat=True))
+
+
+def process_job(job_id, max_attempts=MAX_ATTEMPTS):
+    """Process one claimed job. Returns 'done', 'failed' or 'retried'."""
+    try:
+        return _process_job(job_id, max_attempts)
+    finally:
+        close_old_connections()
+
+
+def _process_job(job_id, max_attempts):
+    job = ImageJob.objects.get(id=job_id)
+    model = apps.get_model(job.model)
+    field, variants_field = IMAGE_FIELDS[job.model]
+    current = model._default_manager.filter(pk=job.object_id).values_list(field, flat=True).first()
+
+    try:
+        if current == job.source:
+            variants = generate(job.source, model._meta.get_field(field).storage)
+            changes = {variants_field: variants}
+            if any(f.name == 'updated_at' for f in model._meta.concrete_fields):
+                # Bump the validators cached responses are checked against.
+                changes['updated_at'] = timezone.now()
+            with transaction.atomic():
+                stored = model._default_manager.filter(pk=job.object_id, **{field: job.source}).update(**changes)
+                if stored:
+                    pk = model._meta.pk.to_python(job.object_id)
+                    transaction.on_commit(lambda: variants_updated.send(sender=model, pk=pk))
+    except (OSError, UnidentifiedImageError) as e:
+        logger.warning("Thumbnails for %s failed permanently: %s", job, e)
+        _finish(job, 'failed', str(e))
+        return 'failed'
+    except Exception as e:
+        logger.exception("Thumbnails for %s failed; scheduling retry", job)
+        attempts = job.attempts + 1
+        if attempts >= max_attempts:
+            _finish(job, 'failed', str(e))
+            return 'failed'
+        ImageJob.objects.filter(id=job.id).update(
+            status='pending', attempts=attempts, claim_token=None, last_error=str(e),
+            next_attempt_at=timezone.now() + backoff_delay(attempts)
+        )
+        return 'retried'
+
+    _finish(job, 'done')
+    return 'done'
+
+
+def _finish(job, status, error=''):
+    ImageJob.objects.filter(id=job.id).update(
+        status=status, attempts=job.attempts + 1, claim_token=None, last_error=error,
+        processed_at=timezone.now()
+    )
+
+
+def queue_depth():
+    """
+    Return counts of pending, processing and failed jobs and the age of
+    the oldest pending job. Done jobs, the bulk of the table, are not
+    counted.
+    """
+    counts = dict.fromkeys(QUEUED_STATUSES, 0)
+    queued = ImageJob.objects.filter(status__in=QUEUED_STATUSES)
+    for row in queued.values('status').annotate(count=Count('id')):
+        counts[row['status']] = row['count']
+
+    oldest = ImageJob.objects.filter(status__in=['pending', 'processing']).aggregate(
+        oldest=Min('created_at')
+    )['oldest']
+    counts['oldest_pending_age_seconds'] = (
+        round((timezone.now() - oldest).total_seconds(), 3) if oldest else 0
+    )
+    return counts
+
+
+def prune(batch_size=5000, pause=0.0):
+    """
+    Delete jobs done more than IMAGE_JOB_RETENTION_DAYS ago, batch_size at
+    a time so each transaction stays short. Returns how many.
+    """
+    cutoff = timezone.now() - timedelta(days=settings.IMAGE_JOB_RETENTION_DAYS)
+    return delete_in_batches(ImageJob.objects.filter(status='done', processed_at__lt=cutoff), batch_size, pause)
+
+
+def run(workers=2, batch_size=20, poll_interval=2.0, max_attempts=MAX_ATTEMPTS, once=False):
+    """
+    Drain the queue until interrupted, or until it is empty when once=True.
+    Pillow releases the GIL while decoding, resizing and encoding, so
+    threads scale across cores.
+    """
+    totals = {'done': 0, 'failed': 0, 'retried': 0}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-worker') as executor:
+        while True:
+            jobs = claim_batch(batch_size)
+            if not jobs:
+                if once:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            batch = dict.fromkeys(totals, 0)
+            for outcome in executor.map(lambda job_id: process_job(job_id, max_attempts), jobs):
+                batch[outcome] += 1
+                totals[outcome] += 1
+            logger.info(
+                "Image batch of %d job(s): done=%d failed=%d retried=%d",
+                len(jobs), batch['done'], batch['failed'], batch['retried']
+            )
+    return totals
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order, OrderItem
+from .models import ArchivedOrder, DailySales, Order, OrderItem
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -11,3 +11,15 @@ class OrderAdmin(admin.ModelAdmin):
     list_filter = ('payment_status', 'created_at')
     search_fields = ('user__email', 'id')
     inlines = [OrderItemInline]
+
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    list_display = ('date', 'orders', 'units', 'revenue')
+    date_hierarchy = 'date'
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    list_display = ('id', 'email', 'payment_status', 'total_amount', 'created_at', 'archived_at')
+    list_filter = ('payment_status',)
+    search_fields = ('email', 'id', 'payment_reference')
+    readonly_fields = [field.name for field in ArchivedOrder._meta.fields]
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders import retention
+
+
+class Command(BaseCommand):
+    help = (
+        "Move paid, failed and expired orders older than ORDER_ARCHIVE_AFTER_DAYS, with their "
+        "items and transactions, into the archive table (run periodically, e.g. daily)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Override ORDER_ARCHIVE_AFTER_DAYS.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Orders moved per transaction.")
+        parser.add_argument(
+            '--pause', type=float, default=0.0,
+            help="Seconds to sleep between batches, to leave room for other writers."
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days']) if options['days'] is not None else None
+        archived = retention.archive(before, options['batch_size'], options['pause'])
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} order(s)."))
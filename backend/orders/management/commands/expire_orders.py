@@ -0,0 +1,31 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from orders import retention
+
+
+class Command(BaseCommand):
+    help = "Mark orders left pending past ORDER_PENDING_TTL_HOURS as expired, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl-hours', type=float, help="Override ORDER_PENDING_TTL_HOURS.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Orders updated per transaction.")
+        parser.add_argument(
+            '--pause', type=float, default=0.0,
+            help="Seconds to sleep between batches, to leave room for other writers."
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0.0,
+            help="Keep running, reaping every this many seconds (default: run once)."
+        )
+
+    def handle(self, *args, **options):
+        ttl = timedelta(hours=options['ttl_hours']) if options['ttl_hours'] is not None else None
+        while True:
+            expired = retention.expire_stale(ttl, options['batch_size'], options['pause'])
+            self.stdout.write(self.style.SUCCESS(f"Expired {expired} stale pending order(s)."))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders import reporting
+from orders.serializers import OrderReportFilterSerializer
+
+
+class Command(BaseCommand):
+    help = "Stream orders with their items to CSV or JSONL, optionally filtered by date range and status."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', default='csv', dest='data_format', help="csv or jsonl.")
+        parser.add_argument('--start', help="First order creation date (YYYY-MM-DD).")
+        parser.add_argument('--end', help="Last order creation date (YYYY-MM-DD), inclusive.")
+        parser.add_argument(
+            '--status', dest='payment_status', help=OrderReportFilterSerializer().fields['payment_status'].help_text
+        )
+        parser.add_argument('--output', '-o', default='-', help="File to write, or - for stdout.")
+        parser.add_argument(
+            '--chunk-size', type=int, default=reporting.DEFAULT_CHUNK_SIZE, help="Rows fetched per query."
+        )
+
+    def handle(self, *args, **options):
+        params = {
+            name: options[name] for name in ('start', 'end', 'payment_status', 'data_format')
+            if options[name] is not None
+        }
+        serializer = OrderReportFilterSerializer(data=params)
+        if not serializer.is_valid():
+            raise CommandError(serializer.errors)
+        filters = serializer.validated_data
+
+        orders = reporting.filter_orders(filters.get('start'), filters.get('end'), filters.get('payment_status'))
+        lines = reporting.export_lines(filters['data_format'], orders, options['chunk_size'])
+        if options['output'] == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            output.writelines(lines)
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from orders import reporting
+from orders.models import DailySales
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily sales rollup from the paid orders."
+
+    def handle(self, *args, **options):
+        reporting.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {DailySales.objects.count()} daily sales rows."))
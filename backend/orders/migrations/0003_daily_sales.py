@@ -0,0 +1,51 @@
+# Generated by Django 6.0 on 2026-10-18 18:40
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def populate_daily_sales(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    DailySales = apps.get_model('orders', 'DailySales')
+    db_alias = schema_editor.connection.alias
+    days = defaultdict(lambda: {'orders': 0, 'units': 0, 'revenue': Decimal('0.00')})
+    paid = Order.objects.using(db_alias).filter(payment_status='paid').order_by()
+    for row in paid.values(date=TruncDate('created_at')).annotate(
+        orders=models.Count('id'), revenue=models.Sum('total_amount')
+    ):
+        days[row['date']].update(orders=row['orders'], revenue=row['revenue'])
+    items = OrderItem.objects.using(db_alias).filter(order__payment_status='paid').order_by()
+    for row in items.values(date=TruncDate('order__created_at')).annotate(units=models.Sum('quantity')):
+        days[row['date']]['units'] = row['units']
+    DailySales.objects.using(db_alias).bulk_create(
+        [DailySales(date=date, **totals) for date, totals in days.items()], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('date', models.DateField(unique=True)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'daily sales',
+            },
+        ),
+        migrations.RunPython(populate_daily_sales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-18 18:14
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_daily_sales'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='payment_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('paid', 'Paid'), ('failed', 'Failed'), ('expired', 'Expired')], default='pending', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('user_id', models.UUIDField(blank=True, db_index=True, null=True)),
+                ('email', models.EmailField(max_length=254)),
+                ('payment_status', models.CharField(choices=[('pending', 'Pending'), ('paid', 'Paid'), ('failed', 'Failed'), ('expired', 'Expired')], max_length=20)),
+                ('payment_reference', models.CharField(blank=True, max_length=255, null=True)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('document', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['payment_status', 'created_at'], name='archived_order_status_idx')],
+            },
+        ),
+    ]
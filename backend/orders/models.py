@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
 from books.models import Book
 import uuid
 
@@ -14,9 +15,15 @@ class Order(models.Model):
     - user: User who placed the order (optional for guest checkout)
     - email: Email address for order confirmation
     - total_amount: Total cost of the order
-    - payment_status: Status of payment (pending, paid, failed)
+    - payment_status: Status of payment (pending, paid, failed, expired
+      when left pending past ORDER_PENDING_TTL_HOURS, see orders.retention,
+      or needs_review when paid for but its stock is gone, see
+      payments.services.apply_payment_event)
     - payment_reference: Reference ID from payment provider
     - payment_method: Payment method used
+    - stock_reserved: Whether the order's items are taken out of stock
+      (at checkout, or on payment for older orders); released again if the
+      order fails or expires unpaid
     - created_at: Timestamp when order was created
     - updated_at: Timestamp when order was last updated
     """
@@ -24,6 +31,8 @@ class Order(models.Model):
         ('pending', 'Pending'),
         ('paid', 'Paid'),
         ('failed', 'Failed'),
+        ('expired', 'Expired'),
+        ('needs_review', 'Needs review'),
     )
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -33,9 +42,20 @@ class Order(models.Model):
     payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='pending')
     payment_reference = models.CharField(max_length=255, blank=True, null=True)
     payment_method = models.CharField(max_length=50, blank=True, null=True)
+    stock_reserved = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # A customer's order history, keyset-paginated newest first.
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_recent_idx'),
+            # Staff order listing, keyset-paginated newest first.
+            models.Index(fields=['-created_at', '-id'], name='order_recent_idx'),
+            # Filtering by payment status (admin, reporting, stale orders).
+            models.Index(fields=['payment_status', 'created_at'], name='order_status_created_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.id} - {self.email}"
 
@@ -65,3 +85,56 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.quantity} x {self.book.title if self.book else 'Unknown Book'}"
+
+class DailySales(models.Model):
+    """
+    Paid-order rollup per calendar day (in TIME_ZONE) of the orders'
+    creation date, maintained by orders.reporting as orders are paid.
+    """
+    id = models.BigAutoField(primary_key=True)
+    date = models.DateField(unique=True)
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'daily sales'
+
+    def __str__(self):
+        return f"{self.date}: {self.orders} orders, {self.units} units, {self.revenue}"
+
+class ArchivedOrder(models.Model):
+    """
+    A settled order moved out of the hot tables by orders.retention.
+
+    The columns reports filter on are kept; everything else - the order's
+    fields, its items and its payment transactions with their raw
+    provider responses - is kept as one JSON document.
+
+    Fields:
+    - id: The order's id
+    - user_id: Id of the user who placed it (no foreign key; users may be deleted)
+    - email, payment_status, payment_reference, total_amount, created_at: As on Order
+    - units: Total quantity of the order's items
+    - document: {"order": {...}, "items": [...], "transactions": [...]}
+    - archived_at: Timestamp when the order was archived
+    """
+    id = models.UUIDField(primary_key=True, editable=False)
+    user_id = models.UUIDField(blank=True, null=True, db_index=True)
+    email = models.EmailField()
+    payment_status = models.CharField(max_length=20, choices=Order.PAYMENT_STATUS_CHOICES)
+    payment_reference = models.CharField(max_length=255, blank=True, null=True)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    units = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField()
+    document = models.JSONField(encoder=DjangoJSONEncoder)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['payment_status', 'created_at'], name='archived_order_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived order {self.id} - {self.email}"
@@ -0,0 +1,164 @@
+"""
+Staff reporting over orders: streamed exports and daily sales rollups.
+
+Exports walk the matching orders with one query joined to their items,
+read through .iterator(chunk_size) - a server-side cursor on PostgreSQL -
+so memory stays flat however many orders match. CSV has one line per
+order item (order columns repeated, item columns empty for orders without
+items); JSONL has one order per line with its items nested.
+
+DailySales holds paid orders, units and revenue per day of the orders'
+creation date (in TIME_ZONE). It is kept current as orders change state
+(see payments.services.apply_payment_event); rebuild() recomputes it from
+the orders and archived orders, also available as
+`manage.py rebuild_daily_sales`.
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+from itertools import groupby
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from config.streaming import FORMATS, csv_lines, jsonl_lines
+from .models import ArchivedOrder, DailySales, Order, OrderItem
+
+ORDER_COLUMNS = (
+    'order_id', 'created_at', 'email', 'user_id', 'payment_status',
+    'payment_reference', 'payment_method', 'total_amount',
+)
+ITEM_COLUMNS = ('item_id', 'book_id', 'isbn', 'title', 'quantity', 'price', 'subtotal')
+
+_ORDER_VALUES = (
+    'id', 'created_at', 'email', 'user_id', 'payment_status',
+    'payment_reference', 'payment_method', 'total_amount',
+)
+_ITEM_VALUES = (
+    'items__id', 'items__book_id', 'items__book__isbn', 'items__book__title',
+    'items__quantity', 'items__price', 'items__subtotal',
+)
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def day_bounds(start=None, end=None):
+    """created_at lookups covering the local calendar days start..end, inclusive."""
+    tz = timezone.get_current_timezone()
+    lookups = {}
+    if start is not None:
+        lookups['created_at__gte'] = datetime.datetime.combine(start, datetime.time.min, tzinfo=tz)
+    if end is not None:
+        lookups['created_at__lt'] = datetime.datetime.combine(
+            end + datetime.timedelta(days=1), datetime.time.min, tzinfo=tz
+        )
+    return lookups
+
+
+def filter_orders(start=None, end=None, payment_status=None):
+    queryset = Order.objects.filter(**day_bounds(start, end))
+    if payment_status:
+        queryset = queryset.filter(payment_status=payment_status)
+    return queryset
+
+
+def _plain(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if value is None or isinstance(value, (int, str)):
+        return value
+    # UUIDs and Decimals.
+    return str(value)
+
+
+def export_rows(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield (order dict, item dict or None), one per order item, oldest order first."""
+    rows = queryset.order_by('created_at', 'id', 'items__id').values_list(*_ORDER_VALUES, *_ITEM_VALUES)
+    width = len(_ORDER_VALUES)
+    for values in rows.iterator(chunk_size=chunk_size):
+        values = [_plain(value) for value in values]
+        order = dict(zip(ORDER_COLUMNS, values[:width]))
+        item = dict(zip(ITEM_COLUMNS, values[width:])) if values[width] is not None else None
+        yield order, item
+
+
+def _csv_rows(rows):
+    empty = dict.fromkeys(ITEM_COLUMNS)
+    for order, item in rows:
+        yield {**order, **(item or empty)}
+
+
+def _jsonl_rows(rows):
+    for _, group in groupby(rows, key=lambda row: row[0]['order_id']):
+        group = list(group)
+        yield {**group[0][0], 'items': [item for _, item in group if item is not None]}
+
+
+def export_lines(fmt, queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the export of `queryset` as text, a line at a time."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; use one of {', '.join(FORMATS)}")
+    rows = export_rows(queryset, chunk_size)
+    if fmt == 'csv':
+        return csv_lines(_csv_rows(rows), ORDER_COLUMNS + ITEM_COLUMNS)
+    return jsonl_lines(_jsonl_rows(rows))
+
+
+def adjust(date, orders, units, revenue):
+    """
+    Add to a day's totals. Must run inside the transaction that changed the
+    order, so the rollup commits or rolls back with it.
+    """
+    updates = {'orders': F('orders') + orders, 'units': F('units') + units, 'revenue': F('revenue') + revenue}
+    if DailySales.objects.filter(date=date).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            DailySales.objects.create(date=date, orders=orders, units=units, revenue=revenue)
+    except IntegrityError:
+        # A concurrent writer created the row first.
+        DailySales.objects.filter(date=date).update(**updates)
+
+
+def record_paid(order, sign=1):
+    """Count an order that just became paid (or, with sign=-1, stopped being paid)."""
+    units = OrderItem.objects.filter(order=order).aggregate(units=Sum('quantity'))['units'] or 0
+    adjust(timezone.localdate(order.created_at), sign, sign * units, sign * order.total_amount)
+
+
+@transaction.atomic
+def rebuild():
+    """Recompute the whole rollup from the paid orders, archived ones included."""
+    days = defaultdict(lambda: {'orders': 0, 'units': 0, 'revenue': Decimal('0.00')})
+    paid = Order.objects.filter(payment_status='paid').order_by()
+    for row in paid.values(date=TruncDate('created_at')).annotate(
+        orders=Count('id'), revenue=Sum('total_amount')
+    ):
+        days[row['date']].update(orders=row['orders'], revenue=row['revenue'])
+    items = OrderItem.objects.filter(order__payment_status='paid').order_by()
+    for row in items.values(date=TruncDate('order__created_at')).annotate(units=Sum('quantity')):
+        days[row['date']]['units'] = row['units']
+    archived = ArchivedOrder.objects.filter(payment_status='paid').order_by()
+    for row in archived.values(date=TruncDate('created_at')).annotate(
+        orders=Count('id'), units=Sum('units'), revenue=Sum('total_amount')
+    ):
+        totals = days[row['date']]
+        totals['orders'] += row['orders']
+        totals['units'] += row['units']
+        totals['revenue'] += row['revenue']
+
+    DailySales.objects.all().delete()
+    DailySales.objects.bulk_create(
+        [DailySales(date=date, **totals) for date, totals in days.items()], batch_size=1000
+    )
+
+
+def daily_sales(start=None, end=None):
+    queryset = DailySales.objects.order_by('date')
+    if start is not None:
+        queryset = queryset.filter(date__gte=start)
+    if end is not None:
+        queryset = queryset.filter(date__lte=end)
+    return queryset
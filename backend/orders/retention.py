@@ -0,0 +1,120 @@
+"""
+Keeping the order tables small: expiring abandoned checkouts and
+archiving settled orders.
+
+Every checkout creates a pending Order (with its items and a
+PaymentTransaction) and reserves its stock, paid for or not.
+expire_stale() marks orders still pending after ORDER_PENDING_TTL_HOURS
+as expired and puts their stock back. If the provider reports a payment
+afterwards, the order is still flipped to paid and its stock deducted
+again, if there is enough (see payments.services.apply_payment_event).
+
+archive() moves paid, failed and expired orders older than
+ORDER_ARCHIVE_AFTER_DAYS into ArchivedOrder, one row per order. Its
+document holds the order, its items and its transactions with their
+raw_response. The move happens in the same transaction as the delete, so
+an order is always in exactly one of the two tables. Archived orders
+leave order history and the staff listing, but still count in the daily
+sales rollup (see orders.reporting.rebuild).
+
+Both work in batches of batch_size rows, one short transaction each,
+walking the (payment_status, created_at) index. Run them periodically
+with `manage.py expire_orders` and `manage.py archive_orders`.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from payments.models import PaymentTransaction
+from payments.services import release_stock_for_orders
+from .models import ArchivedOrder, Order, OrderItem
+
+ARCHIVED_STATUSES = ('paid', 'failed', 'expired')
+
+_ORDER_FIELDS = (
+    'id', 'user_id', 'email', 'total_amount', 'payment_status', 'payment_reference',
+    'payment_method', 'created_at', 'updated_at',
+)
+_ITEM_FIELDS = ('id', 'order_id', 'book_id', 'quantity', 'price', 'subtotal')
+_TRANSACTION_FIELDS = ('id', 'order_id', 'provider', 'reference', 'status', 'raw_response', 'created_at')
+
+
+def _batches(queryset, batch_size, pause):
+    """Yield lists of up to batch_size ids from queryset, oldest first, until none are left."""
+    while True:
+        ids = list(queryset.order_by('created_at').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return
+        yield ids
+        if pause:
+            time.sleep(pause)
+
+
+def expire_stale(ttl=None, batch_size=1000, pause=0.0):
+    """Mark orders pending for longer than ttl as expired. Returns how many."""
+    ttl = ttl if ttl is not None else timedelta(hours=settings.ORDER_PENDING_TTL_HOURS)
+    stale = Order.objects.filter(payment_status='pending', created_at__lt=timezone.now() - ttl)
+    expired = 0
+    for ids in _batches(stale, batch_size, pause):
+        with transaction.atomic():
+            # Orders paid since they were selected are left alone.
+            rows = list(
+                Order.objects.select_for_update()
+                .filter(id__in=ids, payment_status='pending')
+                .values_list('id', 'stock_reserved')
+            )
+            Order.objects.filter(id__in=[pk for pk, _ in rows]).update(
+                payment_status='expired', stock_reserved=False, updated_at=Now()
+            )
+            release_stock_for_orders([pk for pk, reserved in rows if reserved])
+        expired += len(rows)
+    return expired
+
+
+def _archive_batch(ids):
+    with transaction.atomic():
+        orders = list(
+            Order.objects.select_for_update()
+            .filter(id__in=ids, payment_status__in=ARCHIVED_STATUSES)
+            .values(*_ORDER_FIELDS)
+        )
+        ids = [order['id'] for order in orders]
+        items, transactions = {}, {}
+        for item in OrderItem.objects.filter(order_id__in=ids).values(*_ITEM_FIELDS):
+            items.setdefault(item['order_id'], []).append(item)
+        for txn in PaymentTransaction.objects.filter(order_id__in=ids).values(*_TRANSACTION_FIELDS):
+            transactions.setdefault(txn['order_id'], []).append(txn)
+
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(
+                id=order['id'],
+                user_id=order['user_id'],
+                email=order['email'],
+                payment_status=order['payment_status'],
+                payment_reference=order['payment_reference'],
+                total_amount=order['total_amount'],
+                units=sum(item['quantity'] for item in items.get(order['id'], ())),
+                created_at=order['created_at'],
+                document={
+                    'order': order,
+                    'items': items.get(order['id'], []),
+                    'transactions': transactions.get(order['id'], []),
+                },
+            )
+            for order in orders
+        ])
+        # Items and transactions go with their orders (on_delete=CASCADE).
+        Order.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def archive(before=None, batch_size=500, pause=0.0):
+    """Move settled orders created before `before` into ArchivedOrder. Returns how many."""
+    if before is None:
+        before = timezone.now() - timedelta(days=settings.ORDER_ARCHIVE_AFTER_DAYS)
+    settled = Order.objects.filter(payment_status__in=ARCHIVED_STATUSES, created_at__lt=before)
+    return sum(_archive_batch(ids) for ids in _batches(settled, batch_size, pause))
@@ -1,6 +1,9 @@
 from rest_framework import serializers
-from .models import Order, OrderItem
-from books.serializers import BookSerializer
+from .models import DailySales, Order, OrderItem
+from books.models import Book
+from books.serializers import BOOK_PROPERTIES, BookSerializer
+from config.serialization import CompiledSerializer
+from config.streaming import FORMATS
 
 class OrderItemSerializer(serializers.ModelSerializer):
     """
@@ -13,6 +16,21 @@ class OrderItemSerializer(serializers.ModelSerializer):
         model = OrderItem
         fields = ['id', 'book', 'book_details', 'quantity', 'price', 'subtotal']
 
+class OrderItemBookSerializer(serializers.ModelSerializer):
+    """
+    Compact book representation for order items: id, title and cover only.
+    """
+    class Meta:
+        model = Book
+        fields = ['id', 'title', 'cover_image']
+
+class OrderItemCompactSerializer(OrderItemSerializer):
+    """
+    Serializer for OrderItem model.
+    Includes compact book details.
+    """
+    book_details = OrderItemBookSerializer(source='book', read_only=True)
+
 class OrderSerializer(serializers.ModelSerializer):
     """
     Serializer for Order model.
@@ -28,3 +46,42 @@ class OrderSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at', 'items'
         ]
         read_only_fields = ['id', 'user', 'total_amount', 'payment_status', 'created_at', 'updated_at']
+
+class OrderCompactSerializer(OrderSerializer):
+    """
+    Serializer for Order model.
+    Includes nested order items with compact book details.
+    """
+    items = OrderItemCompactSerializer(many=True, read_only=True)
+
+class DailySalesSerializer(serializers.ModelSerializer):
+    """
+    Serializer for DailySales model.
+    """
+    class Meta:
+        model = DailySales
+        fields = ['date', 'orders', 'units', 'revenue']
+
+class OrderReportFilterSerializer(serializers.Serializer):
+    """
+    Query parameters of the staff order export and sales report: an
+    inclusive date range, a payment status and a file format.
+    """
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    payment_status = serializers.ChoiceField(
+        choices=Order.PAYMENT_STATUS_CHOICES, required=False,
+        help_text='One of %s.' % ', '.join(status for status, _ in Order.PAYMENT_STATUS_CHOICES),
+    )
+    data_format = serializers.ChoiceField(choices=FORMATS, default='csv')
+
+    def validate(self, attrs):
+        if attrs.get('start') and attrs.get('end') and attrs['start'] > attrs['end']:
+            raise serializers.ValidationError({'end': 'Must not be before start.'})
+        return attrs
+
+
+# OrderSerializer / OrderCompactSerializer output from .values() rows
+# (see config.serialization).
+compiled_order_serializer = CompiledSerializer(OrderSerializer, BOOK_PROPERTIES)
+compiled_order_compact_serializer = CompiledSerializer(OrderCompactSerializer, BOOK_PROPERTIES)
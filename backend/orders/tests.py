@@ -1,3 +1,407 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import json
+import uuid
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+
+from books.models import Book, Category
+from books.tests import IndexUsageTestMixin
+from payments.models import PaymentTransaction
+from payments.services import apply_payment_event
+from . import reporting, retention
+from .models import ArchivedOrder, DailySales, Order, OrderItem
+from .serializers import (
+    OrderCompactSerializer, OrderReportFilterSerializer, OrderSerializer, compiled_order_compact_serializer,
+    compiled_order_serializer,
+)
+
+User = get_user_model()
+
+
+class OrderIndexTests(IndexUsageTestMixin, TestCase):
+    """
+    Regression tests proving each hot order query is served by its index.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader', password='secret-pass-123'
+        )
+        Order.objects.create(user=cls.user, email=cls.user.email)
+
+    def test_user_order_history_uses_index(self):
+        queryset = Order.objects.filter(user=self.user).order_by('-created_at', '-id')[:25]
+        self.assertUsesIndex(queryset, 'order_user_recent_idx')
+
+    def test_staff_order_listing_uses_index(self):
+        queryset = Order.objects.order_by('-created_at', '-id')[:25]
+        self.assertUsesIndex(queryset, 'order_recent_idx')
+
+    def test_payment_status_filter_uses_index(self):
+        queryset = Order.objects.filter(payment_status='pending')
+        self.assertUsesIndex(queryset, 'order_status_created_idx')
+
+
+class CompiledOrderSerializerTests(TestCase):
+    """
+    Contract tests: the compiled order serializers (config.serialization)
+    must render exactly the same JSON as OrderSerializer and
+    OrderCompactSerializer, directly and through the order endpoints.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader', password='secret-pass-123'
+        )
+        category = Category.objects.create(name='Fiction', slug='fiction')
+        books = [
+            Book.objects.create(
+                title=f'Book {i}', author='An Author', description='Text', price=Decimal('9.99') + i,
+                category=category, stock_quantity=i, cover_image='books/cover.jpg' if i else 'defaults/d.jpg',
+            )
+            for i in range(3)
+        ]
+        for n in range(3):
+            order = Order.objects.create(
+                user=cls.user, email=cls.user.email, total_amount=Decimal('40.50'),
+                payment_status='paid' if n else 'pending', payment_reference=f'ref-{n}' if n else None,
+            )
+            for book in books[:n + 1]:
+                OrderItem.objects.create(order=order, book=book, quantity=n + 1, price=book.price)
+        # A guest order without items, and an item whose book was deleted.
+        Order.objects.create(email='guest@example.com', payment_method='card')
+        books[2].delete()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def assertSameResponse(self, url):
+        with override_settings(FAST_SERIALIZATION=False):
+            expected = self.client.get(url)
+        actual = self.client.get(url)
+        self.assertEqual(actual.status_code, expected.status_code)
+        self.assertEqual(actual.content, expected.content)
+        return actual
+
+    def test_matches_order_serializers(self):
+        request = APIRequestFactory().get('/api/orders/')
+        queryset = Order.objects.order_by('-created_at', '-id')
+        for serializer_class, compiled in (
+            (OrderSerializer, compiled_order_serializer),
+            (OrderCompactSerializer, compiled_order_compact_serializer),
+        ):
+            with self.subTest(serializer_class.__name__):
+                expected = serializer_class(queryset, many=True, context={'request': request}).data
+                actual = compiled.serialize(compiled.values(queryset), request)
+                self.assertEqual(self.render(actual), self.render(expected))
+
+    def test_serializes_with_two_queries(self):
+        with self.assertNumQueries(2):
+            compiled_order_serializer.serialize(compiled_order_serializer.values(Order.objects.all()))
+
+    def test_list_endpoint_matches(self):
+        response = self.assertSameResponse('/api/orders/?page_size=2')
+        self.assertSameResponse(response.data['next'])
+        self.assertSameResponse('/api/orders/?compact=true')
+
+    def test_detail_endpoint_matches(self):
+        for order in Order.objects.filter(user=self.user):
+            self.assertSameResponse(f'/api/orders/{order.id}/')
+            self.assertSameResponse(f'/api/orders/{order.id}/?compact=true')
+        self.assertSameResponse(f'/api/orders/{uuid.uuid4()}/')
+
+
+class OrderQueryCountTests(TestCase):
+    """
+    The order endpoints cost a fixed number of queries however many orders
+    and items they return (see OrderQuerysetMixin), with and without the
+    compiled serializers.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader', password='secret-pass-123'
+        )
+        cls.staff = User.objects.create_user(
+            email='staff@example.com', username='staff', password='secret-pass-123', is_staff=True
+        )
+        cls.categories = [Category.objects.create(name=f'Category {i}', slug=f'category-{i}') for i in range(2)]
+        cls.order = cls.place_order(1)
+
+    @classmethod
+    def place_order(cls, size):
+        order = Order.objects.create(user=cls.user, email=cls.user.email, total_amount=Decimal('10.00'))
+        for i in range(size):
+            book = Book.objects.create(
+                title=f'Book {i}', author='An Author', description='Text', price=Decimal('5.00'),
+                category=cls.categories[i % 2], stock_quantity=1,
+            )
+            OrderItem.objects.create(order=order, book=book, quantity=1, price=book.price)
+        return order
+
+    def assertQueries(self, user, expected):
+        client = APIClient()
+        client.force_authenticate(user)
+        for fast in (True, False):
+            for url, count in expected.items():
+                with self.subTest(url=url, fast=fast), override_settings(FAST_SERIALIZATION=fast):
+                    with self.assertNumQueries(count):
+                        response = client.get(url)
+                    self.assertEqual(response.status_code, 200)
+
+    def test_query_counts_do_not_grow(self):
+        detail = f'/api/orders/{self.order.id}/'
+        # Orders, then their items with books and categories; the detail
+        # view also looks up its validators (see config.conditional).
+        expected = {
+            '/api/orders/': 2,
+            '/api/orders/?compact=true': 2,
+            detail: 3,
+            f'{detail}?compact=true': 3,
+        }
+        self.assertQueries(self.user, expected)
+        self.assertQueries(self.staff, {'/api/orders/': 2, '/api/orders/?compact=true': 2})
+
+        # More orders, and more items in the order shown in detail.
+        for size in (3, 5):
+            self.place_order(size)
+        for i in range(4):
+            book = Book.objects.create(
+                title=f'Extra {i}', author='An Author', description='Text', price=Decimal('5.00'),
+                category=self.categories[i % 2], stock_quantity=1,
+            )
+            OrderItem.objects.create(order=self.order, book=book, quantity=1, price=book.price)
+        self.assertQueries(self.user, expected)
+        self.assertQueries(self.staff, {'/api/orders/': 2, '/api/orders/?compact=true': 2})
+
+
+class OrderReportingTests(TestCase):
+    """Streamed order exports and the DailySales rollup (orders.reporting)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            email='staff@example.com', username='staff', password='secret-pass-123', is_staff=True
+        )
+        category = Category.objects.create(name='Fiction', slug='fiction')
+        cls.books = [
+            Book.objects.create(
+                title=f'Book {i}', author='An Author', description='Text', price=Decimal('10.00'),
+                category=category, stock_quantity=20, isbn=f'978000000000{i}',
+            )
+            for i in range(2)
+        ]
+
+    def place_order(self, day, quantities, status='pending'):
+        order = Order.objects.create(email='buyer@example.com', payment_status=status)
+        total = Decimal('0.00')
+        for book, quantity in zip(self.books, quantities):
+            OrderItem.objects.create(order=order, book=book, quantity=quantity, price=book.price)
+            total += book.price * quantity
+        created_at = datetime.datetime.combine(day, datetime.time(12), tzinfo=datetime.timezone.utc)
+        Order.objects.filter(pk=order.pk).update(total_amount=total, created_at=created_at)
+        order.refresh_from_db()
+        PaymentTransaction.objects.create(order=order, provider='paystack', reference=f'ref-{order.pk}')
+        return order
+
+    def pay(self, order, status='successful'):
+        with transaction.atomic():
+            apply_payment_event({'reference': f'ref-{order.pk}', 'status': status})
+
+    def rollup(self):
+        return {row.date: (row.orders, row.units, row.revenue) for row in DailySales.objects.all()}
+
+    def test_rollup_follows_payments(self):
+        day = datetime.date(2026, 3, 1)
+        first = self.place_order(day, [1, 2])
+        second = self.place_order(day, [3])
+        self.place_order(day + datetime.timedelta(days=1), [1])
+
+        self.pay(first)
+        self.pay(first)  # A retried callback counts once.
+        self.pay(second)
+        self.assertEqual(self.rollup(), {day: (2, 6, Decimal('60.00'))})
+
+        self.pay(second, status='failed')
+        self.assertEqual(self.rollup(), {day: (1, 3, Decimal('30.00'))})
+
+        incremental = self.rollup()
+        reporting.rebuild()
+        self.assertEqual(self.rollup(), incremental)
+
+    def export(self, fmt, **filters):
+        return ''.join(reporting.export_lines(fmt, reporting.filter_orders(**filters)))
+
+    def test_export_filters_and_formats(self):
+        day = datetime.date(2026, 3, 1)
+        paid = self.place_order(day, [1, 2], status='paid')
+        self.place_order(day, [1])
+        self.place_order(day + datetime.timedelta(days=2), [1], status='paid')
+        empty = self.place_order(day, [], status='paid')
+
+        rows = list(csv.DictReader(io.StringIO(self.export('csv', start=day, end=day, payment_status='paid'))))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual([row['order_id'] for row in rows].count(str(paid.id)), 2)
+        self.assertEqual({row['isbn'] for row in rows}, {'9780000000000', '9780000000001', ''})
+
+        orders = [json.loads(line) for line in self.export('jsonl', start=day, end=day).splitlines()]
+        self.assertEqual(len(orders), 3)
+        by_id = {order['order_id']: order for order in orders}
+        self.assertEqual(sorted(item['quantity'] for item in by_id[str(paid.id)]['items']), [1, 2])
+        self.assertEqual(by_id[str(empty.id)]['items'], [])
+        self.assertEqual(by_id[str(paid.id)]['total_amount'], '30.00')
+
+    def test_export_command(self):
+        self.place_order(datetime.date(2026, 3, 1), [1], status='paid')
+        out = io.StringIO()
+        call_command('export_orders', '--format', 'jsonl', '--status', 'paid', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 1)
+        with self.assertRaises(CommandError):
+            call_command('export_orders', '--start', 'yesterday')
+        call_command('export_orders', '--status', 'needs_review', stdout=out)
+        help_text = OrderReportFilterSerializer().fields['payment_status'].help_text
+        for status, _ in Order.PAYMENT_STATUS_CHOICES:
+            self.assertIn(status, help_text)
+
+    def test_api_is_staff_only(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(
+            email='reader@example.com', username='reader', password='secret-pass-123'
+        ))
+        self.assertEqual(client.get('/api/orders/export/').status_code, 403)
+        self.assertEqual(client.get('/api/orders/reports/daily/').status_code, 403)
+
+    def test_api_export_and_daily_report(self):
+        day = datetime.date(2026, 3, 1)
+        for quantities in ([1, 2], [4]):
+            self.pay(self.place_order(day, quantities))
+        self.pay(self.place_order(day + datetime.timedelta(days=1), [1]))
+        client = APIClient()
+        client.force_authenticate(self.staff)
+
+        response = client.get('/api/orders/export/', {'start': '2026-03-01', 'end': '2026-03-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 4)
+        response = client.get('/api/orders/export/', {'start': '2026-03-02', 'end': '2026-03-01'})
+        self.assertEqual(response.status_code, 400)
+
+        response = client.get('/api/orders/reports/daily/', {'start': '2026-03-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'results': [
+                {'date': '2026-03-01', 'orders': 2, 'units': 7, 'revenue': '70.00'},
+                {'date': '2026-03-02', 'orders': 1, 'units': 1, 'revenue': '10.00'},
+            ],
+            'totals': {'orders': 3, 'units': 8, 'revenue': '80.00'},
+        })
+
+
+class OrderRetentionTests(TestCase):
+    """Expiring stale pending orders and archiving settled ones (orders.retention)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader', password='secret-pass-123'
+        )
+        cls.book = Book.objects.create(
+            title='Book', author='An Author', description='Text', price=Decimal('10.00'),
+            category=Category.objects.create(name='Fiction', slug='fiction'), stock_quantity=20,
+            isbn='9780000000001',
+        )
+
+    def place_order(self, age, status='pending', quantity=2):
+        order = Order.objects.create(
+            user=self.user, email=self.user.email, payment_status=status, total_amount=Decimal('20.00')
+        )
+        OrderItem.objects.create(order=order, book=self.book, quantity=quantity, price=self.book.price)
+        PaymentTransaction.objects.create(
+            order=order, provider='paystack', reference=f'ref-{order.pk}',
+            status={'paid': 'successful', 'failed': 'failed'}.get(status, 'pending'),
+            raw_response={'reference': f'ref-{order.pk}', 'gateway': {'code': '00'}},
+        )
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - age)
+        return order
+
+    def statuses(self):
+        return dict(Order.objects.values_list('id', 'payment_status'))
+
+    def test_expires_stale_pending_orders_in_batches(self):
+        stale = [self.place_order(datetime.timedelta(hours=30)) for _ in range(3)]
+        fresh = self.place_order(datetime.timedelta(hours=1))
+        paid = self.place_order(datetime.timedelta(hours=30), status='paid')
+
+        self.assertEqual(retention.expire_stale(batch_size=2), 3)
+        self.assertEqual(self.statuses(), {
+            **{order.pk: 'expired' for order in stale}, fresh.pk: 'pending', paid.pk: 'paid',
+        })
+        self.assertEqual(retention.expire_stale(), 0)
+
+    def test_late_payment_of_an_expired_order(self):
+        order = self.place_order(datetime.timedelta(hours=30))
+        retention.expire_stale()
+        with transaction.atomic():
+            apply_payment_event({'reference': f'ref-{order.pk}', 'status': 'successful'})
+        order.refresh_from_db()
+        self.assertEqual(order.payment_status, 'paid')
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.stock_quantity, 18)
+
+    def test_expire_command(self):
+        self.place_order(datetime.timedelta(hours=3))
+        out = io.StringIO()
+        call_command('expire_orders', '--ttl-hours', '2', stdout=out)
+        self.assertIn('Expired 1 stale pending order(s).', out.getvalue())
+
+    def test_archives_settled_orders(self):
+        old = timezone.now() - datetime.timedelta(days=400)
+        paid = self.place_order(datetime.timedelta(days=400), status='paid', quantity=3)
+        failed = self.place_order(datetime.timedelta(days=401), status='failed')
+        pending = self.place_order(datetime.timedelta(days=400))
+        recent = self.place_order(datetime.timedelta(days=10), status='paid')
+        reporting.rebuild()
+        rollup = list(DailySales.objects.order_by('date').values_list('date', 'orders', 'units', 'revenue'))
+
+        out = io.StringIO()
+        call_command('archive_orders', '--batch-size', '1', stdout=out)
+        self.assertIn('Archived 2 order(s).', out.getvalue())
+
+        self.assertEqual(set(self.statuses()), {pending.pk, recent.pk})
+        self.assertFalse(OrderItem.objects.filter(order_id__in=[paid.pk, failed.pk]).exists())
+        self.assertFalse(PaymentTransaction.objects.filter(order_id__in=[paid.pk, failed.pk]).exists())
+
+        archived = ArchivedOrder.objects.get(pk=paid.pk)
+        self.assertEqual((archived.payment_status, archived.units, archived.user_id), ('paid', 3, self.user.pk))
+        self.assertLess(abs(archived.created_at - old), datetime.timedelta(minutes=1))
+        self.assertEqual(archived.document['order']['total_amount'], '20.00')
+        self.assertEqual([item['quantity'] for item in archived.document['items']], [3])
+        self.assertEqual(archived.document['transactions'][0]['raw_response']['gateway'], {'code': '00'})
+
+        # Archived paid orders still count in the rollup.
+        reporting.rebuild()
+        self.assertEqual(
+            list(DailySales.objects.order_by('date').values_list('date', 'orders', 'units', 'revenue')), rollup
+        )
+
+    def test_archive_is_idempotent(self):
+        self.place_order(datetime.timedelta(days=400), status='paid')
+        self.assertEqual(retention.archive(), 1)
+        self.assertEqual(retention.archive(), 0)
+        self.assertEqual(ArchivedOrder.objects.count(), 1)
@@ -1,7 +1,9 @@
 from django.urls import path
-from .views import OrderListView, OrderDetailView
+from .views import OrderListView, OrderDetailView, OrderExportView, DailySalesView
 
 urlpatterns = [
     path('orders/', OrderListView.as_view(), name='order_list'),
+    path('orders/export/', OrderExportView.as_view(), name='order_export'),
+    path('orders/reports/daily/', DailySalesView.as_view(), name='order_daily_sales'),
     path('orders/<uuid:id>/', OrderDetailView.as_view(), name='order_detail'),
 ]
@@ -1,28 +1,162 @@
 from rest_framework import generics, permissions
-from .models import Order
-from .serializers import OrderSerializer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.conf import settings
+from django.db.models import Max, Prefetch, Sum
+from django.shortcuts import get_object_or_404
+from config.conditional import ConditionalGetMixin
+from config.streaming import streaming_response
+from . import reporting
+from .models import Order, OrderItem
+from .serializers import (
+    DailySalesSerializer, OrderSerializer, OrderCompactSerializer, OrderReportFilterSerializer,
+    compiled_order_serializer, compiled_order_compact_serializer
+)
+from config.pagination import KeysetPagination
 
-class OrderListView(generics.ListAPIView):
+class OrderQuerysetMixin:
+    """
+    Builds order querysets with the prefetch graph their serializer needs,
+    so serializing any number of orders costs a fixed number of queries:
+    one for the orders and one for all their items with books (and, for
+    the full representation, categories) joined in.
+
+    Pass ?compact=true for order items with only the book id, title and
+    cover instead of the full book details.
+
+    With FAST_SERIALIZATION on, views serialize through the compiled
+    equivalent of their serializer instead (see config.serialization):
+    the same two queries, reading .values() rows.
+    """
+    compact_fields = ('id', 'order_id', 'book_id', 'quantity', 'price', 'subtotal',
+                      'book__id', 'book__title', 'book__cover_image')
+
+    def is_compact(self):
+        return self.request.query_params.get('compact', '').lower() in ('1', 'true', 'yes')
+
+    def get_serializer_class(self):
+        if self.is_compact():
+            return OrderCompactSerializer
+        return OrderSerializer
+
+    def get_compiled_serializer(self):
+        if self.is_compact():
+            return compiled_order_compact_serializer
+        return compiled_order_serializer
+
+    def compiled_values(self, queryset):
+        # The compiled serializer fetches the items itself.
+        return self.get_compiled_serializer().values(queryset.prefetch_related(None))
+
+    def with_items(self, queryset):
+        if self.is_compact():
+            items = OrderItem.objects.select_related('book').only(*self.compact_fields)
+        else:
+            items = OrderItem.objects.select_related('book__category')
+        return queryset.prefetch_related(Prefetch('items', queryset=items))
+
+class OrderListView(OrderQuerysetMixin, generics.ListAPIView):
     """
     API view to list orders for the authenticated user.
+    Results are keyset-paginated, newest first (see KeysetPagination).
+    Reads may be served by a replica, except shortly after the user has
+    written (see config.routers).
     """
-    serializer_class = OrderSerializer
+    pagination_class = KeysetPagination
     permission_classes = (permissions.IsAuthenticated,)
+    replica_reads = True
 
     def get_queryset(self):
         user = self.request.user
         if user.is_staff:
-            return Order.objects.all().order_by('-created_at')
-        return Order.objects.filter(user=user).order_by('-created_at')
+            return self.with_items(Order.objects.all().order_by('-created_at'))
+        return self.with_items(Order.objects.filter(user_id=user.pk).order_by('-created_at'))
+
+    def list(self, request, *args, **kwargs):
+        if not settings.FAST_SERIALIZATION:
+            return super().list(request, *args, **kwargs)
+        page = self.paginate_queryset(self.compiled_values(self.filter_queryset(self.get_queryset())))
+        return self.get_paginated_response(self.get_compiled_serializer().serialize(page, request))
 
-class OrderDetailView(generics.RetrieveAPIView):
+class OrderDetailView(ConditionalGetMixin, OrderQuerysetMixin, generics.RetrieveAPIView):
     """
     API view to retrieve details of a specific order.
     Only allows access to orders belonging to the authenticated user.
+    Responses carry ETag / Last-Modified validators covering the order and
+    the nested book details.
     """
-    serializer_class = OrderSerializer
     permission_classes = (permissions.IsAuthenticated,)
     lookup_field = 'id'
+    cache_control = 'private, no-cache'
+
+    def get_queryset(self):
+        return self.with_items(Order.objects.filter(user_id=self.request.user.pk))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not settings.FAST_SERIALIZATION:
+            return super().retrieve(request, *args, **kwargs)
+        row = get_object_or_404(self.compiled_values(self.filter_queryset(self.get_queryset())), id=kwargs['id'])
+        return Response(self.get_compiled_serializer().serialize([row], request)[0])
+
+    def get_conditional_state(self):
+        state = Order.objects.filter(user_id=self.request.user.pk).filter(id=self.kwargs['id']).aggregate(
+            order=Max('updated_at'),
+            books=Max('items__book__updated_at'),
+            categories=Max('items__book__category__updated_at'),
+        )
+        if state['order'] is None:
+            return None
+        timestamps = [state['order'], state['books'], state['categories']]
+        return timestamps, max(t for t in timestamps if t is not None)
+
+class OrderReportFilterMixin:
+    def get_report_filters(self):
+        serializer = OrderReportFilterSerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+class OrderExportView(OrderReportFilterMixin, APIView):
+    """
+    API view streaming orders with their items as CSV or JSONL, oldest
+    first, in constant memory (see orders.reporting).
+    Staff only.
+    Query params:
+    - start, end: Inclusive range of order creation dates (YYYY-MM-DD)
+    - payment_status: One of Order.PAYMENT_STATUS_CHOICES
+    - data_format: csv (default, one line per item) or jsonl (one order per line)
+    """
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        filters = self.get_report_filters()
+        fmt = filters['data_format']
+        orders = reporting.filter_orders(filters.get('start'), filters.get('end'), filters.get('payment_status'))
+        return streaming_response(reporting.export_lines(fmt, orders), fmt, f'orders.{fmt}')
+
+class DailySalesView(OrderReportFilterMixin, generics.ListAPIView):
+    """
+    API view listing paid orders, units sold and revenue per day from the
+    DailySales rollup, with totals over the range.
+    Staff only.
+    Query params:
+    - start, end: Inclusive date range (YYYY-MM-DD)
+    """
+    serializer_class = DailySalesSerializer
+    permission_classes = (permissions.IsAdminUser,)
+    pagination_class = None
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        filters = self.get_report_filters()
+        return reporting.daily_sales(filters.get('start'), filters.get('end'))
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        totals = queryset.aggregate(orders=Sum('orders'), units=Sum('units'), revenue=Sum('revenue'))
+        return Response({
+            'results': self.get_serializer(queryset, many=True).data,
+            'totals': {
+                'orders': totals['orders'] or 0,
+                'units': totals['units'] or 0,
+                'revenue': f"{totals['revenue'] or 0:.2f}",
+            },
+        })
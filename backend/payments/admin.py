@@ -1,3 +1,15 @@
 from django.contrib import admin
+from . import worker
+from .models import WebhookEvent
 
-# Register your models here.
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ('event_id', 'provider', 'reference', 'status', 'attempts', 'received_at', 'processed_at')
+    list_filter = ('status', 'provider', 'processed_at')
+    search_fields = ('event_id', 'reference')
+    actions = ('replay',)
+
+    @admin.action(description="Replay selected failed events")
+    def replay(self, request, queryset):
+        count = worker.replay(queryset)
+        self.message_user(request, f"Queued {count} failed event(s) again.")
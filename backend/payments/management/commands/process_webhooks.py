@@ -0,0 +1,50 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from payments import worker
+from payments.models import WebhookEvent
+
+
+class Command(BaseCommand):
+    help = "Drain the payment webhook queue with a pool of threads or processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Size of the worker pool.")
+        parser.add_argument(
+            '--pool', choices=['thread', 'process'], default='thread',
+            help="Run workers as threads or as separate processes."
+        )
+        parser.add_argument('--batch-size', type=int, default=100, help="Events claimed per batch.")
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help="Seconds to wait before polling an empty queue again."
+        )
+        parser.add_argument(
+            '--max-attempts', type=int, default=worker.MAX_ATTEMPTS,
+            help="Attempts before an event is marked failed."
+        )
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is drained.")
+        parser.add_argument('--stats', action='store_true', help="Print the queue depth and exit.")
+        parser.add_argument('--replay', action='store_true', help="Queue every failed event again and exit.")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(worker.queue_depth()))
+            return
+        if options['replay']:
+            count = worker.replay(WebhookEvent.objects.all())
+            self.stdout.write(self.style.SUCCESS(f"Queued {count} failed event(s) again."))
+            return
+
+        processed, failed, retried = worker.run(
+            workers=options['workers'],
+            pool=options['pool'],
+            batch_size=options['batch_size'],
+            poll_interval=options['poll_interval'],
+            max_attempts=options['max_attempts'],
+            once=options['once'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {processed} event(s), {failed} failed, {retried} scheduled for retry."
+        ))
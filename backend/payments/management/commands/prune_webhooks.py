@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from payments import worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete webhook events processed more than PAYMENT_WEBHOOK_RETENTION_DAYS ago, "
+        "in batches (run periodically, e.g. daily)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Events deleted per transaction.")
+        parser.add_argument(
+            '--pause', type=float, default=0.0,
+            help="Seconds to sleep between batches, to leave room for other writers."
+        )
+
+    def handle(self, *args, **options):
+        pruned = worker.prune(options['batch_size'], options['pause'])
+        self.stdout.write(self.style.SUCCESS(f"Pruned {pruned} processed webhook event(s)."))
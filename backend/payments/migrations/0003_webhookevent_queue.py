@@ -0,0 +1,51 @@
+# Generated by Django 6.0 on 2026-10-18 17:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def mark_applied_events_processed(apps, schema_editor):
+    # Events recorded before the queue existed were applied synchronously.
+    WebhookEvent = apps.get_model('payments', 'WebhookEvent')
+    events = WebhookEvent.objects.using(schema_editor.connection.alias)
+    events.filter(processed_at__isnull=False).update(status='processed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_webhookevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookevent',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='webhookevent',
+            name='claim_token',
+            field=models.UUIDField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='webhookevent',
+            name='last_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='webhookevent',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='webhookevent',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('processed', 'Processed'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='webhookevent',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='webhook_event_due_idx'),
+        ),
+        migrations.RunPython(mark_applied_events_processed, migrations.RunPython.noop),
+    ]
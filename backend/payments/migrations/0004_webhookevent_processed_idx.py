@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 18:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_webhookevent_queue'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='webhookevent',
+            index=models.Index(fields=['status', 'processed_at'], name='webhook_event_processed_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from orders.models import Order
 import uuid
 
@@ -31,3 +32,72 @@ class PaymentTransaction(models.Model):
 
     def __str__(self):
         return f"{self.provider} - {self.reference} ({self.status})"
+
+class WebhookEvent(models.Model):
+    """
+    Model recording every webhook event accepted from a payment provider.
+
+    The unique (provider, event_id) constraint makes ingestion idempotent:
+    a retried delivery of an event that has already been accepted is
+    answered from a single indexed lookup without touching the transaction
+    or order rows again.
+
+    The table also serves as the durable queue drained by the
+    process_webhooks management command (see payments.worker).
+
+    Fields:
+    - id: UUID primary key
+    - provider: Payment provider name
+    - event_id: Provider event id (falls back to reference and status)
+    - reference: Transaction reference the event applies to
+    - payload: Raw event body
+    - status: Queue status (pending, processing, processed, failed)
+    - attempts: Number of processing attempts so far
+    - next_attempt_at: When the event is next due (or its claim expires)
+    - claim_token: Token of the worker batch currently holding the event
+    - last_error: Error from the most recent failed attempt
+    - received_at: Timestamp when the event was first received
+    - processed_at: Timestamp when the event was applied
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('processed', 'Processed'),
+        ('failed', 'Failed'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    provider = models.CharField(max_length=50)
+    event_id = models.CharField(max_length=255)
+    reference = models.CharField(max_length=255, db_index=True)
+    payload = models.JSONField(blank=True, null=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim_token = models.UUIDField(blank=True, null=True, db_index=True)
+    last_error = models.TextField(blank=True, default='')
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['provider', 'event_id'], name='unique_webhook_event'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='webhook_event_due_idx'),
+            models.Index(fields=['status', 'processed_at'], name='webhook_event_processed_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.provider} - {self.event_id} ({self.status})"
+
+    @staticmethod
+    def event_id_for(data):
+        """
+        Return the provider's event id, or derive one from the reference and
+        status for providers that don't send one.
+        """
+        event_id = data.get('event_id') or data.get('id')
+        if event_id:
+            return str(event_id)
+        return f"{data.get('reference')}:{data.get('status')}"
@@ -0,0 +1,175 @@
+import logging
+
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, Sum, When
+from django.db.models.functions import Now
+from books import cache as catalog_cache
+from books import facets
+from books.models import Book
+from orders import reporting
+from orders.models import Order, OrderItem
+from .models import PaymentTransaction
+
+logger = logging.getLogger(__name__)
+
+
+class PermanentWebhookError(Exception):
+    """Raised for webhook events that will never succeed, so are not retried."""
+
+
+class TransactionNotFound(PermanentWebhookError):
+    """Raised when a webhook references an unknown transaction."""
+
+
+class InsufficientStock(Exception):
+    """Raised when deducting an order's items would take a book below zero."""
+
+
+class CheckoutError(Exception):
+    """Raised when a cart can't be checked out; the message is for the client."""
+
+
+def _order_quantities(order_ids):
+    """{book id: total quantity} over the items of the given orders."""
+    return {
+        row['book_id']: row['quantity']
+        for row in OrderItem.objects.filter(order_id__in=order_ids, book__isnull=False)
+        .values('book_id')
+        .annotate(quantity=Sum('quantity'))
+    }
+
+
+def deduct_stock(quantities):
+    """
+    Deduct {book id: quantity} from stock with one guarded UPDATE.
+
+    The decrement is computed in the database (stock_quantity - qty) rather
+    than read-modify-write in Python, so concurrent writers can't lose
+    updates. The WHERE clause only matches books that still have enough
+    stock; if any book falls short, InsufficientStock is raised and the
+    caller's transaction must be rolled back.
+
+    Returns the ids of the books whose stock changed.
+    """
+    if not quantities:
+        return []
+
+    enough_stock = Q()
+    for book_id, quantity in quantities.items():
+        enough_stock |= Q(id=book_id, stock_quantity__gte=quantity)
+
+    updated = Book.objects.filter(enough_stock).update(
+        stock_quantity=Case(
+            *[When(id=book_id, then=F('stock_quantity') - quantity)
+              for book_id, quantity in quantities.items()],
+            default=F('stock_quantity'),
+            output_field=PositiveIntegerField(),
+        ),
+        updated_at=Now(),
+    )
+    if updated != len(quantities):
+        raise InsufficientStock("Insufficient stock")
+
+    # update() bypasses post_save, so update the facet counts and invalidate
+    # the catalog cache directly.
+    book_ids = list(quantities)
+    facets.stock_depleted(book_ids)
+    transaction.on_commit(lambda: catalog_cache.invalidate_books(book_ids))
+    return book_ids
+
+
+def deduct_stock_for_order(order):
+    """Deduct the stock for every book in an order (see deduct_stock())."""
+    try:
+        return deduct_stock(_order_quantities([order.pk]))
+    except InsufficientStock:
+        raise InsufficientStock(f"Insufficient stock to fulfil order {order.id}") from None
+
+
+def release_stock_for_orders(order_ids):
+    """
+    Put the items of unpaid orders back in stock, with one UPDATE. The
+    caller clears the orders' stock_reserved flag in the same transaction.
+    """
+    quantities = _order_quantities(order_ids)
+    if not quantities:
+        return []
+    Book.objects.filter(id__in=quantities).update(
+        stock_quantity=Case(
+            *[When(id=book_id, then=F('stock_quantity') + quantity)
+              for book_id, quantity in quantities.items()],
+            default=F('stock_quantity'),
+            output_field=PositiveIntegerField(),
+        ),
+        updated_at=Now(),
+    )
+    book_ids = list(quantities)
+    facets.stock_restored(quantities)
+    transaction.on_commit(lambda: catalog_cache.invalidate_books(book_ids))
+    return book_ids
+
+
+def apply_payment_event(data):
+    """
+    Apply a provider's payment callback to its transaction and order.
+    Must be called inside a transaction.
+
+    A payment for an order whose stock can no longer be deducted is still
+    recorded: the customer has been charged. The order is set to
+    needs_review, with nothing deducted, and logged as an error for staff
+    to restock or refund.
+    """
+    reference = data.get('reference')
+    status_val = data.get('status') # successful, failed
+
+    try:
+        txn = PaymentTransaction.objects.select_related('order').get(reference=reference)
+    except PaymentTransaction.DoesNotExist:
+        raise TransactionNotFound("Transaction not found")
+    txn.raw_response = data
+    order = txn.order
+
+    if status_val == 'successful':
+        txn.status = 'successful'
+        txn.save(update_fields=['status', 'raw_response'])
+
+        # Flip the order to paid with conditional UPDATEs, so only one of
+        # several concurrent callbacks counts it. Stock reserved at checkout
+        # is kept; orders whose stock isn't held (older orders, or orders
+        # that expired or failed first) have it deducted now.
+        unpaid = Order.objects.filter(pk=order.pk).exclude(payment_status='paid')
+        flip = {'payment_status': 'paid', 'payment_reference': reference, 'updated_at': Now()}
+        if unpaid.filter(stock_reserved=True).update(**flip):
+            reporting.record_paid(order)
+        elif unpaid.filter(stock_reserved=False).update(stock_reserved=True, **flip):
+            try:
+                # A savepoint, so a partial deduction is rolled back alone.
+                with transaction.atomic():
+                    deduct_stock_for_order(order)
+            except InsufficientStock as e:
+                Order.objects.filter(pk=order.pk).update(
+                    payment_status='needs_review', stock_reserved=False, updated_at=Now()
+                )
+                logger.error("Order %s was paid (reference %s) but needs review: %s", order.pk, reference, e)
+            else:
+                reporting.record_paid(order)
+    else:
+        txn.status = 'failed'
+        txn.save(update_fields=['status', 'raw_response'])
+
+        # Conditional UPDATEs again, on the row rather than the order loaded
+        # above: of several concurrent callbacks, only the one that flips a
+        # paid order takes it out of the rollup, and only the one that
+        # clears the reservation puts the stock back.
+        orders = Order.objects.filter(pk=order.pk)
+        paid = orders.filter(payment_status='paid')
+        failed = {'payment_status': 'failed', 'stock_reserved': False, 'updated_at': Now()}
+        released = paid.filter(stock_reserved=True).update(**failed)
+        if released or paid.update(**failed):
+            reporting.record_paid(order, sign=-1)
+        else:
+            unpaid = orders.exclude(payment_status='paid')
+            released = unpaid.filter(stock_reserved=True).update(**failed)
+            unpaid.update(payment_status='failed', updated_at=Now())
+        if released:
+            release_stock_for_orders([order.pk])
@@ -1,3 +1,389 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from books.models import Book, BookFacet, Category
+from config import throttling
+from orders.models import DailySales, Order, OrderItem
+from orders import retention
+from . import worker
+from .models import PaymentTransaction, WebhookEvent
+from .services import apply_payment_event
+
+
+def checkout(client, items):
+    return client.post('/api/checkout/initiate/', {
+        'items': [{'book_id': str(book.pk), 'quantity': quantity} for book, quantity in items],
+        'email': 'buyer@example.com', 'provider': 'paystack',
+    }, format='json')
+
+
+class CheckoutTests(TestCase):
+    """PaymentInitiateView reserves stock while the cart's rows are locked."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Fiction', slug='fiction')
+        cls.books = [
+            Book.objects.create(
+                title=f'Book {i}', author='An Author', description='Text', price=Decimal('10.00'),
+                category=category, stock_quantity=5,
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        throttling.clear()
+        self.client = APIClient()
+
+    def stock(self, book):
+        book.refresh_from_db()
+        return book.stock_quantity
+
+    def pay(self, reference, status='successful'):
+        with transaction.atomic():
+            apply_payment_event({'reference': reference, 'status': status})
+
+    def test_checkout_reserves_stock(self):
+        response = checkout(self.client, [(self.books[0], 2), (self.books[1], 1)])
+        self.assertEqual(response.status_code, 201, response.data)
+        order = Order.objects.get(pk=response.data['order_id'])
+        self.assertTrue(order.stock_reserved)
+        self.assertEqual((order.total_amount, order.payment_status), (Decimal('30.00'), 'pending'))
+        self.assertEqual([self.stock(book) for book in self.books], [3, 4, 5])
+
+        # Payment keeps the reservation instead of deducting again.
+        self.pay(response.data['reference'])
+        self.assertEqual([self.stock(book) for book in self.books], [3, 4, 5])
+        order.refresh_from_db()
+        self.assertEqual(order.payment_status, 'paid')
+
+    def test_failed_payment_releases_stock(self):
+        response = checkout(self.client, [(self.books[0], 5)])
+        self.assertEqual(self.stock(self.books[0]), 0)
+        self.assertTrue(BookFacet.objects.filter(in_stock=False, count=1).exists())
+
+        self.pay(response.data['reference'], status='failed')
+        self.pay(response.data['reference'], status='failed')  # Released once.
+        self.assertEqual(self.stock(self.books[0]), 5)
+        self.assertFalse(BookFacet.objects.filter(in_stock=False).exists())
+
+        # A late success takes the stock again.
+        self.pay(response.data['reference'])
+        self.assertEqual(self.stock(self.books[0]), 0)
+
+    def test_expired_orders_release_stock(self):
+        response = checkout(self.client, [(self.books[0], 2)])
+        Order.objects.filter(pk=response.data['order_id']).update(created_at='2000-01-01T00:00:00Z')
+        self.assertEqual(retention.expire_stale(), 1)
+        self.assertEqual(self.stock(self.books[0]), 5)
+        self.assertFalse(Order.objects.get(pk=response.data['order_id']).stock_reserved)
+
+    def test_unknown_book(self):
+        missing = Book(pk='00000000-0000-0000-0000-000000000000')
+        response = checkout(self.client, [(self.books[0], 1), (missing, 1)])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('not found', response.data['error'])
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.stock(self.books[0]), 5)
+
+    def test_insufficient_stock(self):
+        response = checkout(self.client, [(self.books[0], 1), (self.books[1], 6)])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Insufficient stock for Book 1')
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.stock(self.books[0]), 5)
+
+    def test_query_count_does_not_grow_with_the_cart(self):
+        counts = []
+        for items in ([(self.books[0], 1)], [(book, 1) for book in self.books]):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(checkout(self.client, items).status_code, 201)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class PaymentStockTests(TestCase):
+    """Payments for orders whose stock isn't reserved deduct it with a guarded UPDATE."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Fiction', slug='fiction')
+        cls.books = [
+            Book.objects.create(
+                title=f'Book {i}', author='An Author', description='Text', price=Decimal('10.00'),
+                category=category, stock_quantity=stock,
+            )
+            for i, stock in enumerate((5, 2))
+        ]
+
+    def order(self, *lines):
+        order = Order.objects.create(email='buyer@example.com', total_amount=Decimal('10.00'))
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, book=book, quantity=quantity, price=book.price, subtotal=book.price * quantity)
+            for book, quantity in lines
+        ])
+        PaymentTransaction.objects.create(order=order, provider='paystack', reference=f'ref-{order.pk}')
+        return order
+
+    def pay(self, order):
+        with transaction.atomic():
+            apply_payment_event({'reference': f'ref-{order.pk}', 'status': 'successful'})
+        order.refresh_from_db()
+        return order
+
+    def stocks(self):
+        return [Book.objects.get(pk=book.pk).stock_quantity for book in self.books]
+
+    def test_exact_stock_goes_to_zero(self):
+        order = self.pay(self.order((self.books[0], 5), (self.books[1], 2)))
+        self.assertEqual((order.payment_status, order.stock_reserved), ('paid', True))
+        self.assertEqual(self.stocks(), [0, 0])
+        self.assertEqual(BookFacet.objects.get(in_stock=False).count, 2)
+        self.assertEqual(DailySales.objects.get().orders, 1)
+
+    def test_duplicate_books_are_summed(self):
+        order = self.pay(self.order((self.books[0], 2), (self.books[0], 3)))
+        self.assertEqual(order.payment_status, 'paid')
+        self.assertEqual(self.stocks(), [0, 2])
+
+        # 3 + 3 is more than the 5 in stock, though each line fits.
+        Book.objects.filter(pk=self.books[0].pk).update(stock_quantity=5)
+        with self.assertLogs('payments.services', 'ERROR'):
+            order = self.pay(self.order((self.books[0], 3), (self.books[0], 3)))
+        self.assertEqual(order.payment_status, 'needs_review')
+        self.assertEqual(self.stocks(), [5, 2])
+
+    def test_partial_stock_needs_review(self):
+        order = self.order((self.books[0], 2), (self.books[1], 3))
+        with self.assertLogs('payments.services', 'ERROR') as logs:
+            order = self.pay(order)
+        self.assertIn(str(order.pk), logs.output[0])
+        # The payment is kept, but no stock is taken, not even the book that had enough.
+        self.assertEqual((order.payment_status, order.stock_reserved), ('needs_review', False))
+        self.assertEqual(PaymentTransaction.objects.get(order=order).status, 'successful')
+        self.assertEqual(self.stocks(), [5, 2])
+        self.assertFalse(DailySales.objects.exists())
+
+        # A redelivery once the book is restocked completes the order.
+        Book.objects.filter(pk=self.books[1].pk).update(stock_quantity=3)
+        order = self.pay(order)
+        self.assertEqual(order.payment_status, 'paid')
+        self.assertEqual(self.stocks(), [3, 0])
+
+
+    def fail(self, order):
+        with transaction.atomic():
+            apply_payment_event({'reference': f'ref-{order.pk}', 'status': 'failed'})
+        order.refresh_from_db()
+        return order
+
+    def test_failure_after_payment_is_counted_once(self):
+        order = self.pay(self.order((self.books[0], 2)))
+        self.assertEqual(self.stocks(), [3, 2])
+        # A callback that loaded the order while it was still paid, racing
+        # the first failure: the conditional UPDATE only matches once.
+        stale = PaymentTransaction.objects.select_related('order').get(order=order)
+        order = self.fail(order)
+        with mock.patch.object(QuerySet, 'get', return_value=stale), transaction.atomic():
+            apply_payment_event({'reference': f'ref-{order.pk}', 'status': 'failed'})
+        order.refresh_from_db()
+        self.assertEqual((order.payment_status, order.stock_reserved), ('failed', False))
+        self.assertEqual(self.stocks(), [5, 2])
+        day = DailySales.objects.get()
+        self.assertEqual((day.orders, day.units, day.revenue), (0, 0, Decimal('0.00')))
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """TransactionTestCase, since each checkout runs on its own thread and connection."""
+
+    def setUp(self):
+        throttling.clear()
+        category = Category.objects.create(name='Fiction', slug='fiction')
+        self.book = Book.objects.create(
+            title='Last Copy', author='An Author', description='Text', price=Decimal('10.00'),
+            category=category, stock_quantity=1,
+        )
+
+    def test_only_one_checkout_gets_the_last_copy(self):
+        barrier = threading.Barrier(4)
+        statuses = []
+
+        def attempt():
+            try:
+                barrier.wait()
+                statuses.append(checkout(APIClient(), [(self.book, 1)]).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=attempt) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(statuses), [201, 400, 400, 400])
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.stock_quantity, 0)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(PaymentTransaction.objects.count(), 1)
+
+
+class WebhookTests(TestCase):
+    """PaymentWebhookView deduplicates deliveries and replays failed events."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Fiction', slug='fiction')
+        book = Book.objects.create(
+            title='Book', author='An Author', description='Text', price=Decimal('10.00'),
+            category=category, stock_quantity=5,
+        )
+        cls.order = Order.objects.create(email='buyer@example.com', total_amount=Decimal('10.00'))
+        OrderItem.objects.create(order=cls.order, book=book, quantity=1, price=book.price, subtotal=book.price)
+
+    def setUp(self):
+        throttling.clear()
+        self.client = APIClient()
+
+    def deliver(self, **data):
+        return self.client.post('/api/payments/webhook/paystack/', data, format='json')
+
+    def drain(self):
+        # _process_group(), since process_group() closes the test's connection.
+        for group in worker.claim_batch(100):
+            worker._process_group(group, worker.MAX_ATTEMPTS)
+
+    def test_duplicate_event_id(self):
+        self.assertEqual(self.deliver(event_id='evt_1', reference='ref', status='successful').status_code, 202)
+        response = self.deliver(event_id='evt_1', reference='ref', status='successful')
+        self.assertEqual((response.status_code, response.data['duplicate']), (200, True))
+        # Event ids are per provider.
+        response = self.client.post('/api/payments/webhook/stripe/', {'event_id': 'evt_1'}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(WebhookEvent.objects.count(), 2)
+
+    def test_event_id_falls_back_to_reference_and_status(self):
+        self.assertEqual(self.deliver(reference='ref', status='failed').status_code, 202)
+        self.assertEqual(self.deliver(reference='ref', status='failed').status_code, 200)
+        self.assertEqual(self.deliver(reference='ref', status='successful').status_code, 202)
+        self.assertEqual(
+            sorted(WebhookEvent.objects.values_list('event_id', flat=True)), ['ref:failed', 'ref:successful']
+        )
+
+    def test_concurrent_delivery_hits_the_unique_constraint(self):
+        self.assertEqual(self.deliver(event_id='evt_1', reference='ref').status_code, 202)
+        # As if a concurrent delivery inserted the event after the lookup.
+        with mock.patch.object(QuerySet, 'first', return_value=None):
+            response = self.deliver(event_id='evt_1', reference='ref')
+        self.assertEqual((response.status_code, response.data['duplicate']), (200, True))
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+
+    def test_redelivery_replays_a_failed_event(self):
+        self.deliver(event_id='evt_1', reference='ref', status='successful')
+        with self.assertLogs('payments.worker', 'WARNING'):
+            self.drain()
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.status, event.last_error), ('failed', 'Transaction not found'))
+
+        PaymentTransaction.objects.create(order=self.order, provider='paystack', reference='ref')
+        response = self.deliver(event_id='evt_1', reference='ref', status='successful')
+        self.assertEqual((response.status_code, response.data['replayed']), (202, True))
+        self.drain()
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), ('processed', 1))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.payment_status, 'paid')
+
+    @override_settings(PAYMENT_WEBHOOK_ASYNC=False)
+    def test_redelivery_replays_a_failed_event_inline(self):
+        WebhookEvent.objects.create(
+            provider='paystack', event_id='evt_1', reference='ref', status='failed', attempts=1,
+        )
+        response = self.deliver(event_id='evt_1', reference='ref', status='successful')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(WebhookEvent.objects.get().status, 'failed')
+
+        PaymentTransaction.objects.create(order=self.order, provider='paystack', reference='ref')
+        response = self.deliver(event_id='evt_1', reference='ref', status='successful')
+        self.assertEqual((response.status_code, response.data['replayed']), (200, True))
+        self.assertEqual(WebhookEvent.objects.get().status, 'processed')
+        self.assertEqual(PaymentTransaction.objects.get().status, 'successful')
+
+    def test_replay_command(self):
+        WebhookEvent.objects.create(provider='paystack', event_id='a', status='failed', attempts=8)
+        WebhookEvent.objects.create(provider='paystack', event_id='b', status='processed', attempts=1)
+        call_command('process_webhooks', '--replay', stdout=mock.Mock())
+        self.assertEqual(
+            dict(WebhookEvent.objects.values_list('event_id', 'status')), {'a': 'pending', 'b': 'processed'}
+        )
+        self.assertEqual(WebhookEvent.objects.get(event_id='a').attempts, 0)
+
+
+class WebhookWorkerTests(TestCase):
+    """The worker claims due events with a lease, retries with backoff and prunes."""
+
+    def event(self, reference, **fields):
+        return WebhookEvent.objects.create(
+            provider='paystack', event_id=f'{reference}:{WebhookEvent.objects.count()}',
+            reference=reference, payload={'reference': reference, 'status': 'successful'}, **fields
+        )
+
+    def test_claim_groups_by_reference_and_leases(self):
+        first, other, second = self.event('a'), self.event('b'), self.event('a')
+        self.event('c', next_attempt_at=timezone.now() + timedelta(minutes=1))  # Not due yet.
+
+        groups = worker.claim_batch(10)
+        self.assertEqual(groups, [[first.pk, second.pk], [other.pk]])
+        claimed = WebhookEvent.objects.filter(status='processing')
+        self.assertEqual(claimed.count(), 3)
+        self.assertEqual(len(set(claimed.values_list('claim_token', flat=True))), 1)
+        self.assertGreater(claimed.first().next_attempt_at, timezone.now() + worker.CLAIM_LEASE - timedelta(minutes=1))
+
+        # Leased events aren't claimed again until the lease runs out.
+        self.assertEqual(worker.claim_batch(10), [])
+        WebhookEvent.objects.filter(pk=other.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(worker.claim_batch(10), [[other.pk]])
+        self.assertEqual(WebhookEvent.objects.filter(status='processing').values('claim_token').distinct().count(), 2)
+
+    def test_backoff_delay(self):
+        self.assertEqual(
+            [worker.backoff_delay(attempts).total_seconds() for attempts in (0, 1, 2, 3, 10, 11, 50)],
+            [5, 5, 10, 20, 2560, 3600, 3600],
+        )
+
+    def test_errors_are_retried_until_max_attempts(self):
+        event = self.event('a')
+        with mock.patch('payments.worker.apply_payment_event', side_effect=RuntimeError('boom')):
+            for attempts in range(1, 4):
+                before = timezone.now()
+                with self.assertLogs('payments.worker', 'ERROR'):
+                    self.assertEqual(worker._process_group([event.pk], max_attempts=3), (0, 0, 1))
+                event.refresh_from_db()
+                self.assertEqual((event.attempts, event.last_error), (attempts, 'boom'))
+                if attempts < 3:
+                    self.assertEqual(event.status, 'pending')
+                    self.assertGreaterEqual(event.next_attempt_at, before + worker.backoff_delay(attempts))
+        self.assertEqual(event.status, 'failed')
+
+    def test_prune_deletes_old_processed_events(self):
+        old = timezone.now() - timedelta(days=31)
+        self.event('a', status='processed', processed_at=old)
+        self.event('b', status='processed', processed_at=timezone.now())
+        self.event('c', status='failed')
+        self.event('d')
+        self.assertEqual(worker.prune(batch_size=1), 1)
+        self.assertEqual(sorted(WebhookEvent.objects.values_list('reference', flat=True)), ['b', 'c', 'd'])
+        self.assertEqual(
+            {key: value for key, value in worker.queue_depth().items() if key != 'oldest_pending_age_seconds'},
+            {'pending': 1, 'processing': 0, 'failed': 1},
+        )
@@ -1,8 +1,9 @@
 from django.urls import path
-from .views import PaymentInitiateView, PaymentWebhookView, PaymentConfirmView
+from .views import PaymentInitiateView, PaymentWebhookView, PaymentConfirmView, WebhookQueueView
 
 urlpatterns = [
     path('checkout/initiate/', PaymentInitiateView.as_view(), name='payment_initiate'),
     path('payments/webhook/<str:provider>/', PaymentWebhookView.as_view(), name='payment_webhook'),
+    path('payments/webhook-queue/', WebhookQueueView.as_view(), name='payment_webhook_queue'),
     path('checkout/confirm/', PaymentConfirmView.as_view(), name='payment_confirm'),
 ]
@@ -1,9 +1,12 @@
 from rest_framework import views, status, permissions
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.conf import settings
+from django.utils import timezone
 from .serializers import PaymentInitSerializer
-from .models import PaymentTransaction
+from .models import PaymentTransaction, WebhookEvent
+from .services import CheckoutError, InsufficientStock, TransactionNotFound, apply_payment_event, deduct_stock
+from .worker import queue_depth, replay
 from orders.models import Order, OrderItem
 from books.models import Book
 from accounts.models import User
@@ -12,9 +15,18 @@ import uuid
 class PaymentInitiateView(views.APIView):
     """
     API view to initiate a payment.
-    Validates stock, creates pending order, and returns payment URL.
+    Validates stock, reserves it, creates a pending order, and returns the
+    payment URL. The cart's books are row-locked while their stock is
+    checked and deducted, so two checkouts can't both take the last copy.
+    The stock is released if the payment fails or the order expires (see
+    payments.services, orders.retention).
+    Runs a constant number of queries regardless of cart size: the cart's
+    books are fetched and row-locked in one query, their stock deducted in
+    one UPDATE, and the order items written with a single bulk insert.
+    Rate limited per client (see config.throttling).
     """
     permission_classes = (permissions.AllowAny,)
+    throttle_scope = 'checkout'
 
     def post(self, request):
         serializer = PaymentInitSerializer(data=request.data)
@@ -23,42 +35,60 @@ class PaymentInitiateView(views.APIView):
             email = serializer.validated_data['email']
             provider = serializer.validated_data['provider']
             
-            # Check stock and calculate total
-            total_amount = 0
-            order_items = []
+            # Merge repeated lines for the same book into one quantity
+            quantities = {}
+            for item in items_data:
+                quantities[item['book_id']] = quantities.get(item['book_id'], 0) + item['quantity']
             
             try:
                 with transaction.atomic():
+                    # Lock every book in the cart with a single query. Locking in
+                    # primary key order keeps concurrent checkouts from deadlocking.
+                    books = {
+                        book.id: book
+                        for book in Book.objects.select_for_update().filter(
+                            id__in=quantities.keys()
+                        ).order_by('id')
+                    }
+
+                    # Check stock and calculate total in memory
+                    total_amount = 0
+                    order_items = []
+                    for book_id, quantity in quantities.items():
+                        book = books.get(book_id)
+                        if book is None:
+                            raise CheckoutError(f"Book {book_id} not found")
+                        if book.stock_quantity < quantity:
+                            raise CheckoutError(f"Insufficient stock for {book.title}")
+                        
+                        subtotal = book.price * quantity
+                        total_amount += subtotal
+                        order_items.append(OrderItem(
+                            book=book,
+                            quantity=quantity,
+                            price=book.price,
+                            subtotal=subtotal
+                        ))
+
                     # Create Order
-                    user = None
+                    user_id = None
                     if request.user.is_authenticated:
-                        user = request.user
+                        user_id = request.user.pk
                     
+                    # Reserve the stock while the rows are still locked.
+                    deduct_stock(quantities)
+
                     order = Order.objects.create(
-                        user=user,
+                        user_id=user_id,
                         email=email,
                         payment_method=provider,
-                        total_amount=0 # Will update later
+                        total_amount=total_amount,
+                        stock_reserved=True,
                     )
 
-                    for item in items_data:
-                        book = get_object_or_404(Book, id=item['book_id'])
-                        if book.stock_quantity < item['quantity']:
-                            raise Exception(f"Insufficient stock for {book.title}")
-                        
-                        subtotal = book.price * item['quantity']
-                        total_amount += subtotal
-                        
-                        OrderItem.objects.create(
-                            order=order,
-                            book=book,
-                            quantity=item['quantity'],
-                            price=book.price,
-                            subtotal=subtotal
-                        )
-                    
-                    order.total_amount = total_amount
-                    order.save()
+                    for order_item in order_items:
+                        order_item.order = order
+                    OrderItem.objects.bulk_create(order_items)
 
                     # Create PaymentTransaction
                     reference = str(uuid.uuid4())
@@ -78,7 +108,7 @@ class PaymentInitiateView(views.APIView):
                         "order_id": order.id
                     }, status=status.HTTP_201_CREATED)
 
-            except Exception as e:
+            except (CheckoutError, InsufficientStock) as e:
                 return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -86,51 +116,94 @@ class PaymentInitiateView(views.APIView):
 class PaymentWebhookView(views.APIView):
     """
     API view to handle payment webhooks.
-    Updates transaction status and order status (and stock) upon success.
+    Deliveries are deduplicated on (provider, event id) via WebhookEvent;
+    a redelivery of an event that failed permanently is replayed.
+
+    By default the event is only queued and 202 is returned; the
+    process_webhooks worker updates transaction status and order status
+    (and stock) upon success. With PAYMENT_WEBHOOK_ASYNC disabled the event
+    is applied inline and 200 is returned, or 404 if its transaction is
+    unknown.
+    Rate limited per client (see config.throttling).
     """
     permission_classes = (permissions.AllowAny,)
+    throttle_scope = 'payment_webhook'
 
     def post(self, request, provider):
-        # Simulate webhook processing
         data = request.data
-        reference = data.get('reference')
-        status_val = data.get('status') # successful, failed
+        event_id = WebhookEvent.event_id_for(data)
+
+        # Fast path for provider retries: one indexed lookup answers every
+        # redelivery of an event we've already accepted.
+        existing = WebhookEvent.objects.filter(provider=provider, event_id=event_id)
+        existing_status = existing.values_list('status', flat=True).first()
+        if existing_status == 'failed':
+            return self.replay_failed(existing, data)
+        if existing_status is not None:
+            return Response({"status": "received", "duplicate": True}, status=status.HTTP_200_OK)
+
+        event = WebhookEvent(
+            provider=provider,
+            event_id=event_id,
+            reference=data.get('reference') or '',
+            payload=data
+        )
 
         try:
-            txn = PaymentTransaction.objects.get(reference=reference)
-            txn.raw_response = data
-            
-            if status_val == 'successful':
-                txn.status = 'successful'
-                txn.save()
-                
-                order = txn.order
-                if order.payment_status != 'paid':
-                    order.payment_status = 'paid'
-                    order.payment_reference = reference
-                    order.save()
-                    
-                    # Reduce stock
-                    for item in order.items.all():
-                        book = item.book
-                        if book:
-                            book.stock_quantity -= item.quantity
-                            book.save()
-            else:
-                txn.status = 'failed'
-                txn.save()
-                order = txn.order
-                order.payment_status = 'failed'
-                order.save()
+            with transaction.atomic():
+                if not settings.PAYMENT_WEBHOOK_ASYNC:
+                    event.status = 'processed'
+                    event.attempts = 1
+                    event.processed_at = timezone.now()
+                # A concurrent delivery of the same event fails the unique
+                # constraint here.
+                event.save(force_insert=True)
+
+                if settings.PAYMENT_WEBHOOK_ASYNC:
+                    return Response({"status": "queued"}, status=status.HTTP_202_ACCEPTED)
+
+                apply_payment_event(data)
 
             return Response({"status": "received"}, status=status.HTTP_200_OK)
 
-        except PaymentTransaction.DoesNotExist:
-            return Response({"error": "Transaction not found"}, status=status.HTTP_404_NOT_FOUND)
+        except IntegrityError:
+            return Response({"status": "received", "duplicate": True}, status=status.HTTP_200_OK)
+        except TransactionNotFound as e:
+            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+
+    def replay_failed(self, existing, data):
+        """
+        Redeliveries of an event that failed permanently replay it (e.g. a
+        callback that arrived before its transaction existed).
+        """
+        try:
+            with transaction.atomic():
+                if not replay(existing):
+                    # Replayed by a concurrent delivery.
+                    return Response({"status": "received", "duplicate": True}, status=status.HTTP_200_OK)
+                if settings.PAYMENT_WEBHOOK_ASYNC:
+                    return Response({"status": "queued", "replayed": True}, status=status.HTTP_202_ACCEPTED)
+                existing.update(status='processed', attempts=1, processed_at=timezone.now())
+                apply_payment_event(data)
+            return Response({"status": "received", "replayed": True}, status=status.HTTP_200_OK)
+        except TransactionNotFound as e:
+            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+
+class WebhookQueueView(views.APIView):
+    """
+    API view exposing the webhook queue depth.
+    Admin only.
+    """
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        return Response(queue_depth())
 
 class PaymentConfirmView(views.APIView):
     """
     API view to confirm payment status for frontend redirection.
+    Always reads from the primary database, so a transaction created a
+    moment ago by PaymentInitiateView is found even if replicas lag.
     """
     permission_classes = (permissions.AllowAny,)
 
@@ -0,0 +1,248 @@
+"""
+Database-backed queue for payment webhook events.
+
+PaymentWebhookView stores each event as a pending WebhookEvent and returns
+immediately; the process_webhooks management command drains the queue with
+a pool of threads or processes. No broker is needed: workers claim due
+events with a conditional UPDATE stamped with a claim token, so several
+workers (or several worker processes on different hosts) never process the
+same event twice. A claim is a lease: if a worker dies mid-batch, its
+events become due again once the lease expires.
+
+Claimed events are grouped by transaction reference and each group is
+applied in one database transaction, in arrival order, so a burst of
+callbacks for one order costs a single commit. Failures are retried with
+exponential backoff until max_attempts, after which the event is marked
+failed. Failed events are replayed by replay(): when the provider
+redelivers them (see PaymentWebhookView), from the admin, or with
+`process_webhooks --replay`.
+
+Processed events are kept for PAYMENT_WEBHOOK_RETENTION_DAYS, as they are
+what deduplicates redeliveries, then deleted by prune() (`manage.py
+prune_webhooks`).
+"""
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import WebhookEvent
+from .services import PermanentWebhookError, apply_payment_event
+
+logger = logging.getLogger(__name__)
+
+CLAIM_LEASE = timedelta(minutes=5)
+BACKOFF_BASE = timedelta(seconds=5)
+BACKOFF_MAX = timedelta(hours=1)
+MAX_ATTEMPTS = 8
+QUEUED_STATUSES = ('pending', 'processing', 'failed')
+
+
+def backoff_delay(attempts):
+    """Exponential backoff: 5s, 10s, 20s, ... capped at one hour."""
+    # The exponent is bounded too: the cap is reached long before 2 ** 20,
+    # and timedelta overflows for large --max-attempts.
+    return min(BACKOFF_BASE * (2 ** min(max(attempts - 1, 0), 20)), BACKOFF_MAX)
+
+
+def claim(model, batch_size, lease=CLAIM_LEASE):
+    """
+    Claim up to batch_size due rows of a queue model (one with status,
+    next_attempt_at and claim_token fields, like WebhookEvent and
+    images.ImageJob) for `lease`. Returns the claim token the claimed rows
+    are stamped with, or None if none were due.
+    """
+    now = timezone.now()
+    due = list(
+        model.objects.filter(
+            status__in=['pending', 'processing'], next_attempt_at__lte=now
+        ).order_by('next_attempt_at').values_list('id', flat=True)[:batch_size]
+    )
+    if not due:
+        return None
+
+    # Only rows still due at UPDATE time are claimed, so a concurrent worker
+    # that selected the same ids gets the ones we didn't.
+    token = uuid.uuid4()
+    model.objects.filter(
+        id__in=due, status__in=['pending', 'processing'], next_attempt_at__lte=now
+    ).update(status='processing', claim_token=token, next_attempt_at=now + lease)
+    return token
+
+
+def claim_batch(batch_size):
+    """
+    Claim up to batch_size due events and return their ids grouped by
+    reference, oldest first.
+    """
+    token = claim(WebhookEvent, batch_size)
+    if token is None:
+        return []
+
+    groups = OrderedDict()
+    claimed = WebhookEvent.objects.filter(claim_token=token).order_by('received_at')
+    for event_id, reference in claimed.values_list('id', 'reference'):
+        groups.setdefault(reference, []).append(event_id)
+    return list(groups.values())
+
+
+def process_group(event_ids, max_attempts=MAX_ATTEMPTS):
+    """
+    Apply a group of claimed events for one reference in a single
+    transaction. Returns a (processed, failed, retried) tuple of counts.
+    """
+    try:
+        return _process_group(event_ids, max_attempts)
+    finally:
+        close_old_connections()
+
+
+def _process_group(event_ids, max_attempts):
+    events = list(WebhookEvent.objects.filter(id__in=event_ids).order_by('received_at'))
+    processed, failed = [], {}
+    try:
+        with transaction.atomic():
+            for event in events:
+                try:
+                    with transaction.atomic():
+                        apply_payment_event(event.payload or {})
+                    processed.append(event.id)
+                except PermanentWebhookError as e:
+                    failed[event.id] = str(e)
+
+            now = timezone.now()
+            WebhookEvent.objects.filter(id__in=processed).update(
+                status='processed', processed_at=now, claim_token=None,
+                attempts=F('attempts') + 1, last_error=''
+            )
+            for event_id, error in failed.items():
+                WebhookEvent.objects.filter(id=event_id).update(
+                    status='failed', claim_token=None,
+                    attempts=F('attempts') + 1, last_error=error
+                )
+    except Exception as e:
+        logger.exception("Webhook batch for %d event(s) failed; scheduling retry", len(events))
+        _schedule_retry(events, e, max_attempts)
+        return 0, 0, len(events)
+
+    for event_id, error in failed.items():
+        logger.warning("Webhook event %s failed permanently: %s", event_id, error)
+    return len(processed), len(failed), 0
+
+
+def _schedule_retry(events, error, max_attempts):
+    now = timezone.now()
+    for event in events:
+        attempts = event.attempts + 1
+        if attempts >= max_attempts:
+            WebhookEvent.objects.filter(id=event.id).update(
+                status='failed', attempts=attempts, claim_token=None, last_error=str(error)
+            )
+        else:
+            WebhookEvent.objects.filter(id=event.id).update(
+                status='pending', attempts=attempts, claim_token=None, last_error=str(error),
+                next_attempt_at=now + backoff_delay(attempts)
+            )
+
+
+def replay(events):
+    """
+    Queue the failed events in a WebhookEvent queryset again, with a fresh
+    attempt count. Returns how many were queued.
+    """
+    return events.filter(status='failed').update(
+        status='pending', attempts=0, claim_token=None, last_error='', next_attempt_at=timezone.now()
+    )
+
+
+def queue_depth():
+    """
+    Return counts of pending, processing and failed events and the age of
+    the oldest pending event. Processed events, the bulk of the table, are
+    not counted.
+    """
+    counts = dict.fromkeys(QUEUED_STATUSES, 0)
+    queued = WebhookEvent.objects.filter(status__in=QUEUED_STATUSES)
+    for row in queued.values('status').annotate(count=Count('id')):
+        counts[row['status']] = row['count']
+
+    oldest = WebhookEvent.objects.filter(status__in=['pending', 'processing']).aggregate(
+        oldest=Min('received_at')
+    )['oldest']
+    counts['oldest_pending_age_seconds'] = (
+        round((timezone.now() - oldest).total_seconds(), 3) if oldest else 0
+    )
+    return counts
+
+
+def prune(batch_size=5000, pause=0.0):
+    """
+    Delete events processed more than PAYMENT_WEBHOOK_RETENTION_DAYS ago,
+    batch_size at a time so each transaction stays short. Returns how many.
+    """
+    cutoff = timezone.now() - timedelta(days=settings.PAYMENT_WEBHOOK_RETENTION_DAYS)
+    return delete_in_batches(
+        WebhookEvent.objects.filter(status='processed', processed_at__lt=cutoff), batch_size, pause
+    )
+
+
+def delete_in_batches(queryset, batch_size=5000, pause=0.0):
+    """
+    Delete the rows of a queue queryset, oldest processed first, batch_size
+    at a time with `pause` seconds between batches. Returns how many.
+    """
+    pruned = 0
+    while True:
+        ids = list(queryset.order_by('processed_at').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return pruned
+        pruned += queryset.model.objects.filter(id__in=ids).delete()[0]
+        if pause:
+            time.sleep(pause)
+
+
+def _init_process():
+    django.setup()
+
+
+def run(workers=4, pool='thread', batch_size=100, poll_interval=1.0,
+        max_attempts=MAX_ATTEMPTS, once=False):
+    """
+    Drain the queue until interrupted, or until it is empty when once=True.
+    """
+    if pool == 'process':
+        # Forked children must not share the parent's database sockets.
+        connections.close_all()
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_process)
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='webhook-worker')
+
+    totals = [0, 0, 0]
+    with executor:
+        while True:
+            groups = claim_batch(batch_size)
+            if not groups:
+                if once:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            futures = [executor.submit(process_group, group, max_attempts) for group in groups]
+            batch = [0, 0, 0]
+            for future in futures:
+                for i, count in enumerate(future.result()):
+                    batch[i] += count
+                    totals[i] += count
+            logger.info(
+                "Webhook batch of %d event(s) in %d group(s): processed=%d failed=%d retried=%d",
+                sum(len(group) for group in groups), len(groups), *batch
+            )
+    return tuple(totals)
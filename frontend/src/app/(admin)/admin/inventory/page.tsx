@@ -3,7 +3,7 @@
 import { useBooks, Book } from "@/context/BookContext";
 import { Plus, Pencil, Trash2, Search, X, Check } from "lucide-react";
 import Image from "next/image";
-import { useState } from "react";
+import { useState, useEffect } from "react";
 import { DEFAULT_BOOK_IMAGE } from "@/lib/constants";
 
 const InventoryImage = ({ src, alt, sizes = "32px" }: { src: string; alt: string; sizes?: string }) => {
@@ -22,9 +22,13 @@ const InventoryImage = ({ src, alt, sizes = "32px" }: { src: string; alt: string
 };
 
 export default function InventoryPage() {
-  const { books, categories, addBook, updateBook, deleteBook, addCategory } = useBooks();
+  const {
+    books, categories, addBook, updateBook, deleteBook, addCategory,
+    setBookFilters, hasMoreBooks, isLoadingBooks, loadMoreBooks
+  } = useBooks();
   const [searchQuery, setSearchQuery] = useState("");
   const [selectedCategory, setSelectedCategory] = useState("All Categories");
+  const categorySlug = categories.find(c => c.name === selectedCategory)?.slug;
   
   // Modal States
   const [isAddModalOpen, setIsAddModalOpen] = useState(false);
@@ -35,12 +39,16 @@ export default function InventoryPage() {
   const [currentBook, setCurrentBook] = useState<Partial<Omit<Book, "image"> & { image?: File | string }>>({});
   const [newCategory, setNewCategory] = useState("");
 
-  const filteredBooks = books.filter((book) => {
-    const matchesSearch = book.title.toLowerCase().includes(searchQuery.toLowerCase()) || 
-                          book.author.toLowerCase().includes(searchQuery.toLowerCase());
-    const matchesCategory = selectedCategory === "All Categories" || book.category === selectedCategory;
-    return matchesSearch && matchesCategory;
-  });
+  // Filtering happens server-side, so matches beyond the loaded pages show up.
+  // Searches are rate limited, so wait for a pause in typing.
+  useEffect(() => {
+    const timer = setTimeout(() => {
+      setBookFilters({ search: searchQuery.trim() || undefined, category: categorySlug });
+    }, 300);
+    return () => clearTimeout(timer);
+  }, [searchQuery, categorySlug, setBookFilters]);
+
+  useEffect(() => () => setBookFilters({}), [setBookFilters]);
 
   const handleAddBook = (e: React.FormEvent) => {
     e.preventDefault();
@@ -153,14 +161,14 @@ export default function InventoryPage() {
               </tr>
             </thead>
             <tbody className="[&_tr:last-child]:border-0">
-              {filteredBooks.length === 0 ? (
+              {books.length === 0 ? (
                 <tr>
                   <td colSpan={5} className="p-8 text-center text-muted-foreground">
                     No books found matching your criteria.
                   </td>
                 </tr>
               ) : (
-                filteredBooks.map((book) => (
+                books.map((book) => (
                   <tr key={book.id} className="border-b transition-colors hover:bg-muted/50">
                     <td className="p-4 align-middle font-medium">
                       <div className="flex items-center gap-3">
@@ -193,6 +201,17 @@ export default function InventoryPage() {
             </tbody>
           </table>
         </div>
+        {hasMoreBooks && (
+          <div className="flex justify-center border-t p-4">
+            <button
+              onClick={loadMoreBooks}
+              disabled={isLoadingBooks}
+              className="border rounded-md px-4 py-2 text-sm font-medium hover:bg-accent bg-background disabled:opacity-50"
+            >
+              {isLoadingBooks ? "Loading..." : "Load more"}
+            </button>
+          </div>
+        )}
       </div>
 
       {/* Add Book Modal */}
@@ -1,8 +1,8 @@
 "use client";
 
 import { Search, Eye, Loader2 } from "lucide-react";
-import { useEffect, useState } from "react";
-import api from "@/lib/api";
+import { useState } from "react";
+import { usePages } from "@/lib/usePages";
 
 interface Order {
   id: string;
@@ -13,25 +13,11 @@ interface Order {
 }
 
 export default function OrdersPage() {
-  const [orders, setOrders] = useState<Order[]>([]);
-  const [isLoading, setIsLoading] = useState(true);
+  // One page of orders at a time; "Load more" fetches the next.
+  const { items: orders, isLoading, hasMore, loadMore } = usePages<Order>("/orders/");
   const [searchQuery, setSearchQuery] = useState("");
   const [statusFilter, setStatusFilter] = useState("All Statuses");
 
-  useEffect(() => {
-    const fetchOrders = async () => {
-      try {
-        const response = await api.get("/orders/");
-        setOrders(response.data);
-      } catch (error) {
-        console.error("Failed to fetch orders", error);
-      } finally {
-        setIsLoading(false);
-      }
-    };
-    fetchOrders();
-  }, []);
-
   const filteredOrders = orders.filter(order => {
     const matchesSearch = order.id.toLowerCase().includes(searchQuery.toLowerCase()) || 
                           order.email.toLowerCase().includes(searchQuery.toLowerCase());
@@ -82,7 +68,7 @@ export default function OrdersPage() {
               </tr>
             </thead>
             <tbody className="[&_tr:last-child]:border-0">
-              {isLoading ? (
+              {isLoading && orders.length === 0 ? (
                 <tr>
                   <td colSpan={6} className="p-8 text-center">
                     <Loader2 className="h-6 w-6 animate-spin mx-auto text-muted-foreground" />
@@ -125,6 +111,17 @@ export default function OrdersPage() {
             </tbody>
           </table>
         </div>
+        {hasMore && (
+          <div className="flex justify-center border-t p-4">
+            <button
+              onClick={loadMore}
+              disabled={isLoading}
+              className="border rounded-md px-4 py-2 text-sm font-medium hover:bg-accent bg-background disabled:opacity-50"
+            >
+              {isLoading ? "Loading..." : "Load more"}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );
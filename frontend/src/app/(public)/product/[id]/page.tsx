@@ -12,9 +12,18 @@ import { DEFAULT_BOOK_IMAGE } from "@/lib/constants";
 
 export default function ProductPage() {
   const params = useParams();
-  const { books } = useBooks();
+  const { books, fetchBook, isLoadingBooks } = useBooks();
   const book = books.find((b) => b.id === params.id);
   const [imgSrc, setImgSrc] = useState<string>("");
+  const [isFetching, setIsFetching] = useState(false);
+
+  // Only the first page of books is loaded up front; fetch this one directly
+  // if it isn't among them.
+  useEffect(() => {
+    if (book || isLoadingBooks || typeof params.id !== "string") return;
+    setIsFetching(true);
+    fetchBook(params.id).finally(() => setIsFetching(false));
+  }, [book, isLoadingBooks, params.id, fetchBook]);
 
   useEffect(() => {
     if (book) {
@@ -22,6 +31,14 @@ export default function ProductPage() {
     }
   }, [book]);
 
+  if (!book && (isLoadingBooks || isFetching)) {
+    return (
+      <div className="container mx-auto px-4 py-20 text-center text-muted-foreground">
+        Loading...
+      </div>
+    );
+  }
+
   if (!book) {
     return (
       <div className="container mx-auto px-4 py-20 text-center">
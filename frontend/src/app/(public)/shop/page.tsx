@@ -1,6 +1,6 @@
 "use client";
 
-import { useState, Suspense } from "react";
+import { useState, useEffect, Suspense } from "react";
 import { BookCard } from "@/components/ui/BookCard";
 import { Filter, ChevronDown } from "lucide-react";
 import { useSearchParams } from "next/navigation";
@@ -23,22 +23,32 @@ function ShopContent() {
   const [minPrice, setMinPrice] = useState<number | "">("");
   const [maxPrice, setMaxPrice] = useState<number | "">("");
 
-  const { books, categories: contextCategories } = useBooks();
+  const {
+    books, categories: contextCategories, setBookFilters, hasMoreBooks, isLoadingBooks, loadMoreBooks
+  } = useBooks();
   const categories = ["All", ...contextCategories.map(c => c.name)];
+  const categorySlug = contextCategories.find(c => c.name === selectedCategory)?.slug;
 
   const toggleSection = (section: keyof typeof expandedSections) => {
     setExpandedSections(prev => ({ ...prev, [section]: !prev[section] }));
   };
 
-  const filteredBooks = books.filter((book) => {
-    const matchesCategory = selectedCategory === "All" || book.category === selectedCategory;
-    const matchesSearch = book.title.toLowerCase().includes(searchQuery) || 
-                          book.author.toLowerCase().includes(searchQuery);
-    const matchesMinPrice = minPrice === "" || book.price >= minPrice;
-    const matchesMaxPrice = maxPrice === "" || book.price <= maxPrice;
-    
-    return matchesCategory && matchesSearch && matchesMinPrice && matchesMaxPrice;
-  });
+  // Filtering happens server-side, so matches beyond the loaded pages show up.
+  // Wait for a pause in typing prices before asking for a new listing.
+  useEffect(() => {
+    const timer = setTimeout(() => {
+      setBookFilters({
+        search: searchQuery || undefined,
+        category: categorySlug,
+        min_price: minPrice === "" ? undefined : minPrice,
+        max_price: maxPrice === "" ? undefined : maxPrice,
+      });
+    }, 300);
+    return () => clearTimeout(timer);
+  }, [searchQuery, categorySlug, minPrice, maxPrice, setBookFilters]);
+
+  // Other pages list the whole catalog.
+  useEffect(() => () => setBookFilters({}), [setBookFilters]);
 
   return (
     <div className="container mx-auto px-4 py-8 md:py-12 md:px-6">
@@ -54,7 +64,7 @@ function ShopContent() {
                {isFiltersOpen ? "Hide Filters" : "Filter Books"}
              </button>
              <div className="bg-muted px-4 py-3 rounded-xl text-sm font-medium">
-               {filteredBooks.length} results
+               {books.length} results
              </div>
            </div>
            
@@ -202,16 +212,32 @@ function ShopContent() {
           </div>
 
           <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 gap-6">
-            {filteredBooks.map((book) => (
+            {books.map((book) => (
               <BookCard key={book.id} {...book} />
             ))}
           </div>
 
-          {filteredBooks.length === 0 && (
+          {hasMoreBooks && (
+            <div className="flex justify-center mt-10">
+              <button
+                onClick={loadMoreBooks}
+                disabled={isLoadingBooks}
+                className="border rounded-md px-6 py-2 text-sm font-medium hover:bg-accent bg-background disabled:opacity-50"
+              >
+                {isLoadingBooks ? "Loading..." : "Load more"}
+              </button>
+            </div>
+          )}
+
+          {books.length === 0 && !isLoadingBooks && (
             <div className="text-center py-20 bg-muted/30 rounded-3xl border border-dashed">
               <p className="text-muted-foreground text-lg">No books found matching your criteria.</p>
               <button 
-                onClick={() => setSelectedCategory("All")}
+                onClick={() => {
+                  setSelectedCategory("All");
+                  setMinPrice("");
+                  setMaxPrice("");
+                }}
                 className="mt-4 text-primary font-medium hover:underline"
               >
                 Clear Filters
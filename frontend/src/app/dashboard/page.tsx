@@ -1,9 +1,9 @@
 "use client";
 
-import { useEffect, useState } from "react";
+import { useEffect } from "react";
 import { useAuth } from "@/context/AuthContext";
 import { useRouter } from "next/navigation";
-import api from "@/lib/api";
+import { usePages } from "@/lib/usePages";
 import { Loader2, Package, User, LogOut } from "lucide-react";
 import Image from "next/image";
 import Link from "next/link";
@@ -26,8 +26,10 @@ interface Order {
 export default function DashboardPage() {
   const { user, isAuthenticated, loading, logout } = useAuth();
   const router = useRouter();
-  const [orders, setOrders] = useState<Order[]>([]);
-  const [isLoadingOrders, setIsLoadingOrders] = useState(true);
+  // One page of orders at a time; "Load more" fetches the next.
+  const {
+    items: orders, isLoading: isLoadingOrders, hasMore: hasMoreOrders, loadMore: loadMoreOrders
+  } = usePages<Order>(isAuthenticated ? "/orders/" : null);
 
   useEffect(() => {
     if (!loading && !isAuthenticated) {
@@ -35,22 +37,6 @@ export default function DashboardPage() {
     }
   }, [loading, isAuthenticated, router]);
 
-  useEffect(() => {
-    if (isAuthenticated) {
-      const fetchOrders = async () => {
-        try {
-          const response = await api.get("/orders/");
-          setOrders(response.data);
-        } catch (error) {
-          console.error("Failed to fetch orders", error);
-        } finally {
-          setIsLoadingOrders(false);
-        }
-      };
-      fetchOrders();
-    }
-  }, [isAuthenticated]);
-
   if (loading || !user) {
     return (
       <div className="min-h-screen flex items-center justify-center">
@@ -90,7 +76,7 @@ export default function DashboardPage() {
         <div className="flex-1 space-y-6">
           <h1 className="text-2xl font-bold font-serif">Order History</h1>
 
-          {isLoadingOrders ? (
+          {isLoadingOrders && orders.length === 0 ? (
             <div className="flex justify-center py-12">
               <Loader2 className="h-6 w-6 animate-spin text-muted-foreground" />
             </div>
@@ -134,6 +120,17 @@ export default function DashboardPage() {
                   </div>
                 </div>
               ))}
+              {hasMoreOrders && (
+                <div className="flex justify-center pt-2">
+                  <button
+                    onClick={loadMoreOrders}
+                    disabled={isLoadingOrders}
+                    className="border rounded-md px-6 py-2 text-sm font-medium hover:bg-accent bg-background disabled:opacity-50"
+                  >
+                    {isLoadingOrders ? "Loading..." : "Load more"}
+                  </button>
+                </div>
+              )}
             </div>
           )}
         </div>
@@ -1,6 +1,7 @@
 "use client";
 
-import React, { createContext, useContext, useState, useEffect } from "react";
+import React, { createContext, useContext, useState, useEffect, useCallback, useRef } from "react";
+import axios from "axios";
 import api from "@/lib/api";
 import { books as initialBooks } from "@/lib/data";
 
@@ -36,8 +37,55 @@ export type Notification = {
   timestamp: Date;
 };
 
+// Filters the book list endpoint applies server-side.
+export type BookFilters = {
+  search?: string;
+  category?: string; // slug
+  min_price?: number;
+  max_price?: number;
+};
+
+// Books are keyset-paginated; the provider loads the first page for the
+// current filters and callers pull in the next one with loadMoreBooks().
+const booksPageUrl = (filters: BookFilters) => {
+  const params = new URLSearchParams({ page_size: "24" });
+  for (const [name, value] of Object.entries(filters)) {
+    if (value !== undefined && value !== "") params.set(name, String(value));
+  }
+  return `/books/?${params.toString()}`;
+};
+
+const mapBook = (b: any): Book => ({
+  id: b.id,
+  title: b.title,
+  author: b.author,
+  price: parseFloat(b.price),
+  image: b.cover_image, // Let components handle default fallback
+  category: b.category.name,
+  categoryId: b.category.id,
+  stock_quantity: b.stock_quantity,
+  is_active: b.is_active,
+  description: b.description,
+  rating: 4.5, // Mock rating for now
+  reviews: 0,
+  isbn: b.isbn || "N/A",
+  publisher: b.publisher || "UNN Press"
+});
+
+// Appends a page, skipping books already present (e.g. one fetched by id).
+const appendBooks = (prev: Book[], page: Book[]) => {
+  const seen = new Set(prev.map((b) => b.id));
+  return [...prev, ...page.filter((b) => !seen.has(b.id))];
+};
+
 type BookContextType = {
   books: Book[];
+  bookFilters: BookFilters;
+  setBookFilters: (filters: BookFilters) => void;
+  hasMoreBooks: boolean;
+  isLoadingBooks: boolean;
+  loadMoreBooks: () => Promise<void>;
+  fetchBook: (id: string) => Promise<Book | undefined>;
   categories: Category[];
   notifications: Notification[];
   addBook: (book: Omit<Book, "id" | "image"> & { image?: File }) => void;
@@ -57,14 +105,19 @@ export function BookProvider({ children }: { children: React.ReactNode }) {
   const [notifications, setNotifications] = useState<Notification[]>([]);
   const [isInitialized, setIsInitialized] = useState(false);
 
-  // Load from API on mount
+  const [bookFilters, setBookFilters] = useState<BookFilters>({});
+  const [nextBooksUrl, setNextBooksUrl] = useState<string | null>(null);
+  const [isLoadingBooks, setIsLoadingBooks] = useState(true);
+  // Aborts every request for the current filters once they change.
+  const booksRequest = useRef<AbortController | null>(null);
+  const firstPageUrl = booksPageUrl(bookFilters);
+
   useEffect(() => {
-    const fetchData = async () => {
+    const controller = new AbortController();
+
+    const fetchCategories = async () => {
       try {
-        const [booksRes, categoriesRes] = await Promise.all([
-          api.get('/books/'),
-          api.get('/categories/')
-        ]);
+        const categoriesRes = await api.get('/categories/', { signal: controller.signal });
 
         const mappedCategories = categoriesRes.data.map((c: any) => ({
           id: c.id,
@@ -72,35 +125,71 @@ export function BookProvider({ children }: { children: React.ReactNode }) {
           slug: c.slug
         }));
         setCategories(mappedCategories);
+      } catch (error) {
+        if (axios.isCancel(error)) return;
+        console.error("Failed to fetch categories:", error);
+      }
+    };
 
-const DEFAULT_BOOK_IMAGE = "https://images.unsplash.com/photo-1544947950-fa07a98d237f?auto=format&fit=crop&q=80&w=800";
-
-        const mappedBooks = booksRes.data.map((b: any) => ({
-          id: b.id,
-          title: b.title,
-          author: b.author,
-          price: parseFloat(b.price),
-          image: b.cover_image, // Let components handle default fallback
-          category: b.category.name,
-          categoryId: b.category.id,
-          stock_quantity: b.stock_quantity,
-          is_active: b.is_active,
-          description: b.description,
-          rating: 4.5, // Mock rating for now
-          reviews: 0,
-          isbn: b.isbn || "N/A",
-          publisher: b.publisher || "UNN Press"
-        }));
+    fetchCategories();
+    return () => controller.abort();
+  }, []);
+
+  // Load the first page for the current filters. The list is reset first and
+  // the requests aborted on cleanup, so neither StrictMode's double mount nor
+  // a filter change appends pages that belong to another listing.
+  useEffect(() => {
+    const controller = new AbortController();
+    booksRequest.current = controller;
+    setBooks([]);
+    setNextBooksUrl(null);
+    setIsLoadingBooks(true);
 
-        console.log("Fetched books from backend:", mappedBooks);
-        setBooks(mappedBooks);
+    const fetchBooks = async () => {
+      try {
+        const booksRes = await api.get(firstPageUrl, { signal: controller.signal });
+        setBooks(booksRes.data.results.map(mapBook));
+        setNextBooksUrl(booksRes.data.next);
+        setIsLoadingBooks(false);
         setIsInitialized(true);
       } catch (error) {
-        console.error("Failed to fetch data:", error);
+        if (axios.isCancel(error)) return;
+        console.error("Failed to fetch books:", error);
+        setIsLoadingBooks(false);
       }
     };
 
-    fetchData();
+    fetchBooks();
+    return () => controller.abort();
+  }, [firstPageUrl]);
+
+  const loadMoreBooks = useCallback(async () => {
+    const controller = booksRequest.current;
+    if (!nextBooksUrl || isLoadingBooks || !controller) return;
+    setIsLoadingBooks(true);
+    try {
+      const response = await api.get(nextBooksUrl, { signal: controller.signal });
+      setBooks((prev) => appendBooks(prev, response.data.results.map(mapBook)));
+      setNextBooksUrl(response.data.next);
+      setIsLoadingBooks(false);
+    } catch (error) {
+      if (axios.isCancel(error)) return;
+      console.error("Failed to load more books:", error);
+      setIsLoadingBooks(false);
+    }
+  }, [nextBooksUrl, isLoadingBooks]);
+
+  // For pages that link to a single book which may not be loaded yet.
+  const fetchBook = useCallback(async (id: string) => {
+    try {
+      const response = await api.get(`/books/${id}/`);
+      const book = mapBook(response.data);
+      setBooks((prev) => appendBooks(prev, [book]));
+      return book;
+    } catch (error) {
+      console.error("Failed to fetch book:", error);
+      return undefined;
+    }
   }, []);
 
   // Save to LocalStorage whenever state changes
@@ -303,6 +392,12 @@ const DEFAULT_BOOK_IMAGE = "https://images.unsplash.com/photo-1544947950-fa07a98
     <BookContext.Provider
       value={{
         books,
+        bookFilters,
+        setBookFilters,
+        hasMoreBooks: nextBooksUrl !== null,
+        isLoadingBooks,
+        loadMoreBooks,
+        fetchBook,
         categories,
         notifications,
         addBook,
@@ -0,0 +1,62 @@
+"use client";
+
+import { useCallback, useEffect, useRef, useState } from "react";
+import axios from "axios";
+import api from "@/lib/api";
+
+// Pages through a keyset-paginated list endpoint (`{ next, results }`) one
+// page at a time: the first page loads when `path` is set, the next one on
+// loadMore(). Changing `path` starts over; requests for a previous path are
+// aborted, so their pages never land in the new list.
+export function usePages<T = any>(path: string | null) {
+  const [items, setItems] = useState<T[]>([]);
+  const [next, setNext] = useState<string | null>(null);
+  const [isLoading, setIsLoading] = useState(path !== null);
+  const request = useRef<AbortController | null>(null);
+
+  useEffect(() => {
+    setItems([]);
+    setNext(null);
+    if (path === null) {
+      setIsLoading(false);
+      return;
+    }
+    const controller = new AbortController();
+    request.current = controller;
+    setIsLoading(true);
+
+    const fetchFirst = async () => {
+      try {
+        const response = await api.get(path, { signal: controller.signal });
+        setItems(response.data.results);
+        setNext(response.data.next);
+        setIsLoading(false);
+      } catch (error) {
+        if (axios.isCancel(error)) return;
+        console.error(`Failed to fetch ${path}`, error);
+        setIsLoading(false);
+      }
+    };
+
+    fetchFirst();
+    return () => controller.abort();
+  }, [path]);
+
+  const loadMore = useCallback(async () => {
+    const controller = request.current;
+    if (!next || isLoading || !controller) return;
+    setIsLoading(true);
+    try {
+      const response = await api.get(next, { signal: controller.signal });
+      setItems((prev) => [...prev, ...response.data.results]);
+      setNext(response.data.next);
+      setIsLoading(false);
+    } catch (error) {
+      if (axios.isCancel(error)) return;
+      console.error(`Failed to fetch ${next}`, error);
+      setIsLoading(false);
+    }
+  }, [next, isLoading]);
+
+  return { items, isLoading, hasMore: next !== null, loadMore };
+}